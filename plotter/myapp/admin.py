@@ -1,6 +1,10 @@
 from django.contrib import admin
-from .models import CSVFile, SavedPlot
+from .models import CSVFile, DatasetEdit, Job, PlotBlob, PlotStateEntry, SavedPlot
 
 # Register your models here.
 admin.site.register(CSVFile)
-admin.site.register(SavedPlot)
\ No newline at end of file
+admin.site.register(SavedPlot)
+admin.site.register(DatasetEdit)
+admin.site.register(Job)
+admin.site.register(PlotBlob)
+admin.site.register(PlotStateEntry)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+
+AGGREGATIONS = ["sum", "mean", "count", "median"]
+OTHER_LABEL = "Other"
+
+
+def can_aggregate(data, key_column, value_column, how):
+    if how not in AGGREGATIONS or key_column == value_column:
+        return False
+    if key_column not in data.columns or value_column not in data.columns:
+        return False
+    return how == "count" or pd.api.types.is_numeric_dtype(data[value_column])
+
+
+def aggregate_by(data, key_column, value_column, how):
+    """One row per distinct ``key_column`` value, in first-appearance order.
+
+    Returns ``data`` unchanged when the aggregation does not apply, e.g. a
+    non-numeric value column with anything other than ``count``.
+    """
+    if not can_aggregate(data, key_column, value_column, how):
+        return data
+    grouped = data.groupby(key_column, sort=False, dropna=False, observed=True)[value_column]
+    return grouped.agg(how).reset_index()
+
+
+def other_label(names):
+    """``OTHER_LABEL``, numbered if ``names`` already holds it."""
+    existing = {str(name) for name in names}
+    label, number = OTHER_LABEL, 2
+    while label in existing:
+        label, number = f"{OTHER_LABEL} ({number})", number + 1
+    return label
+
+
+def top_n_with_other(data, names_column, values_column, how, n):
+    """Aggregate like ``aggregate_by`` but fold everything past the ``n``
+    largest groups into a single ``Other`` group, aggregated from raw rows.
+    The group is renamed if the data has a name ``Other`` of its own."""
+    aggregated = aggregate_by(data, names_column, values_column, how)
+    if aggregated is data or n <= 0 or len(aggregated) <= n:
+        return aggregated
+    top = aggregated.nlargest(n, values_column)[names_column]
+    names = data[names_column].astype(object)
+    relabelled = pd.DataFrame({
+        names_column: names.where(names.isin(top), other_label(aggregated[names_column])),
+        values_column: data[values_column],
+    })
+    return aggregate_by(relabelled, names_column, values_column, how)
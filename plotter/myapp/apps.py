@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'myapp'
\ No newline at end of file
+    name = 'myapp'
+
+    def ready(self):
+        # Times the ORM queries of every database connection opened from now on.
+        from . import timing  # noqa: F401
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections
+
+from . import views
+from .models import CSVFile, SavedPlot
+
+
+RENDER_WORKERS = getattr(settings, "ASYNC_RENDER_WORKERS", 4)
+
+# Pandas, plotly, file and template work of the async views runs here, so a
+# slow render holds one of these threads instead of the event loop, and no
+# more than RENDER_WORKERS renders compete for CPU and memory at once.
+_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+
+
+def _request_scoped(func):
+    def call(*args, **kwargs):
+        # Executor threads outlive requests; give their database connections
+        # the lifecycle they would have under a sync request.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return call
+
+
+async def offload(func, *args, **kwargs):
+    """Run blocking ``func`` on the bounded render pool."""
+    return await sync_to_async(_request_scoped(func), thread_sensitive=False, executor=_executor)(*args, **kwargs)
+
+
+async def user_csv_file(request):
+    """The user's latest upload, looked up with async ORM calls. The resolved
+    user replaces the lazy ``request.user`` so offloaded code does not query
+    it again."""
+    user = await request.auser()
+    request.user = user
+    if not user.is_authenticated:
+        return None
+    try:
+        return await CSVFile.objects.filter(user=user).alatest('uploaded_at')
+    except CSVFile.DoesNotExist:
+        return None
+
+
+def plot_view(plot_type):
+    async def view(request):
+        csv_file = await user_csv_file(request)
+        return await offload(views.plot_page, request, plot_type, csv_file)
+    view.__name__ = view.__qualname__ = f"{plot_type}_viz"
+    return view
+
+
+bar_viz = plot_view("bar")
+box_viz = plot_view("box")
+histogram_viz = plot_view("histogram")
+line_viz = plot_view("line")
+pie_viz = plot_view("pie")
+scatter_viz = plot_view("scatter")
+
+
+@login_required
+async def data(request):
+    csv_file = await user_csv_file(request)
+    return await offload(views.data_page, request, csv_file)
+
+
+@login_required
+async def describe_data(request):
+    csv_file = await user_csv_file(request)
+    return await offload(views.describe_page, request, csv_file)
+
+
+@login_required
+async def export_plots(request):
+    user = await request.auser()
+    plot_count = await SavedPlot.objects.filter(user=user).acount()
+    return await offload(views.export_page, request, plot_count)
@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+
+
+class DatasetCache:
+    """Process-wide LRU cache of parsed user datasets, bounded by bytes.
+
+    Entries are keyed by ``(csv_file_id, version)`` so a rewrite of the file on
+    disk never serves a stale frame even if an invalidation was missed. Columns
+    are cached individually, so a plot that only loaded its x/y columns can be
+    served again without reading the rest of the table.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def series_size(series):
+        return int(series.memory_usage(index=True, deep=True))
+
+    def get(self, csv_file_id, version, columns=None):
+        key = (csv_file_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._covers(entry, columns):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            names = entry["order"] if columns is None else list(columns)
+            series = [entry["columns"][name] for name in names]
+        # Callers mutate the frame they get back (edits, drops, replaces).
+        return pd.concat(series, axis=1, copy=True) if series else pd.DataFrame()
+
+    def take(self, csv_file_id, version, positions, columns=None):
+        """Rows at ``positions`` (in that order), without copying the rest of
+        the frame, or None when the columns are not all cached."""
+        key = (csv_file_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._covers(entry, columns):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            names = entry["order"] if columns is None else list(columns)
+            series = [entry["columns"][name].iloc[positions] for name in names]
+        if not series:
+            return pd.DataFrame()
+        return pd.concat(series, axis=1).reset_index(drop=True)
+
+    def set(self, csv_file_id, version, data, order=None, row_index=None):
+        """Store ``data``; ``order`` is the dataset's full column list when
+        ``data`` holds only some of its columns. ``row_index`` carries an
+        already built ``row_index`` over to the new version."""
+        key = (csv_file_id, version)
+        columns = {name: data[name].copy() for name in data.columns}
+        sizes = {name: self.series_size(series) for name, series in columns.items()}
+        if sum(sizes.values()) > self.max_bytes:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._discard(csv_file_id)
+                entry = {"columns": {}, "sizes": {}, "order": [], "size": 0, "row_index": None}
+                self._entries[key] = entry
+            if row_index is not None:
+                self._set_row_index(entry, row_index)
+            entry["order"] = list(order) if order is not None else list(data.columns)
+            for name, series in columns.items():
+                self.current_bytes -= entry["sizes"].get(name, 0)
+                entry["size"] -= entry["sizes"].get(name, 0)
+                entry["columns"][name] = series
+                entry["sizes"][name] = sizes[name]
+                entry["size"] += sizes[name]
+                self.current_bytes += sizes[name]
+            for name in [name for name in entry["columns"] if name not in entry["order"]]:
+                del entry["columns"][name]
+                self.current_bytes -= entry["sizes"][name]
+                entry["size"] -= entry["sizes"].pop(name)
+            self._entries.move_to_end(key)
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted["size"]
+                self.evictions += 1
+
+    def row_index(self, csv_file_id, version):
+        """Hash index from ``Index`` column values to row positions, built on
+        first use; None when ``Index`` is not cached or has duplicates."""
+        with self._lock:
+            entry = self._entries.get((csv_file_id, version))
+            if entry is None:
+                return None
+            if entry["row_index"] is None and "Index" in entry["columns"]:
+                index = pd.Index(entry["columns"]["Index"].to_numpy())
+                if not index.is_unique:
+                    return None
+                self._set_row_index(entry, index)
+            return entry["row_index"]
+
+    def columns(self, csv_file_id, version):
+        with self._lock:
+            entry = self._entries.get((csv_file_id, version))
+            return list(entry["order"]) if entry is not None else None
+
+    def invalidate(self, csv_file_id):
+        with self._lock:
+            self._discard(csv_file_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _set_row_index(self, entry, index):
+        size = int(index.nbytes)
+        if entry["row_index"] is not None:
+            size -= int(entry["row_index"].nbytes)
+        entry["row_index"] = index
+        entry["size"] += size
+        self.current_bytes += size
+
+    @staticmethod
+    def _covers(entry, columns):
+        wanted = entry["order"] if columns is None else columns
+        return all(name in entry["columns"] for name in wanted)
+
+    def _discard(self, csv_file_id):
+        for key in [key for key in self._entries if key[0] == csv_file_id]:
+            self.current_bytes -= self._entries.pop(key)["size"]
+
+
+dataset_cache = DatasetCache(
+    getattr(settings, "DATASET_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
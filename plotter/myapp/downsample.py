@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+def _axis_values(series):
+    """Numeric positions usable for bucketing, or None for categorical axes."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    return None
+
+
+def _from_axis(values, series):
+    """Inverse of ``_axis_values`` for positions computed on ``series``."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        times = pd.to_datetime(np.round(values).astype(np.int64), unit=series.dt.unit)
+        return times.tz_localize("UTC").tz_convert(series.dt.tz) if series.dt.tz is not None else times
+    return values
+
+
+def _first_per_bucket(mask, bucket_id):
+    candidates = np.flatnonzero(mask)
+    _, first = np.unique(bucket_id[candidates], return_index=True)
+    return candidates[first]
+
+
+def minmax_indices(y, budget):
+    """Keep the first and last rows and the minimum and maximum of each of
+    ``(budget - 2) // 2`` row buckets, so at most ``budget`` rows."""
+    n = len(y)
+    buckets = max((budget - 2) // 2, 1)
+    if n <= budget:
+        return np.arange(n)
+    bounds = np.linspace(0, n, buckets + 1).astype(np.int64)
+    bucket_id = np.repeat(np.arange(buckets), np.diff(bounds))
+    low = np.where(np.isnan(y), np.inf, y)
+    high = np.where(np.isnan(y), -np.inf, y)
+    bucket_min = np.minimum.reduceat(low, bounds[:-1])
+    bucket_max = np.maximum.reduceat(high, bounds[:-1])
+    keep = np.concatenate([
+        _first_per_bucket(low == bucket_min[bucket_id], bucket_id),
+        _first_per_bucket(high == bucket_max[bucket_id], bucket_id),
+        [0, n - 1],
+    ])
+    return np.unique(keep)
+
+
+def lttb_indices(x, y, budget):
+    """Largest-Triangle-Three-Buckets selection of ``budget`` row positions.
+
+    The selection is sequential by nature; each bucket is scored in one
+    vectorized step, so the Python loop runs ``budget`` times, not ``n``.
+    """
+    n = len(y)
+    if n <= budget or budget < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    bounds = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    counts = np.diff(bounds)
+    avg_x = np.add.reduceat(x[1:n - 1], bounds[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], bounds[:-1] - 1) / counts
+
+    selected = np.empty(budget, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(budget - 2):
+        start, end = bounds[b], bounds[b + 1]
+        if b + 1 < budget - 2:
+            next_x, next_y = avg_x[b + 1], avg_y[b + 1]
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def downsample_line(data, x_column, y_column, budget, method="lttb"):
+    """Return ``(frame, summary)`` with at most about ``budget`` rows."""
+    total = len(data)
+    if total <= budget:
+        return data, None
+    y = _axis_values(data[y_column])
+    if y is None:
+        return data, None
+    x = _axis_values(data[x_column])
+    # Lines are drawn in row order, so bucket by position unless x is sorted.
+    if x is None or np.isnan(x).any() or (np.diff(x) < 0).any():
+        x = np.arange(total, dtype=float)
+    if method == "minmax":
+        keep, label = minmax_indices(y, budget), "min/max"
+    else:
+        keep, label = lttb_indices(x, y, budget), "LTTB"
+    return data.iloc[keep], {"method": label, "shown": len(keep), "total": total}
+
+
+def bin_scatter(data, x_column, y_column, budget):
+    """Aggregate points onto a ``sqrt(budget)`` square grid of density bins.
+
+    Returns ``(frame, summary)``; the frame has one row per non-empty bin at
+    the bin centre with its point count in a ``count`` column.
+    """
+    total = len(data)
+    if total <= budget:
+        return data, None
+    x = _axis_values(data[x_column])
+    y = _axis_values(data[y_column])
+    if x is None or y is None:
+        step = int(np.ceil(total / budget))
+        sampled = data.iloc[::step]
+        return sampled, {"method": "stride", "shown": len(sampled), "total": total}
+
+    side = max(int(np.sqrt(budget)), 1)
+    finite = np.isfinite(x) & np.isfinite(y)
+    counts, x_edges, y_edges = np.histogram2d(x[finite], y[finite], bins=side)
+    ix, iy = np.nonzero(counts)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+    # Datetime axes are binned as integers; the centres go back to dates.
+    binned = pd.DataFrame({x_column: _from_axis(x_centres[ix], data[x_column])})
+    binned[y_column] = _from_axis(y_centres[iy], data[y_column])
+    binned["count"] = counts[ix, iy].astype(np.int64)
+    return binned, {"method": "density bins", "shown": len(binned), "total": total}
+
+
+def describe_reduction(summary):
+    if not summary:
+        return None
+    ratio = summary["total"] / max(summary["shown"], 1)
+    return (
+        f"Showing {summary['shown']:,} of {summary['total']:,} points "
+        f"({ratio:,.0f}x reduction, {summary['method']})."
+    )
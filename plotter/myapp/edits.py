@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from .models import DatasetEdit
+
+
+def active_edits(csv_file):
+    """``(operation, payload)`` pairs not yet folded into the stored snapshot,
+    oldest first."""
+    if not csv_file.revision:
+        return []
+    edits = DatasetEdit.objects.filter(
+        csv_file_id=csv_file.id, undone=False, id__gt=csv_file.snapshot_edit_id
+    )
+    return list(edits.values_list("operation", "payload"))
+
+
+def required_columns(edits, columns):
+    """Columns to load so ``edits`` can be replayed onto ``columns``; None
+    means the whole table."""
+    if columns is None or any(operation == "clean" for operation, _ in edits):
+        return None
+    return list(dict.fromkeys([*columns, "Index"]))
+
+
+def deleted_columns(edits):
+    return {payload["column"] for operation, payload in edits if operation == "delete_column"}
+
+
+def row_positions(data, rows, row_index=None):
+    """Positions of the rows whose ``Index`` is in ``rows``; a ``row_index``
+    over ``data`` turns the column scan into hash lookups."""
+    if row_index is not None:
+        positions = row_index.get_indexer(rows)
+        return np.unique(positions[positions >= 0])
+    if "Index" not in data.columns:
+        return np.array([], dtype=np.int64)
+    return np.flatnonzero(data["Index"].isin(rows).to_numpy())
+
+
+def set_value(data, row, column, value, row_index=None):
+    positions = row_positions(data, [row], row_index)
+    if column not in data.columns or not positions.size:
+        return data
+    dtype = data[column].dtype
+    # Uploads store the narrowest dtype that fits; widen it if the new value does not.
+    if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        if not np.can_cast(np.min_scalar_type(value), dtype):
+            data[column] = data[column].astype(np.promote_types(dtype, np.min_scalar_type(value)))
+    elif dtype == "float32" and np.float32(value) != value:
+        data[column] = data[column].astype("float64")
+    elif isinstance(dtype, pd.CategoricalDtype) and value not in dtype.categories:
+        data[column] = data[column].cat.add_categories([value])
+    data.iloc[positions[0], data.columns.get_loc(column)] = value
+    return data
+
+
+def delete_rows(data, rows, row_index=None):
+    positions = row_positions(data, rows, row_index)
+    if not positions.size:
+        return data
+    keep = np.ones(len(data), dtype=bool)
+    keep[positions] = False
+    return data[keep]
+
+
+def delete_column(data, column):
+    if column not in data.columns:
+        return data
+    return data.drop(columns=[column])
+
+
+def replace(data, column, to_replace, value):
+    if column in data.columns:
+        data[column] = data[column].replace(to_replace, np.nan if value is None else value)
+    return data
+
+
+def clean(data):
+    if data.isnull().any().any():
+        return data.dropna()
+    return data
+
+
+OPERATIONS = {
+    "set_value": set_value,
+    "delete_rows": delete_rows,
+    "delete_column": delete_column,
+    "replace": replace,
+    "clean": clean,
+}
+
+
+ROW_OPERATIONS = {"set_value", "delete_rows"}
+
+
+def apply_edit(data, operation, payload, row_index=None):
+    if operation in ROW_OPERATIONS:
+        return OPERATIONS[operation](data, row_index=row_index, **payload)
+    return OPERATIONS[operation](data, **payload)
+
+
+def next_row_index(row_index, operation, payload):
+    """``row_index`` updated for an edit that was just applied, or None when
+    it has to be rebuilt."""
+    if row_index is None or operation == "clean":
+        return None
+    if operation == "delete_rows":
+        return row_index.delete(row_positions(None, payload["rows"], row_index))
+    return row_index
+
+
+def apply_edits(data, edits):
+    """Replay journal entries onto ``data``. Entries that refer to rows or
+    columns ``data`` does not hold are skipped, so chunks and column subsets
+    can be replayed independently."""
+    for operation, payload in edits:
+        data = apply_edit(data, operation, payload)
+    return data
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+def make_key(dataset_hash, plot_class, spec):
+    payload = json.dumps(
+        {"dataset": dataset_hash, "plot": plot_class, "spec": spec},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def entry_size(entry):
+    return sum(len(value) for value in entry.values())
+
+
+class FigureCache:
+    """Rendered figures (plot div HTML and figure JSON) keyed by ``make_key``."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        if entry_size(entry) <= self.max_bytes:
+            self._set(key, entry)
+
+    def stats(self):
+        return {
+            "backend": type(self).__name__,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    def _set(self, key, entry):
+        raise NotImplementedError("Subclasses should implement this method")
+
+
+class MemoryFigureCache(FigureCache):
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry):
+        size = entry_size(entry)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= entry_size(previous)
+            self._entries[key] = entry
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= entry_size(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(entries=len(self._entries), current_bytes=self.current_bytes)
+        return stats
+
+
+class FileFigureCache(FigureCache):
+    """One JSON file per figure; least recently read files are evicted first.
+
+    The directory is only scanned when the running size total passes
+    ``max_bytes``; it then evicts down to ``LOW_WATER`` of it, so writes
+    at capacity do not each rescan. Other processes' writes only show at
+    the next scan, so the directory can overshoot by what they wrote since.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, max_bytes, location):
+        super().__init__(max_bytes)
+        self.location = location
+        self.current_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.location, f"{key}.json")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _set(self, key, entry):
+        os.makedirs(self.location, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp_path)
+        try:
+            size -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self.current_bytes is not None:
+                self.current_bytes += size
+            if self.current_bytes is None or self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.location):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.location, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes * self.LOW_WATER:
+                    break
+                try:
+                    os.remove(os.path.join(self.location, name))
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+        self.current_bytes = total
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(current_bytes=self.current_bytes)
+        return stats
+
+
+class DjangoFigureCache(FigureCache):
+    """Delegates to a configured Django cache; eviction is the backend's job."""
+
+    def __init__(self, max_bytes, alias="default", timeout=DEFAULT_TIMEOUT):
+        super().__init__(max_bytes)
+        self.alias = alias
+        self.timeout = timeout
+
+    def _get(self, key):
+        return caches[self.alias].get(f"figure:{key}")
+
+    def _set(self, key, entry):
+        caches[self.alias].set(f"figure:{key}", entry, self.timeout)
+
+
+def build_figure_cache(config):
+    backend = config.get("BACKEND", "memory")
+    max_bytes = config.get("MAX_BYTES", 64 * 1024 * 1024)
+    if backend == "memory":
+        return MemoryFigureCache(max_bytes)
+    if backend == "file":
+        location = config.get("LOCATION") or os.path.join(settings.BASE_DIR, "figure_cache")
+        return FileFigureCache(max_bytes, location)
+    if backend == "django":
+        return DjangoFigureCache(
+            max_bytes,
+            alias=config.get("ALIAS", "default"),
+            timeout=config.get("TIMEOUT", DEFAULT_TIMEOUT),
+        )
+    raise ValueError(f"Unknown figure cache backend: {backend}")
+
+
+figure_cache = build_figure_cache(getattr(settings, "PLOT_FIGURE_CACHE", {}))
@@ -0,0 +1,213 @@
+import io
+import json
+import logging
+import multiprocessing
+import re
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import plotly.io as pio
+from django.conf import settings
+from plotly.offline import get_plotlyjs
+
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+
+WORKERS = getattr(settings, "EXPORT_RENDER_WORKERS", 2)
+MAX_PLOTS = getattr(settings, "EXPORT_MAX_PLOTS", 200)
+IMAGE_WIDTH = 1200
+IMAGE_HEIGHT = 800
+IMAGE_SCALE = 2
+
+FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+    "html": "text/html",
+}
+# Formats that are compressed already are stored in the ZIP as they are.
+_STORED = {"png", "pdf"}
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+
+
+def available_formats():
+    """HTML needs only plotly; static images need kaleido and its browser."""
+    return [fmt for fmt in FORMATS if fmt == "html" or kaleido is not None]
+
+
+# Renderer processes
+
+def _warm_renderer():
+    # Runs once per worker: keep one browser for every figure this process
+    # renders, and pay for loading plotly.js before the first real one.
+    if kaleido is None:
+        return
+    start_server = getattr(kaleido, "start_sync_server", None)
+    if start_server is not None:
+        start_server(silence_warnings=True)
+    try:
+        pio.to_image({"data": [{"type": "scatter", "y": [0, 1]}]}, format="png", width=10, height=10)
+    except Exception:
+        logger.exception("Warming the image renderer failed")
+
+
+def render_figure(figure_json, fmt):
+    """Render figure JSON to ``fmt``; executed in a pool process. Returns the
+    bytes and the render time in milliseconds."""
+    start = time.perf_counter()
+    figure = json.loads(figure_json)
+    if fmt == "html":
+        # The page loads plotly.min.js from the same directory of the ZIP.
+        data = pio.to_html(figure, include_plotlyjs="directory", full_html=True, validate=False).encode()
+    else:
+        data = pio.to_image(
+            figure, format=fmt, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, scale=IMAGE_SCALE, validate=False
+        )
+    return data, (time.perf_counter() - start) * 1000
+
+
+def _ready():
+    return True
+
+
+# Pool
+
+def _pool():
+    # Spawned, like the job workers, so renderers inherit no connections or
+    # threads; they stay up between exports.
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_renderer,
+            )
+            for _ in range(WORKERS):
+                _executor.submit(_ready)
+        return _executor
+
+
+def _reset_pool(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ZIP streaming
+
+class _Sink(io.RawIOBase):
+    """Write-only stream the ZIP is written to and drained from as it grows."""
+
+    def __init__(self):
+        self.parts = deque()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def file_name(plot_id, title, fmt):
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", title).strip("-")[:60] or "plot"
+    return f"{plot_id}-{slug}.{fmt}"
+
+
+def export_zip(figures, fmt):
+    """Render ``figures``, ``(plot_id, title, figure JSON or exception)``
+    pairs, on the renderer pool and yield a ZIP of the results as each one
+    finishes. ``export-report.json`` in the ZIP gives per-figure render
+    times, failures and throughput."""
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    executor = _pool()
+    started = time.perf_counter()
+    pending = {}
+    rendered = []
+    failed = []
+    figures = iter(figures)
+
+    def collect(done):
+        for future in done:
+            plot_id, title = pending.pop(future)
+            try:
+                data, render_ms = future.result()
+            except BrokenProcessPool:
+                _reset_pool(executor)
+                raise
+            except Exception as e:
+                failed.append({"id": plot_id, "title": title, "error": str(e) or type(e).__name__})
+                continue
+            name = file_name(plot_id, title, fmt)
+            archive.writestr(name, data, compress_type=zipfile.ZIP_STORED if fmt in _STORED else None)
+            rendered.append({"id": plot_id, "title": title, "file": name, "render_ms": round(render_ms, 1), "bytes": len(data)})
+
+    try:
+        if fmt == "html":
+            archive.writestr("plotly.min.js", get_plotlyjs())
+        for plot_id, title, figure in figures:
+            if isinstance(figure, Exception):
+                failed.append({"id": plot_id, "title": title, "error": str(figure)})
+                continue
+            # Bounded look-ahead keeps memory flat however many plots are asked for.
+            while len(pending) >= 2 * WORKERS:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                yield sink.drain()
+            pending[executor.submit(render_figure, figure, fmt)] = (plot_id, title)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+            yield sink.drain()
+
+        report = export_report(fmt, rendered, failed, time.perf_counter() - started)
+        logger.info(
+            "Exported %d plots as %s in %.1fs (%.2f figures/s, p50 %s ms, p95 %s ms, %d failed)",
+            len(rendered), fmt, report["seconds"], report["figures_per_second"],
+            report["render_ms"]["p50"], report["render_ms"]["p95"], len(failed),
+        )
+        archive.writestr("export-report.json", json.dumps(report, indent=2))
+    finally:
+        for future in pending:
+            future.cancel()
+        archive.close()
+    yield sink.drain()
+
+
+def export_report(fmt, rendered, failed, seconds):
+    times = [item["render_ms"] for item in rendered]
+    p50, p95 = np.percentile(times, [50, 95]) if times else (None, None)
+    return {
+        "format": fmt,
+        "workers": WORKERS,
+        "seconds": round(seconds, 3),
+        "figures_per_second": round(len(rendered) / seconds, 2) if seconds else None,
+        "render_ms": {
+            "p50": None if p50 is None else round(float(p50), 1),
+            "p95": None if p95 is None else round(float(p95), 1),
+            "max": max(times) if times else None,
+        },
+        "plots": rendered,
+        "failed": failed,
+    }
@@ -0,0 +1,207 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .sketches import DatasetSketch
+from .storage import COLUMNAR_DIR, columnar_enabled, schema_dtypes
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - columnar storage is optional
+    pyarrow = None
+
+
+CHUNK_ROWS = getattr(settings, "CSV_INGEST_CHUNK_ROWS", 100_000)
+MAX_UPLOAD_BYTES = getattr(settings, "CSV_UPLOAD_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+INT_DTYPES = ["int8", "int16", "int32", "int64"]
+
+
+class IngestError(ValueError):
+    pass
+
+
+class ColumnProfile:
+    """Running facts about one column, enough to pick its narrowest dtype."""
+
+    def __init__(self):
+        self.kind = None
+        self.integer = True
+        self.has_nan = False
+        self.float32_exact = True
+        self.low = np.inf
+        self.high = -np.inf
+        self.uniques = set()
+
+    def update(self, series):
+        if pd.api.types.is_bool_dtype(series):
+            kind = "bool"
+        elif pd.api.types.is_numeric_dtype(series):
+            kind = "number"
+        else:
+            kind = "object"
+        if self.kind is None:
+            self.kind = kind
+        elif self.kind != kind:
+            # Mixed chunk inference (e.g. numbers, then text) ends up as text;
+            # values seen so far were not collected as strings.
+            self.kind = "object"
+            self.uniques = None
+
+        if kind == "number":
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            finite = values[np.isfinite(values)]
+            self.has_nan |= finite.size != values.size
+            self.integer &= pd.api.types.is_integer_dtype(series)
+            if finite.size:
+                self.low = min(self.low, finite.min())
+                self.high = max(self.high, finite.max())
+                self.float32_exact &= bool(np.array_equal(finite.astype(np.float32), finite))
+        elif kind == "object" and self.uniques is not None:
+            self.uniques.update(series.dropna().unique())
+            if len(self.uniques) > CATEGORY_MAX_UNIQUE:
+                self.uniques = None
+
+    def dtype(self, rows):
+        if self.kind == "bool":
+            return {"dtype": "bool"}
+        if self.kind == "number":
+            if self.integer and not self.has_nan:
+                for name in INT_DTYPES:
+                    info = np.iinfo(name)
+                    if info.min <= self.low and self.high <= info.max:
+                        return {"dtype": name}
+            return {"dtype": "float32" if self.float32_exact else "float64"}
+        if self.uniques is not None and len(self.uniques) <= max(rows * CATEGORY_MAX_RATIO, 1):
+            return {"dtype": "category", "categories": sorted(str(value) for value in self.uniques)}
+        return {"dtype": "object"}
+
+
+def _read_header(path):
+    """Column names as pandas reads them, so they index the chunks: a byte
+    order mark is dropped and empty names become ``Unnamed: <n>``."""
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            header = next(csv.reader(f), None)
+    except UnicodeDecodeError:
+        raise IngestError("The file is not UTF-8 encoded text.")
+    except csv.Error as e:
+        raise IngestError(f"The header row could not be parsed: {e}")
+    if not header or not any(name.strip() for name in header):
+        raise IngestError("The file is empty or has no header row.")
+    duplicates = sorted({name for name in header if name and header.count(name) > 1})
+    if duplicates:
+        raise IngestError(f"Duplicate column names: {', '.join(duplicates)}.")
+    try:
+        return [str(name) for name in pd.read_csv(path, nrows=0).columns]
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError, ValueError) as e:
+        raise IngestError(f"The header row could not be parsed: {e}")
+
+
+def _chunks(path, **kwargs):
+    try:
+        yield from pd.read_csv(path, chunksize=CHUNK_ROWS, **kwargs)
+    except (pd.errors.ParserError, UnicodeDecodeError, ValueError, OverflowError) as e:
+        raise IngestError(f"The file is not a valid CSV: {e}")
+
+
+def profile_csv(path):
+    """First pass: validate the file and infer a compact schema.
+
+    Returns ``(schema, row_count)``. ``schema`` includes a synthetic
+    ``Index`` column when the file does not carry one.
+    """
+    if os.path.getsize(path) > MAX_UPLOAD_BYTES:
+        raise IngestError("The file is larger than the upload limit.")
+    header = _read_header(path)
+    profiles = {name: ColumnProfile() for name in header}
+    rows = 0
+    for chunk in _chunks(path):
+        rows += len(chunk)
+        if list(chunk.columns) != header:
+            raise IngestError("The columns of the file could not be read consistently.")
+        for name in header:
+            profiles[name].update(chunk[name])
+    if rows == 0:
+        raise IngestError("The file has a header but no data rows.")
+
+    schema = {}
+    if "Index" not in header:
+        index = ColumnProfile()
+        index.update(pd.Series([0, rows - 1]))
+        schema["Index"] = index.dtype(rows)
+    for name in header:
+        schema[name] = profiles[name].dtype(rows)
+    return schema, rows
+
+
+def _arrow_schema(schema):
+    fields = []
+    for name, spec in schema.items():
+        if spec["dtype"] == "category":
+            arrow_type = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        elif spec["dtype"] == "object":
+            arrow_type = pyarrow.string()
+        else:
+            arrow_type = pyarrow.from_numpy_dtype(np.dtype(spec["dtype"]))
+        fields.append(pyarrow.field(name, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def ingest_csv(csv_file):
+    """Validate ``csv_file``, persist its schema, row count, memory
+    footprint and column sketches, and stream it into a typed Feather sidecar
+    when pyarrow is available. Raises ``IngestError`` for files that cannot be used."""
+    if csv_file.revision:
+        raise IngestError("The dataset has been edited; its stored snapshot, not the upload, holds its data.")
+    path = csv_file.file.path
+    schema, rows = profile_csv(path)
+    dtypes = schema_dtypes(schema)
+    dtypes.update({name: object for name, spec in schema.items() if spec["dtype"] == "object"})
+
+    writer = None
+    name = f"{COLUMNAR_DIR}/{csv_file.id}.feather"
+    target = csv_file.columnar_file.storage.path(name)
+    tmp_path = f"{target}.tmp"
+    if columnar_enabled():
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        arrow_schema = _arrow_schema(schema)
+        writer = pyarrow.ipc.new_file(
+            tmp_path, arrow_schema, options=pyarrow.ipc.IpcWriteOptions(compression="lz4")
+        )
+
+    memory_bytes = 0
+    offset = 0
+    sketch = DatasetSketch()
+    try:
+        for chunk in _chunks(path, dtype=dtypes):
+            if "Index" not in chunk.columns:
+                chunk.insert(0, "Index", np.arange(offset, offset + len(chunk), dtype=schema["Index"]["dtype"]))
+            offset += len(chunk)
+            sketch.update(chunk)
+            memory_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+            if writer is not None:
+                writer.write_table(
+                    pyarrow.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False)
+                )
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+
+    if writer is not None:
+        writer.close()
+        os.replace(tmp_path, target)
+        csv_file.columnar_file.name = name
+    csv_file.schema = schema
+    csv_file.row_count = rows
+    csv_file.memory_bytes = memory_bytes
+    csv_file.sketches = sketch.to_dict()
+    csv_file.save(update_fields=["columnar_file", "schema", "row_count", "memory_bytes", "sketches"])
+    return csv_file
@@ -0,0 +1,254 @@
+import logging
+import multiprocessing
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+WORKERS = getattr(settings, "JOB_WORKERS", 2)
+USER_LIMIT = getattr(settings, "JOB_USER_LIMIT", 2)
+MIN_ROWS = getattr(settings, "JOB_MIN_ROWS", 250_000)
+TIMEOUT = getattr(settings, "JOB_TIMEOUT", 600)
+RETENTION = getattr(settings, "JOB_RETENTION", 24 * 60 * 60)
+DISPATCH_IN_PROCESS = getattr(settings, "JOB_DISPATCH_IN_PROCESS", True)
+POLL_INTERVAL = 1.0
+
+# Job kind -> task run in a worker process. A task receives the Job and
+# returns a JSON-serialisable result.
+TASKS = {
+    "plot": "myapp.tasks.render_plot",
+    "edit": "myapp.tasks.edit_dataset",
+    "profile": "myapp.tasks.profile_dataset",
+}
+# Kinds that change the dataset run one at a time per file.
+EXCLUSIVE_KINDS = {"edit"}
+# Kinds without side effects; running ones can be cancelled, dropping the result.
+ABANDONABLE_KINDS = {"plot", "profile"}
+ACTIVE = ("queued", "running")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_executor = None
+_dispatcher = None
+_futures = {}
+_crashed = deque()
+
+
+def run_in_background(csv_file):
+    """Whether work on ``csv_file`` is heavy enough to leave the request."""
+    return csv_file is not None and (csv_file.row_count or 0) > MIN_ROWS
+
+
+def submit(user, kind, csv_file=None, params=None, key=""):
+    """Queue a job, or return the user's queued or running job with the same
+    ``key`` so a reload does not queue the work twice."""
+    if key:
+        existing = Job.objects.filter(user=user, key=key, status__in=ACTIVE).last()
+        if existing is not None:
+            return existing
+    job = Job.objects.create(user=user, kind=kind, csv_file=csv_file, params=params or {}, key=key)
+    wake()
+    return job
+
+
+def latest_job(user, key):
+    return Job.objects.filter(user=user, key=key).last()
+
+
+def cancel(job):
+    """Cancel a queued job, or abandon a running one whose kind has no side
+    effects; the worker still finishes it but the result is dropped.
+    Returns whether the job was cancelled."""
+    statuses = ["queued"]
+    if job.kind in ABANDONABLE_KINDS:
+        statuses.append("running")
+    cancelled = Job.objects.filter(pk=job.pk, status__in=statuses).update(
+        status="cancelled", finished_at=timezone.now()
+    )
+    job.refresh_from_db()
+    return bool(cancelled)
+
+
+def metrics():
+    """Queue depth plus, per kind, outcome counts and wait/run time
+    percentiles over the jobs still retained."""
+    kinds = {}
+    finished = Job.objects.exclude(status__in=ACTIVE)
+    for job in finished.only("kind", "status", "created_at", "started_at", "finished_at"):
+        stats = kinds.setdefault(job.kind, {"done": 0, "failed": 0, "cancelled": 0, "wait_ms": [], "run_ms": []})
+        stats[job.status] += 1
+        timings = job.timings()
+        stats["wait_ms"].append(timings["wait_ms"])
+        if job.status == "done":
+            stats["run_ms"].append(timings["run_ms"])
+    for stats in kinds.values():
+        for name in ("wait_ms", "run_ms"):
+            stats[name] = _percentiles(stats[name])
+    counts = Counter(Job.objects.filter(status__in=ACTIVE).values_list("status", flat=True))
+    with _lock:
+        in_flight = len(_futures)
+    return {
+        "workers": WORKERS,
+        "user_limit": USER_LIMIT,
+        "queued": counts["queued"],
+        "running": counts["running"],
+        "in_flight_here": in_flight,
+        "kinds": kinds,
+    }
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": round(float(p50)), "p95": round(float(p95)), "max": max(values)}
+
+
+# Worker processes
+
+def run_job(job_id):
+    """Run one claimed job; executed in a pool process."""
+    close_old_connections()
+    job = Job.objects.select_related("csv_file").get(pk=job_id)
+    if job.status != "running":
+        return
+    try:
+        result = import_string(TASKS[job.kind])(job)
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        _finish(job_id, "failed", error=str(e) or type(e).__name__)
+    else:
+        _finish(job_id, "done", result=result)
+
+
+def _finish(job_id, status, result=None, error=""):
+    # Only a job still marked running is finished; one cancelled meanwhile
+    # keeps its status and the result is dropped.
+    Job.objects.filter(pk=job_id, status="running").update(
+        status=status, result=result, error=error, finished_at=timezone.now()
+    )
+
+
+# Dispatcher
+
+def wake():
+    _wake.set()
+    if DISPATCH_IN_PROCESS:
+        ensure_dispatcher()
+
+
+def ensure_dispatcher():
+    """Start this process's dispatcher thread unless it is running."""
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None or not _dispatcher.is_alive():
+            _dispatcher = threading.Thread(target=dispatch_forever, name="job-dispatcher", daemon=True)
+            _dispatcher.start()
+
+
+def dispatch_forever():
+    while True:
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+        try:
+            dispatch()
+        except Exception:
+            logger.exception("Job dispatch failed")
+        finally:
+            close_old_connections()
+
+
+def dispatch():
+    """Record crashed jobs, expire overdue and old ones, and start queued
+    jobs while this process has free workers."""
+    while _crashed:
+        job_id, error = _crashed.popleft()
+        _finish(job_id, "failed", error=error)
+    _expire()
+    with _lock:
+        free = WORKERS - len(_futures)
+    if free <= 0:
+        return
+    for job_id in _claim(free):
+        with _lock:
+            future = _pool().submit(run_job, job_id)
+            _futures[job_id] = future
+        future.add_done_callback(partial(_done, job_id))
+
+
+def _pool():
+    # Spawned rather than forked: workers must not inherit the web process's
+    # database connections or threads. The initializer is django.setup itself,
+    # as this module cannot be imported before the app registry is ready.
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def _done(job_id, future):
+    # Runs on the executor's thread; database work is left to the dispatcher.
+    global _executor
+    error = future.exception()
+    with _lock:
+        _futures.pop(job_id, None)
+        if isinstance(error, BrokenProcessPool) and _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    if error is not None:
+        _crashed.append((job_id, f"Worker failed: {error or type(error).__name__}"))
+    _wake.set()
+
+
+def _claim(limit):
+    """Mark up to ``limit`` queued jobs as running, oldest first, within the
+    per-user limit and one dataset-changing job per file at a time."""
+    running = Job.objects.filter(status="running")
+    per_user = Counter(running.values_list("user_id", flat=True))
+    busy_files = set(running.filter(kind__in=EXCLUSIVE_KINDS).values_list("csv_file_id", flat=True))
+    capped = [user_id for user_id, count in per_user.items() if count >= USER_LIMIT]
+    queued = Job.objects.filter(status="queued").exclude(user_id__in=capped)
+    claimed = []
+    for job in queued.only("id", "user_id", "kind", "csv_file_id")[:limit * 10]:
+        if len(claimed) == limit:
+            break
+        exclusive = job.kind in EXCLUSIVE_KINDS
+        if per_user[job.user_id] >= USER_LIMIT or (exclusive and job.csv_file_id in busy_files):
+            continue
+        # Conditional update, so two processes never start the same job.
+        if not Job.objects.filter(pk=job.pk, status="queued").update(status="running", started_at=timezone.now()):
+            continue
+        per_user[job.user_id] += 1
+        if exclusive:
+            busy_files.add(job.csv_file_id)
+        claimed.append(job.pk)
+    return claimed
+
+
+def _expire():
+    # A timed-out worker keeps its slot until the task returns; its result
+    # is dropped like a cancelled job's, and an edit job no longer journals
+    # its edit (see tasks.edit_dataset).
+    now = timezone.now()
+    Job.objects.filter(status="running", started_at__lt=now - timedelta(seconds=TIMEOUT)).update(
+        status="failed", error="Timed out.", finished_at=now
+    )
+    Job.objects.filter(finished_at__lt=now - timedelta(seconds=RETENTION)).delete()
@@ -0,0 +1,160 @@
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .dataset_cache import dataset_cache
+from .edits import apply_edits
+from .models import CSVFile
+from .sketches import sketch_frame, update_sketches
+from .storage import (
+    dataset_version,
+    read_dataset,
+    read_snapshot,
+    remove_snapshots,
+    schema_from_frame,
+    write_snapshot,
+)
+
+
+COMPACT_AFTER = getattr(settings, "EDIT_JOURNAL_COMPACT_AFTER", 50)
+UNDO_DEPTH = getattr(settings, "EDIT_JOURNAL_UNDO_DEPTH", 10)
+BACKGROUND_COMPACTION = getattr(settings, "EDIT_JOURNAL_BACKGROUND_COMPACTION", True)
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock(csv_file_id):
+    with _locks_guard:
+        return _locks.setdefault(csv_file_id, threading.Lock())
+
+
+def _locked_file(csv_file):
+    return CSVFile.objects.select_for_update().get(pk=csv_file.pk)
+
+
+def _update_stats(csv_file, data, operation=None, payload=None):
+    csv_file.row_count = len(data)
+    csv_file.schema = schema_from_frame(data)
+    csv_file.sketches = update_sketches(csv_file.sketches, data, operation, payload)
+    csv_file.save(update_fields=["row_count", "schema", "sketches"])
+
+
+def record_edit(csv_file, operation, payload, data, row_index=None):
+    """Append an edit to the journal; ``data`` is the dataset with the edit
+    already applied and becomes the cached current version, along with its
+    updated ``row_index`` if the caller maintained one.
+
+    A new edit discards anything that could still be redone.
+    """
+    with _lock(csv_file.id), transaction.atomic():
+        locked = _locked_file(csv_file)
+        locked.edits.filter(undone=True).delete()
+        locked.edits.create(operation=operation, payload=payload)
+        locked.revision += 1
+        locked.save(update_fields=["revision"])
+        pending = locked.edits.filter(undone=False, id__gt=locked.snapshot_edit_id).count()
+    csv_file.revision = locked.revision
+    _update_stats(csv_file, data, operation, payload)
+    dataset_cache.set(
+        csv_file.id, dataset_version(csv_file), data.reset_index(drop=True), row_index=row_index
+    )
+    if pending > COMPACT_AFTER:
+        schedule_compaction(csv_file.id)
+
+
+def _move_history(csv_file, undone):
+    with _lock(csv_file.id), transaction.atomic():
+        locked = _locked_file(csv_file)
+        # Folded edits can no longer be undone.
+        edits = locked.edits.filter(undone=undone, id__gt=locked.snapshot_edit_id)
+        edit = edits.last() if not undone else edits.first()
+        if edit is None:
+            return None
+        edit.undone = not undone
+        edit.save(update_fields=["undone"])
+        locked.revision += 1
+        locked.save(update_fields=["revision"])
+    csv_file.revision = locked.revision
+    _update_stats(csv_file, read_dataset(csv_file))
+    return edit
+
+
+def undo_edit(csv_file):
+    """Undo the most recent edit still in the journal; returns it, or None."""
+    return _move_history(csv_file, undone=False)
+
+
+def redo_edit(csv_file):
+    """Reapply the earliest undone edit; returns it, or None."""
+    return _move_history(csv_file, undone=True)
+
+
+def compact_journal(csv_file_id):
+    """Fold all but the newest ``UNDO_DEPTH`` edits into a new snapshot, and
+    rebuild the column sketches the edits made stale.
+
+    The snapshot goes to new files, and the model switches to them together
+    with the id of the last folded edit, so a reader always replays exactly
+    the edits its snapshot lacks. The previous snapshot and its journal
+    entries are kept until the next compaction for readers still on it."""
+    with _lock(csv_file_id):
+        try:
+            csv_file = CSVFile.objects.get(pk=csv_file_id)
+        except CSVFile.DoesNotExist:
+            return
+        fold = csv_file.snapshot_edit_id
+        edits = list(csv_file.edits.filter(undone=False, id__gt=fold))
+        folded = edits[:max(len(edits) - UNDO_DEPTH, 0)]
+        if not folded:
+            return
+        previous = [csv_file.file.name, csv_file.columnar_file.name]
+        revision = csv_file.revision
+        current = dataset_cache.get(csv_file_id, dataset_version(csv_file))
+        data = read_snapshot(csv_file)
+        data = apply_edits(data, [(edit.operation, edit.payload) for edit in folded])
+        data = data.reset_index(drop=True)
+        names = write_snapshot(csv_file, data, folded[-1].id)
+        with transaction.atomic():
+            locked = _locked_file(csv_file)
+            # Another process may have undone a folded edit or compacted
+            # since the journal was read.
+            switched = locked.snapshot_edit_id == fold and not locked.edits.filter(
+                id__in=[edit.id for edit in folded], undone=True
+            ).exists()
+            if switched:
+                CSVFile.objects.filter(pk=csv_file_id).update(snapshot_edit_id=folded[-1].id, **names)
+                locked.edits.filter(id__lte=fold).delete()
+        if not switched:
+            for name in names.values():
+                if name:
+                    csv_file.file.storage.delete(name)
+            return
+        csv_file.refresh_from_db()
+        if csv_file.revision != revision:
+            current = None
+        remove_snapshots(csv_file, keep=previous + list(names.values()))
+        csv_file.memory_bytes = int(data.memory_usage(index=True, deep=True).sum())
+        csv_file.save(update_fields=["memory_bytes"])
+        if current is not None:
+            # Same content as before, now keyed by the new snapshot.
+            dataset_cache.set(csv_file_id, dataset_version(csv_file), current)
+        if csv_file.sketches.get("stale"):
+            sketches = sketch_frame(current if current is not None else read_dataset(csv_file)).to_dict()
+            # Skipped if an edit landed meanwhile; the next compaction catches up.
+            CSVFile.objects.filter(pk=csv_file_id, revision=csv_file.revision).update(sketches=sketches)
+
+
+def _compact_in_background(csv_file_id):
+    try:
+        compact_journal(csv_file_id)
+    finally:
+        connection.close()
+
+
+def schedule_compaction(csv_file_id):
+    if not BACKGROUND_COMPACTION:
+        compact_journal(csv_file_id)
+        return
+    threading.Thread(target=_compact_in_background, args=(csv_file_id,), daemon=True).start()
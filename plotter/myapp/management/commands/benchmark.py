@@ -0,0 +1,268 @@
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from myapp import jobs
+from myapp.models import SavedPlot
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmark-baseline.json"
+
+PLOT_OPTIONS = {
+    "bar": {"bar_mode": "group", "orientation": "v", "bar_width": "0.8", "opacity": "1", "aggregate": "sum"},
+    "box": {"show_boxpoints": "on"},
+    "histogram": {"num_bins": "40"},
+    "line": {"line_width": "2", "legend_position": "top", "downsample": "on", "point_budget": "2000"},
+    "pie": {"hole_size": "0", "label_position": "inside", "aggregate": "sum", "top_n": "10"},
+    "scatter": {"marker_size": "5", "downsample": "on", "point_budget": "2000"},
+}
+
+
+# Synthetic datasets
+
+def features_frame(rows, rng):
+    """Rows shaped like csv_files/Features_data_set.csv: weekly figures for
+    45 stores, markdowns mostly missing."""
+    dates = pd.Timestamp("2010-02-05") + pd.to_timedelta(rng.integers(0, 182, rows) * 7, unit="D")
+    data = pd.DataFrame({
+        "Store": rng.integers(1, 46, rows),
+        "Date": dates.strftime("%d/%m/%Y"),
+        "Temperature": rng.normal(60, 18, rows).round(2),
+        "Fuel_Price": rng.uniform(2.4, 4.5, rows).round(3),
+    })
+    for i in range(1, 6):
+        markdown = rng.gamma(1.5, 4000, rows).round(2)
+        markdown[rng.random(rows) < 0.6] = np.nan
+        data[f"MarkDown{i}"] = markdown
+    data["CPI"] = rng.uniform(126, 228, rows).round(7)
+    data["Unemployment"] = rng.uniform(3.6, 14.3, rows).round(3)
+    data["IsHoliday"] = rng.random(rows) < 0.07
+    return data
+
+
+def wide_frame(rows, rng):
+    data = features_frame(rows, rng)
+    extra = pd.DataFrame(rng.normal(0, 1, (rows, 100)).round(4), columns=[f"Metric{i}" for i in range(100)])
+    return pd.concat([data, extra], axis=1)
+
+
+def categorical_frame(rows, rng):
+    data = features_frame(rows, rng)
+    data["Region"] = rng.choice(["North", "South", "East", "West", "Central", "Coast", "Hills", "Islands"], rows)
+    data["Department"] = np.char.add("Dept ", rng.integers(1, 100, rows).astype(str))
+    data["Product"] = np.char.add("SKU-", rng.zipf(1.3, rows).clip(max=20_000).astype(str))
+    return data
+
+
+# Variant -> (frame builder, category column, value column) for the plots.
+VARIANTS = {
+    "features": (features_frame, "Store", "Temperature"),
+    "wide": (wide_frame, "Store", "Metric0"),
+    "categorical": (categorical_frame, "Department", "Fuel_Price"),
+}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every page and API of the app through the test client against synthetic datasets, "
+        "reporting latency percentiles, response sizes and memory, and compare with a stored baseline: "
+        "manage.py benchmark --sizes 2000,8000,1000000 --variants features,wide,categorical --save-baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="2000,8000,100000", help="Comma-separated dataset row counts.")
+        parser.add_argument(
+            "--variants", default="features,wide,categorical",
+            help=f"Comma-separated dataset shapes: {', '.join(VARIANTS)}.",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Requests per endpoint and dataset.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results file.")
+        parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Relative p50 latency or size increase over the baseline reported as a regression.",
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes takes comma-separated integers.")
+        variants = options["variants"].split(",")
+        unknown = set(variants) - set(VARIANTS)
+        if unknown:
+            raise CommandError(f"Unknown variants: {', '.join(sorted(unknown))}.")
+
+        results = {}
+        with tempfile.TemporaryDirectory(prefix="plotter-benchmark-") as workdir:
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            # Job workers are separate processes that cannot see the test
+            # database; everything renders in the request, which is what is
+            # being timed anyway.
+            try:
+                with override_settings(MEDIA_ROOT=workdir), mock.patch.object(jobs, "MIN_ROWS", math.inf):
+                    for variant in variants:
+                        for rows in sizes:
+                            dataset = f"{variant}-{rows}"
+                            self.stdout.write(f"{dataset}: generating")
+                            path = self.write_csv(workdir, variant, rows, options["seed"])
+                            results.update(self.run_dataset(dataset, variant, path, options["repeat"]))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        self.report(results)
+        report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "options": {
+            key: options[key] for key in ("sizes", "variants", "repeat", "seed")
+        }, "results": results}
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+        baseline_path = Path(options["baseline"])
+        regressions = []
+        if baseline_path.exists() and not options["save_baseline"]:
+            baseline = json.loads(baseline_path.read_text())
+            regressions = self.compare(results, baseline["results"], options["tolerance"])
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Baseline saved to {baseline_path}")
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} regressions against {baseline_path}.")
+
+    def write_csv(self, workdir, variant, rows, seed):
+        build = VARIANTS[variant][0]
+        path = Path(workdir) / f"{variant}-{rows}.csv"
+        build(rows, np.random.default_rng(seed)).to_csv(path, index=False)
+        return path
+
+    def run_dataset(self, dataset, variant, path, repeat):
+        _, category, value = VARIANTS[variant]
+        user = User.objects.create_user(f"bench-{dataset}", password="bench")
+        client = Client()
+        client.force_login(user)
+        results = {}
+
+        def measure(endpoint, request, times=repeat):
+            latencies, sizes = [], []
+            for i in range(times):
+                start = time.perf_counter()
+                response = request(i)
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                latencies.append((time.perf_counter() - start) * 1000)
+                sizes.append(len(body))
+                if response.status_code >= 400:
+                    raise CommandError(f"{dataset} {endpoint}: HTTP {response.status_code}")
+            p50, p95 = np.percentile(latencies, [50, 95])
+            results[f"{dataset}/{endpoint}"] = {
+                "requests": times,
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "max_ms": round(max(latencies), 2),
+                "bytes": int(np.mean(sizes)),
+                "rss_mb": rss_mb(),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            }
+            self.stdout.write(f"  {endpoint:24} p50 {p50:9.1f} ms  p95 {p95:9.1f} ms  {int(np.mean(sizes)):>10} B")
+
+        def upload(i):
+            with open(path, "rb") as f:
+                return client.post("/data/", {"csv_file": f})
+
+        self.stdout.write(f"{dataset}: {path.stat().st_size / 2**20:.1f} MB")
+        measure("upload", upload)
+        measure("data", lambda i: client.get("/data/", {"page": i + 1}))
+        measure("data_sorted", lambda i: client.get("/data/", {"page": i + 1, "sort": value, "order": "desc"}))
+        measure("data_filtered", lambda i: client.get("/data/", {"filter_column": category, "filter": "1"}))
+        measure("edit", lambda i: client.post("/data/", {
+            "edit_value": "1", "row_id": str(i), "column": "Temperature", "new_value": str(50 + i),
+        }))
+        measure("undo", lambda i: client.post("/data/", {"undo_edit": "1"}))
+        measure("describe", lambda i: client.get("/describe"))
+        measure("select_plot", lambda i: client.get("/selectPlot"))
+
+        for plot_type, plot_options in PLOT_OPTIONS.items():
+            x, y = (value, "Fuel_Price") if plot_type in ("histogram", "scatter") else (category, value)
+            if plot_type == "line":
+                x = "Index"
+            form = {"x_column": x, "y_column": y, "x_axis_label": "", "y_axis_label": "", "title_font_size": "24",
+                    f"{plot_type}_plot": "1", **plot_options}
+            # A new title each time makes every render miss the figure cache.
+            measure(f"{plot_type}_render", lambda i: client.post(f"/{plot_type}", {**form, "plot_title": f"Bench {i}"}))
+            measure(f"{plot_type}_cached", lambda i: client.get(f"/{plot_type}"))
+            measure(f"{plot_type}_save", lambda i: client.post(f"/{plot_type}", {**form, "save": "1"}), times=1)
+            measure(f"{plot_type}_save_live", lambda i: client.post(f"/{plot_type}", {**form, "save": "live"}), times=1)
+
+        plots = list(SavedPlot.objects.filter(user=user).values_list("id", flat=True))
+        measure("export", lambda i: client.get("/export/"))
+        measure("plots_api", lambda i: client.get("/api/plots"))
+        measure("plot_data", lambda i: client.get(f"/api/plots/{plots[i % len(plots)]}/data"))
+        measure("thumbnail", lambda i: client.get(f"/api/plots/{plots[i % len(plots)]}/thumbnail.svg"))
+        measure("export_zip", lambda i: client.post("/export/zip", {"format": "html", "all": "1"}), times=1)
+        return results
+
+    def report(self, results):
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':48} {'p50 ms':>9} {'p95 ms':>9} {'bytes':>11} {'peak RSS':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:48} {result['p50_ms']:9.1f} {result['p95_ms']:9.1f} {result['bytes']:11} "
+                f"{result['peak_rss_mb']:8.0f}M"
+            )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        self.stdout.write("")
+        self.stdout.write(f"{'against baseline':48} {'p50':>9} {'p95':>9} {'bytes':>11}")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            changes = {
+                key: result[key] / before[key] - 1 if before[key] else 0.0
+                for key in ("p50_ms", "p95_ms", "bytes")
+            }
+            regressed = changes["p50_ms"] > tolerance or changes["bytes"] > tolerance
+            line = f"{name:48} {changes['p50_ms']:+9.0%} {changes['p95_ms']:+9.0%} {changes['bytes']:+11.0%}"
+            if regressed:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line + "  regression"))
+            else:
+                self.stdout.write(line)
+        missing = set(baseline) - set(results)
+        if missing:
+            self.stdout.write(f"{len(missing)} baseline endpoints were not run.")
+        self.stdout.write(f"{len(regressions)} regressions beyond {tolerance:.0%}.")
+        return regressions
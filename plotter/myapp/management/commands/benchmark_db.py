@@ -0,0 +1,237 @@
+import io
+import math
+import multiprocessing
+import queue
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+
+# This module is imported by the spawned workers before django.setup(), so
+# models and views are only imported inside functions.
+
+OPERATIONS = ("upload", "save", "session")
+
+PLOT_FORM = {
+    "x_column": "Store", "y_column": "Temperature", "x_axis_label": "", "y_axis_label": "",
+    "title_font_size": "24", "bar_plot": "1", "bar_mode": "group", "orientation": "v",
+    "bar_width": "0.8", "opacity": "1", "aggregate": "sum",
+}
+
+
+def sample_csv(rows, seed=0):
+    from myapp.management.commands.benchmark import features_frame
+
+    buffer = io.StringIO()
+    features_frame(rows, np.random.default_rng(seed)).to_csv(buffer, index=False)
+    return buffer.getvalue().encode()
+
+
+def _setup(database, media_root):
+    django.setup()
+    from django.test.utils import setup_test_environment
+    from myapp import jobs
+
+    setup_test_environment()
+    connection.close()
+    connection.settings_dict.update(database)
+    settings.DATABASES["default"].update(database)
+    settings.MEDIA_ROOT = media_root
+    # Everything runs in the request, as it does for small datasets.
+    jobs.MIN_ROWS = math.inf
+
+
+def _worker(index, database, media_root, operations, seconds, csv, barrier, results):
+    """One web worker process: sets up its users, then runs ``operations``
+    in turn until ``seconds`` have passed."""
+    _setup(database, media_root)
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    plotter = Client()
+    plotter.force_login(User.objects.get(username=f"bench-db-{index}"))
+    # Uploads go to another user, so they do not invalidate the plotted dataset.
+    uploader = Client()
+    uploader.force_login(User.objects.get(username=f"bench-db-upload-{index}"))
+
+    def upload(i):
+        data = io.BytesIO(csv)
+        data.name = f"bench-{index}-{i}.csv"
+        return uploader.post("/data/", {"csv_file": data})
+
+    def save(i):
+        return plotter.post("/bar", {"save": "1", "plot_title": f"Saved {index}-{i}"})
+
+    def session(i):
+        # Two titles in turn: both figures are cached after the first round,
+        # so what is left is the session and plot state write.
+        return plotter.post("/bar", {**PLOT_FORM, "plot_title": f"Title {i % 2}"})
+
+    run = {"upload": upload, "save": save, "session": session}
+    data = io.BytesIO(csv)
+    data.name = f"bench-{index}.csv"
+    plotter.post("/data/", {"csv_file": data})
+    session(0)
+    session(1)
+
+    latencies = {name: [] for name in operations}
+    errors = {name: 0 for name in operations}
+    barrier.wait()
+    start = time.perf_counter()
+    i = 0
+    while time.perf_counter() - start < seconds:
+        name = operations[i % len(operations)]
+        began = time.perf_counter()
+        try:
+            failed = run[name](i).status_code >= 500
+        except DatabaseError:
+            failed = True
+        if failed:
+            errors[name] += 1
+        else:
+            latencies[name].append((time.perf_counter() - began) * 1000)
+        i += 1
+    elapsed = time.perf_counter() - start
+    connection.close()
+    results.put((elapsed, latencies, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how upload, plot save and session write throughput scales with the number of "
+        "worker processes on the configured database (PLOTTER_DB_ENGINE), using a test database: "
+        "manage.py benchmark_db --workers 1,2,4,8 --sqlite-defaults"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker process counts.")
+        parser.add_argument("--seconds", type=float, default=10, help="Run time per worker count.")
+        parser.add_argument(
+            "--operations", default=",".join(OPERATIONS),
+            help=f"Comma-separated operations each worker runs in turn: {', '.join(OPERATIONS)}.",
+        )
+        parser.add_argument("--rows", type=int, default=500, help="Rows of the uploaded CSV.")
+        parser.add_argument(
+            "--sqlite-defaults", action="store_true",
+            help="Also run with Django's default SQLite options (rollback journal, deferred "
+                 "transactions, 5 s timeout) for comparison.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(count) for count in options["workers"].split(",")]
+        except ValueError:
+            raise CommandError("--workers takes comma-separated integers.")
+        operations = options["operations"].split(",")
+        unknown = set(operations) - set(OPERATIONS)
+        if unknown:
+            raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}.")
+        sqlite = connection.vendor == "sqlite"
+        if options["sqlite_defaults"] and not sqlite:
+            raise CommandError("--sqlite-defaults needs the SQLite database.")
+
+        configs = [("configured", connection.settings_dict["OPTIONS"])]
+        if options["sqlite_defaults"]:
+            configs.insert(0, ("sqlite defaults", {}))
+        csv = sample_csv(options["rows"])
+        results = []
+        with tempfile.TemporaryDirectory(prefix="plotter-benchmark-db-") as workdir:
+            for label, db_options in configs:
+                for workers in worker_counts:
+                    result = self.run_config(workdir, label, db_options, sqlite, workers, operations, csv, options)
+                    results.append(result)
+        self.report(results, operations)
+
+    def run_config(self, workdir, label, db_options, sqlite, workers, operations, csv, options):
+        from django.contrib.auth.models import User
+        from django.test.utils import setup_test_environment, teardown_test_environment
+
+        saved = {key: connection.settings_dict.get(key) for key in ("OPTIONS", "TEST")}
+        connection.close()
+        connection.settings_dict["OPTIONS"] = db_options
+        if sqlite:
+            # A file, not SQLite's in-memory test database, so the workers share it.
+            name = f"{label.replace(' ', '-')}-{workers}.sqlite3"
+            connection.settings_dict["TEST"] = {**(saved["TEST"] or {}), "NAME": str(Path(workdir) / name)}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for index in range(workers):
+                User.objects.create_user(f"bench-db-{index}")
+                User.objects.create_user(f"bench-db-upload-{index}")
+            database = {key: connection.settings_dict[key] for key in ("NAME", "OPTIONS")}
+            connection.close()
+
+            # Spawned like the job workers, so none inherits this connection.
+            context = multiprocessing.get_context("spawn")
+            barrier = context.Barrier(workers + 1)
+            results = context.Queue()
+            media_root = str(Path(workdir) / "media")
+            processes = [
+                context.Process(
+                    target=_worker,
+                    args=(index, database, media_root, operations, options["seconds"], csv, barrier, results),
+                )
+                for index in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            self.stdout.write(f"{label}: {workers} workers")
+            try:
+                barrier.wait(timeout=600)
+            except threading.BrokenBarrierError:
+                raise CommandError("Workers failed to start; see their output above.")
+            collected = []
+            for _ in processes:
+                try:
+                    collected.append(results.get(timeout=options["seconds"] + 600))
+                except queue.Empty:
+                    break
+            for process in processes:
+                process.join()
+            if len(collected) < workers:
+                raise CommandError(f"{workers - len(collected)} workers failed; see their output above.")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            connection.settings_dict.update(saved)
+
+        latencies = {name: [] for name in operations}
+        throughput = dict.fromkeys(operations, 0.0)
+        errors = dict.fromkeys(operations, 0)
+        for elapsed, worker_latencies, worker_errors in collected:
+            for name in operations:
+                latencies[name].extend(worker_latencies[name])
+                throughput[name] += len(worker_latencies[name]) / elapsed
+                errors[name] += worker_errors[name]
+        return {
+            "config": label, "workers": workers, "throughput": throughput, "latencies": latencies, "errors": errors,
+        }
+
+    def report(self, results, operations):
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'database':18} {'workers':>7} {'operation':>10} {'ops/s':>8} {'scaling':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'errors':>7}"
+        )
+        single = {}
+        for result in results:
+            for name in operations:
+                latencies = result["latencies"][name]
+                throughput = result["throughput"][name]
+                if result["workers"] == 1:
+                    single[result["config"], name] = throughput
+                base = single.get((result["config"], name))
+                scaling = f"{throughput / base:7.2f}x" if base else f"{'':8}"
+                p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (math.nan, math.nan)
+                self.stdout.write(
+                    f"{result['config']:18} {result['workers']:7} {name:>10} {throughput:8.1f} {scaling} "
+                    f"{p50:8.1f} {p95:8.1f} {result['errors'][name]:7}"
+                )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import CSVFile
+from myapp.ingest import IngestError, ingest_csv
+from myapp.storage import columnar_enabled, convert_to_columnar, has_columnar
+
+
+class Command(BaseCommand):
+    help = "Backfill typed Feather sidecars and schemas for uploaded CSV files that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild sidecars even when one already exists, except for edited datasets.",
+        )
+
+    def handle(self, *args, **options):
+        if not columnar_enabled():
+            raise CommandError("pyarrow is required to write columnar sidecars.")
+
+        converted = skipped = failed = 0
+        for csv_file in CSVFile.objects.order_by("id").iterator():
+            if has_columnar(csv_file) and (csv_file.revision or not options["force"]):
+                # An edited dataset's snapshot is its data; the upload is stale.
+                skipped += 1
+                continue
+            try:
+                if csv_file.revision:
+                    # Its CSV is the snapshot the journal applies to.
+                    ok = convert_to_columnar(csv_file)
+                else:
+                    ingest_csv(csv_file)
+                    ok = has_columnar(csv_file)
+            except (IngestError, OSError, ValueError) as e:
+                self.stderr.write(f"{csv_file.file.name}: {e}")
+                ok = False
+            if ok:
+                converted += 1
+            else:
+                failed += 1
+                self.stderr.write(f"{csv_file.file.name}: kept as CSV")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Converted {converted}, skipped {skipped}, failed {failed}."
+            )
+        )
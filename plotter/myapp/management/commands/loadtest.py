@@ -0,0 +1,113 @@
+import re
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running deployments of this project and compare throughput and latency, e.g. "
+        "`gunicorn plotter.wsgi -b :8001 --threads 8` against `uvicorn plotter.asgi:application --port 8002`: "
+        "manage.py loadtest http://127.0.0.1:8001 http://127.0.0.1:8002 --username bench --password ..."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="+", help="Base URLs of the servers to compare.")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request; repeat to mix pages. Default: /bar and /data/.",
+        )
+        parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous clients.")
+        parser.add_argument("--requests", type=int, default=400, help="Requests per target.")
+        parser.add_argument("--username", help="Log every client in as this user first.")
+        parser.add_argument("--password", default="")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ["/bar", "/data/"]
+        results = []
+        for target in options["targets"]:
+            target = target.rstrip("/")
+            self.stdout.write(f"{target}: {options['requests']} requests from {options['concurrency']} clients")
+            results.append((target, self.run(target, paths, options)))
+
+        self.stdout.write("")
+        self.stdout.write(f"{'target':40} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for target, result in results:
+            self.stdout.write(
+                f"{target:40} {result['throughput']:8.1f} {result['p50']:8.1f} "
+                f"{result['p95']:8.1f} {result['p99']:8.1f} {result['errors']:7}"
+            )
+        if len(results) > 1:
+            base = results[0][1]["throughput"]
+            for target, result in results[1:]:
+                self.stdout.write(f"{target}: {result['throughput'] / base:.2f}x the throughput of {results[0][0]}")
+
+    def run(self, target, paths, options):
+        clients = [self.client(target, options) for _ in range(options["concurrency"])]
+        latencies = []
+        errors = []
+        counter = iter(range(options["requests"]))
+        lock = threading.Lock()
+
+        def work(opener):
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                path = paths[n % len(paths)]
+                start = time.perf_counter()
+                try:
+                    with opener.open(target + path, timeout=120) as response:
+                        response.read()
+                    ok = True
+                except (HTTPError, URLError, OSError):
+                    ok = False
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    (latencies if ok else errors).append(elapsed)
+
+        threads = [threading.Thread(target=work, args=(opener,)) for opener in clients]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (np.nan,) * 3
+        return {"throughput": len(latencies) / wall, "p50": p50, "p95": p95, "p99": p99, "errors": len(errors)}
+
+    def client(self, target, options):
+        jar = CookieJar()
+        opener = build_opener(HTTPCookieProcessor(jar))
+        if not options["username"]:
+            return opener
+        try:
+            with opener.open(f"{target}/login/", timeout=30) as response:
+                page = response.read().decode()
+        except (HTTPError, URLError, OSError) as e:
+            raise CommandError(f"{target}: cannot reach the login page: {e}")
+        token = next((cookie.value for cookie in jar if cookie.name == "csrftoken"), None)
+        if token is None:
+            match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page)
+            token = match.group(1) if match else ""
+        form = urlencode({
+            "csrfmiddlewaretoken": token,
+            "username": options["username"],
+            "password": options["password"],
+        }).encode()
+        request = Request(f"{target}/login/", data=form, headers={"Referer": f"{target}/login/"})
+        with opener.open(request, timeout=30):
+            pass
+        if not any(cookie.name == "sessionid" for cookie in jar):
+            raise CommandError(f"{target}: login as {options['username']} failed.")
+        return opener
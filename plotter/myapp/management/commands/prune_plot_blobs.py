@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from myapp.plot_store import prune_blobs
+
+
+class Command(BaseCommand):
+    help = "Delete stored plot data arrays that no saved plot refers to any more, e.g. after plots were deleted."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_blobs()} unused plot data blobs.")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from myapp.plot_state import prune_expired
+
+
+class Command(BaseCommand):
+    help = "Delete plot form values and specs kept outside sessions whose time to live has passed."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_expired()} expired plot state entries.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myapp.jobs import WORKERS, dispatch_forever
+
+
+class Command(BaseCommand):
+    help = "Run the background job dispatcher in the foreground, for deployments that set JOB_DISPATCH_IN_PROCESS = False."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Dispatching jobs to {WORKERS} worker processes.")
+        dispatch_forever()
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_alter_savedplot_uploaded_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='columnar_file',
+            field=models.FileField(blank=True, upload_to='columnar_files/'),
+        ),
+    ]
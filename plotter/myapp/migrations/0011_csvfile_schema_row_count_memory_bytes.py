@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_csvfile_columnar_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='schema',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='csvfile',
+            name='row_count',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='csvfile',
+            name='memory_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
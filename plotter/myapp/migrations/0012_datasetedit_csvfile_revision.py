@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_csvfile_schema_row_count_memory_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DatasetEdit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('set_value', 'Set value'), ('delete_rows', 'Delete rows'), ('delete_column', 'Delete column'), ('replace', 'Replace'), ('clean', 'Clean')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('undone', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('csv_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edits', to='myapp.csvfile')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
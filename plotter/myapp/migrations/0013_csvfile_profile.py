@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_datasetedit_csvfile_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_csvfile_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='sketches',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedplot',
+            name='thumbnail',
+            field=models.TextField(blank=True),
+        ),
+    ]
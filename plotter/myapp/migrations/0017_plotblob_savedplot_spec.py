@@ -0,0 +1,172 @@
+# Generated by Django 5.1 on 2026-10-18 15:05
+
+import base64
+import gzip
+import hashlib
+import json
+
+from django.db import migrations, models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Copies of the myapp.plot_store helpers as of this migration, so it keeps
+# working whatever later becomes of that module.
+
+MIN_BLOB_BYTES = 1024
+CODEC = "zstd" if zstandard is not None else "gzip"
+
+
+def compress(raw):
+    if CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(raw)
+    return gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def decompress(codec, data):
+    data = bytes(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This plot was stored with zstd; install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _text_array(node):
+    return (
+        isinstance(node, list)
+        and len(node) > 1
+        and all(value is None or isinstance(value, str) for value in node)
+    )
+
+
+def split_figure(figure):
+    if isinstance(figure, str):
+        figure = json.loads(figure)
+    arrays = {}
+
+    def add(raw, kind, rest):
+        digest = hashlib.sha256(kind.encode() + b"\0" + raw).hexdigest()
+        arrays[digest] = raw
+        return {**rest, "blob": digest}
+
+    def add_json(value):
+        raw = json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+        if len(raw) >= MIN_BLOB_BYTES:
+            return add(raw, "json", {"encoding": "json"})
+        return value
+
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("bdata"), str) and "dtype" in node:
+                raw = base64.b64decode(node["bdata"])
+                if len(raw) >= MIN_BLOB_BYTES:
+                    rest = {key: value for key, value in node.items() if key != "bdata"}
+                    return add(raw, f"{node['dtype']}{node.get('shape', '')}", rest)
+                return node
+            return {key: walk(value) for key, value in node.items()}
+        if _text_array(node):
+            return add_json(node)
+        if isinstance(node, list):
+            return [walk(value) for value in node]
+        return node
+
+    layout = dict(figure.get("layout") or {})
+    template = layout.pop("template", None)
+    spec = walk({**figure, "layout": layout}) if "layout" in figure else walk(figure)
+    if template is not None:
+        spec["layout"]["template"] = add_json(template)
+    return spec, arrays
+
+
+def join_figure(spec, arrays):
+    def walk(node):
+        if isinstance(node, dict):
+            if "blob" in node:
+                raw = arrays[node["blob"]]
+                if node.get("encoding") == "json":
+                    return json.loads(raw)
+                rest = {key: value for key, value in node.items() if key != "blob"}
+                return {**rest, "bdata": base64.b64encode(raw).decode("ascii")}
+            return {key: walk(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [walk(value) for value in node]
+        return node
+
+    return walk(spec)
+
+
+def store_arrays(blob_model, arrays):
+    existing = set(blob_model.objects.filter(digest__in=list(arrays)).values_list("digest", flat=True))
+    blob_model.objects.bulk_create(
+        [
+            blob_model(digest=digest, codec=CODEC, data=compress(raw), size=len(raw))
+            for digest, raw in arrays.items()
+            if digest not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    return list(arrays)
+
+
+def load_arrays(blob_model, digests):
+    blobs = blob_model.objects.filter(digest__in=list(digests))
+    return {blob.digest: decompress(blob.codec, blob.data) for blob in blobs}
+
+
+def split_plot_data(apps, schema_editor):
+    SavedPlot = apps.get_model('myapp', 'SavedPlot')
+    PlotBlob = apps.get_model('myapp', 'PlotBlob')
+    for plot in SavedPlot.objects.iterator(chunk_size=100):
+        figure = plot.plot_data
+        plot.spec, arrays = split_figure(figure if isinstance(figure, (str, dict)) else json.dumps(figure))
+        plot.save(update_fields=['spec'])
+        plot.blobs.set(store_arrays(PlotBlob, arrays))
+
+
+def join_plot_data(apps, schema_editor):
+    SavedPlot = apps.get_model('myapp', 'SavedPlot')
+    PlotBlob = apps.get_model('myapp', 'PlotBlob')
+    for plot in SavedPlot.objects.iterator(chunk_size=100):
+        arrays = load_arrays(PlotBlob, plot.blobs.values_list('digest', flat=True))
+        # Restored in the old form: the figure's JSON text.
+        plot.plot_data = json.dumps(join_figure(plot.spec, arrays))
+        plot.save(update_fields=['plot_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_savedplot_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('codec', models.CharField(max_length=10)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='savedplot',
+            name='spec',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='savedplot',
+            name='blobs',
+            field=models.ManyToManyField(blank=True, related_name='plots', to='myapp.plotblob'),
+        ),
+        migrations.AlterField(
+            model_name='savedplot',
+            name='plot_data',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(split_plot_data, join_plot_data),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 15:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_plotblob_savedplot_spec'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='savedplot',
+            name='plot_data',
+        ),
+    ]
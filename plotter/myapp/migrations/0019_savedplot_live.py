@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_remove_savedplot_plot_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedplot',
+            name='csv_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='saved_plots', to='myapp.csvfile'),
+        ),
+        migrations.AddField(
+            model_name='savedplot',
+            name='dataset_hash',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='savedplot',
+            name='mode',
+            field=models.CharField(choices=[('frozen', 'Frozen figure'), ('live', 'Live from dataset')], default='frozen', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='savedplot',
+            name='params',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
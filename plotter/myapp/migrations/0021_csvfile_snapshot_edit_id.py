@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0020_plotstateentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='snapshot_edit_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
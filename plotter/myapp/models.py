@@ -1,20 +1,153 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class CSVFile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
     file = models.FileField(upload_to='csv_files/')
+    columnar_file = models.FileField(upload_to='columnar_files/', blank=True)
+    schema = models.JSONField(default=dict, blank=True)
+    row_count = models.BigIntegerField(null=True, blank=True)
+    memory_bytes = models.BigIntegerField(null=True, blank=True)
+    revision = models.PositiveIntegerField(default=0)
+    # Journal entries up to this id are folded into the stored snapshot.
+    snapshot_edit_id = models.PositiveBigIntegerField(default=0)
+    profile = models.JSONField(default=dict, blank=True)
+    sketches = models.JSONField(default=dict, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.file.name
+
+
+class DatasetEdit(models.Model):
+    """One entry of a CSVFile's append-only edit journal."""
+    OPERATIONS = [
+        ('set_value', 'Set value'),
+        ('delete_rows', 'Delete rows'),
+        ('delete_column', 'Delete column'),
+        ('replace', 'Replace'),
+        ('clean', 'Clean'),
+    ]
+
+    csv_file = models.ForeignKey(CSVFile, on_delete=models.CASCADE, related_name='edits')
+    operation = models.CharField(max_length=20, choices=OPERATIONS)
+    payload = models.JSONField(default=dict, blank=True)
+    undone = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.csv_file} #{self.id} {self.operation}"
     
+class Job(models.Model):
+    """Background work queued in the database and run by myapp.jobs."""
+    KINDS = [
+        ('plot', 'Plot rendering'),
+        ('edit', 'Data edit'),
+        ('profile', 'Data description'),
+    ]
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    csv_file = models.ForeignKey(CSVFile, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    # Identifies the work, e.g. the figure cache key, so repeats are not queued twice.
+    key = models.CharField(max_length=100, blank=True, db_index=True)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued', db_index=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def timings(self):
+        """Milliseconds spent waiting in the queue and running, so far."""
+        now = timezone.now()
+        run_ms = None
+        if self.started_at is not None:
+            run_ms = round(((self.finished_at or now) - self.started_at).total_seconds() * 1000)
+        wait_end = self.started_at or self.finished_at or now
+        return {"wait_ms": round((wait_end - self.created_at).total_seconds() * 1000), "run_ms": run_ms}
+
+
+class PlotBlob(models.Model):
+    """A compressed data array of saved figures, shared by content hash."""
+    digest = models.CharField(max_length=64, primary_key=True)
+    codec = models.CharField(max_length=10)
+    data = models.BinaryField()
+    size = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return self.digest
+
+
+class PlotStateEntry(models.Model):
+    """A large value of a user's plot state (myapp.plot_state), referenced
+    from their sessions by content digest until it expires."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='plot_state')
+    digest = models.CharField(max_length=64)
+    value = models.JSONField()
+    size = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'digest'], name='unique_plot_state_digest'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.digest}"
+
+
 class SavedPlot(models.Model):
+    MODES = [
+        ('frozen', 'Frozen figure'),
+        ('live', 'Live from dataset'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     plot_type = models.CharField(max_length=50)
-    plot_data = models.JSONField()
+    mode = models.CharField(max_length=10, choices=MODES, default='frozen')
+    # Frozen plots: figure JSON with its large arrays moved to blobs
+    # (myapp.plot_store).
+    spec = models.JSONField(default=dict)
+    blobs = models.ManyToManyField('PlotBlob', related_name='plots', blank=True)
+    # Live plots: the PlotViz spec, redrawn from the dataset as it is now;
+    # dataset_hash records the version it was saved from, so the gallery can
+    # mark plots whose data has changed since.
+    params = models.JSONField(default=dict, blank=True)
+    csv_file = models.ForeignKey(
+        CSVFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='saved_plots'
+    )
+    dataset_hash = models.CharField(max_length=100, blank=True)
     uploaded_at = models.DateTimeField(null=True, blank=True)
+    # SVG preview for the export gallery (myapp.thumbnails).
+    thumbnail = models.TextField(blank=True)
+
+    @property
+    def live(self):
+        return self.mode == 'live'
 
     def __str__(self):
         return self.title
@@ -0,0 +1,113 @@
+import operator
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .storage import dataset_version, map_dataset, read_dataset, read_rows
+
+
+ROW_ORDER_CACHE_SIZE = getattr(settings, "DATA_ROW_ORDER_CACHE_SIZE", 16)
+COMPARISONS = [
+    (">=", operator.ge),
+    ("<=", operator.le),
+    ("!=", operator.ne),
+    (">", operator.gt),
+    ("<", operator.lt),
+    ("=", operator.eq),
+]
+
+_row_orders = OrderedDict()
+_row_orders_lock = threading.Lock()
+
+
+def filter_mask(series, value):
+    """Rows of ``series`` matching ``value``.
+
+    Numeric columns accept a comparison such as ``>= 10`` (a bare number means
+    equality); anything else is a case-insensitive substring match.
+    """
+    value = value.strip()
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        compare, operand = operator.eq, value
+        for symbol, function in COMPARISONS:
+            if value.startswith(symbol):
+                compare, operand = function, value[len(symbol):].strip()
+                break
+        try:
+            return compare(series, float(operand)).to_numpy(dtype=bool)
+        except ValueError:
+            pass
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Match against the few categories rather than every row.
+        categories = series.cat.categories
+        matched = categories[categories.astype(str).str.contains(value, case=False, regex=False)]
+        return series.isin(matched).to_numpy()
+    return series.astype(str).str.contains(value, case=False, regex=False, na=False).to_numpy()
+
+
+def row_order(csv_file, sort=None, descending=False, filter_column=None, filter_value=None):
+    """Dataset positions to show, in display order, or None for every row in
+    file order. Results are cached per dataset version so paging through a
+    sorted or filtered view only pays for the sort once."""
+    if not sort and not (filter_column and filter_value):
+        return None
+    key = (csv_file.id, dataset_version(csv_file), sort, descending, filter_column, filter_value)
+    with _row_orders_lock:
+        positions = _row_orders.get(key)
+        if positions is not None:
+            _row_orders.move_to_end(key)
+            return positions
+
+    columns = list(dict.fromkeys(col for col in (sort, filter_column) if col))
+    data = map_dataset(csv_file, columns).reset_index(drop=True)
+    if filter_column and filter_value:
+        positions = np.flatnonzero(filter_mask(data[filter_column], filter_value))
+    else:
+        positions = np.arange(len(data))
+    if sort:
+        keys = data[sort].iloc[positions]
+        ordered = keys.sort_values(ascending=not descending, kind="stable", na_position="last")
+        positions = ordered.index.to_numpy()
+
+    with _row_orders_lock:
+        _row_orders[key] = positions
+        while len(_row_orders) > ROW_ORDER_CACHE_SIZE:
+            _row_orders.popitem(last=False)
+    return positions
+
+
+class DatasetRows:
+    """Sequence of table rows for ``Paginator``; slicing reads only that page."""
+
+    def __init__(self, csv_file, columns, positions=None, formatter=None):
+        self.csv_file = csv_file
+        self.columns = columns
+        self.positions = positions
+        self.formatter = formatter
+
+    def count(self):
+        if self.positions is not None:
+            return len(self.positions)
+        if self.csv_file.row_count is not None:
+            return self.csv_file.row_count
+        return len(read_dataset(self.csv_file, self.columns[:1]))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, step = key.indices(self.count())
+        if self.positions is not None:
+            positions = self.positions[start:stop:step]
+        else:
+            positions = np.arange(start, stop, step)
+        # Object dtype first, so integer columns are not upcast to float alongside float ones.
+        rows = read_rows(self.csv_file, positions, self.columns).astype(object).values.tolist()
+        if self.formatter is None:
+            return rows
+        return [[self.formatter(value) for value in row] for row in rows]
@@ -0,0 +1,189 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PlotStateEntry
+
+
+# Values whose JSON is longer than this are kept in PlotStateEntry rows and
+# only referenced from the session.
+INLINE_BYTES = getattr(settings, "PLOT_STATE_INLINE_BYTES", 256)
+TTL = timedelta(seconds=getattr(settings, "PLOT_STATE_TTL", 14 * 24 * 60 * 60))
+USER_MAX_BYTES = getattr(settings, "PLOT_STATE_USER_MAX_BYTES", 1024 * 1024)
+USER_MAX_ENTRIES = getattr(settings, "PLOT_STATE_USER_MAX_ENTRIES", 500)
+
+SESSION_KEY = "plot_state"
+REF = "$ref"
+_MISSING = object()
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":"), sort_keys=True)
+
+
+def _digest(raw):
+    # Short, as it is what the session keeps; entries are per user.
+    return hashlib.sha256(raw.encode()).hexdigest()[:20]
+
+
+def _is_ref(value):
+    return isinstance(value, dict) and len(value) == 1 and REF in value
+
+
+# Side store
+
+def put(user, value, raw, digest):
+    """Keep ``value`` (encoded as ``raw``) for ``user`` under ``digest``.
+    Values are keyed by content, so storing one again writes nothing unless
+    its entry has less than half its time left, which is then renewed."""
+    now = timezone.now()
+    entries = PlotStateEntry.objects.filter(user=user)
+    expires_at = entries.filter(digest=digest).values_list("expires_at", flat=True).first()
+    if expires_at is not None:
+        if expires_at < now + TTL / 2:
+            entries.filter(digest=digest).update(expires_at=now + TTL)
+        return
+    entries.bulk_create(
+        [PlotStateEntry(user=user, digest=digest, value=value, size=len(raw), expires_at=now + TTL)],
+        ignore_conflicts=True,
+    )
+    enforce_quota(user, now)
+
+
+def fetch(user, digests):
+    """The values of ``digests`` that have neither expired nor been evicted,
+    by digest. Entries read with less than half their time left are renewed."""
+    now = timezone.now()
+    entries = PlotStateEntry.objects.filter(user=user, digest__in=list(digests), expires_at__gt=now)
+    values = {}
+    stale = []
+    for digest, value, expires_at in entries.values_list("digest", "value", "expires_at"):
+        values[digest] = value
+        if expires_at < now + TTL / 2:
+            stale.append(digest)
+    if stale:
+        PlotStateEntry.objects.filter(user=user, digest__in=stale).update(expires_at=now + TTL)
+    return values
+
+
+def enforce_quota(user, now=None):
+    """Drop the user's expired entries, then those expiring first beyond
+    USER_MAX_ENTRIES or USER_MAX_BYTES. The newest entry is always kept."""
+    now = now or timezone.now()
+    entries = PlotStateEntry.objects.filter(user=user)
+    entries.filter(expires_at__lte=now).delete()
+    rows = list(entries.order_by("-expires_at", "-pk").values_list("pk", "size"))
+    total = 0
+    for keep, (pk, size) in enumerate(rows):
+        total += size
+        if keep and (keep >= USER_MAX_ENTRIES or total > USER_MAX_BYTES):
+            entries.filter(pk__in=[pk for pk, size in rows[keep:]]).delete()
+            break
+
+
+def prune_expired():
+    """Delete expired entries of every user; returns how many."""
+    deleted, _ = PlotStateEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+# Session
+
+class PlotState:
+    """The plot form values and specs of one session, under a single session
+    key. Small values sit in the session itself, larger ones in the side
+    store above, referenced by digest. The session is only marked modified
+    when a value actually changes, so resubmitting a form or viewing a plot
+    does not rewrite it."""
+
+    def __init__(self, request):
+        self.session = request.session
+        user = getattr(request, "user", None)
+        self.user = user if user is not None and user.is_authenticated else None
+        state = self.session.get(SESSION_KEY)
+        if not isinstance(state, dict):
+            state = {}
+        self.options = dict(state.get("options") or {})
+        # The specs of all plot types are one value: a single reference.
+        self.specs = state.get("specs", _MISSING)
+        self._fetched = {}
+
+    def __bool__(self):
+        return bool(self.options) or self.specs is not _MISSING
+
+    def _pack(self, value, current):
+        raw = _encode(value)
+        if self.user is None or len(raw) <= INLINE_BYTES:
+            return value
+        digest = _digest(raw)
+        if current != {REF: digest}:
+            put(self.user, value, raw, digest)
+        self._fetched[digest] = value
+        return {REF: digest}
+
+    def _unpack(self, packed, default=None):
+        """``packed`` values with references resolved, looked up together;
+        a value evicted from the side store reads as ``default``."""
+        missing = {
+            value[REF] for value in packed.values() if _is_ref(value) and value[REF] not in self._fetched
+        }
+        if missing and self.user is not None:
+            self._fetched.update(fetch(self.user, missing))
+        return {
+            key: self._fetched.get(value[REF], default) if _is_ref(value) else value
+            for key, value in packed.items()
+        }
+
+    def _save(self):
+        state = {"options": self.options}
+        if self.specs is not _MISSING:
+            state["specs"] = self.specs
+        self.session[SESSION_KEY] = state
+
+    def values(self, defaults):
+        """Form values for the keys of ``defaults``, or their defaults."""
+        packed = {key: self.options[key] for key in defaults if key in self.options}
+        values = self._unpack(packed, _MISSING)
+        return {
+            key: default if values.get(key, _MISSING) is _MISSING else values[key]
+            for key, default in defaults.items()
+        }
+
+    def all_values(self):
+        return self._unpack(self.options)
+
+    def update(self, values):
+        changed = False
+        for key, value in values.items():
+            current = self.options.get(key, _MISSING)
+            if current == value:
+                continue
+            packed = self._pack(value, current)
+            if packed != current:
+                self.options[key] = packed
+                changed = True
+        if changed:
+            self._save()
+
+    def all_specs(self):
+        if self.specs is _MISSING:
+            return {}
+        specs = self._unpack({"specs": self.specs})["specs"]
+        return specs if isinstance(specs, dict) else {}
+
+    def spec(self, name):
+        return self.all_specs().get(name)
+
+    def set_specs(self, specs):
+        packed = self._pack(specs, self.specs)
+        if packed != self.specs:
+            self.specs = packed
+            self._save()
+
+    def set_spec(self, name, spec):
+        specs = self.all_specs()
+        if specs.get(name) != spec:
+            self.set_specs({**specs, name: spec})
@@ -0,0 +1,165 @@
+import base64
+import gzip
+import hashlib
+import json
+
+from django.db import transaction
+
+from .models import PlotBlob
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Arrays smaller than this stay inline in the spec; a blob row costs more.
+MIN_BLOB_BYTES = 1024
+CODEC = "zstd" if zstandard is not None else "gzip"
+
+
+def compress(raw):
+    if CODEC == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(raw)
+    return gzip.compress(raw, compresslevel=6, mtime=0)
+
+
+def decompress(codec, data):
+    data = bytes(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This plot was stored with zstd; install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _text_array(node):
+    return (
+        isinstance(node, list)
+        and len(node) > 1
+        and all(value is None or isinstance(value, str) for value in node)
+    )
+
+
+def split_figure(figure):
+    """Split plotly figure JSON into a spec and its large arrays.
+
+    Returns ``(spec, arrays)``: ``spec`` is the figure with every large
+    array replaced by ``{"blob": digest, ...}`` and ``arrays`` maps each
+    digest to its uncompressed bytes. Numeric arrays keep plotly's typed
+    ``{"dtype", "bdata"}`` encoding as raw bytes; text arrays and the
+    layout template, the same in most figures, are stored as JSON. Digests
+    cover the content only, so identical columns share a blob across plots
+    and users.
+    """
+    if isinstance(figure, str):
+        figure = json.loads(figure)
+    arrays = {}
+
+    def add(raw, kind, rest):
+        digest = hashlib.sha256(kind.encode() + b"\0" + raw).hexdigest()
+        arrays[digest] = raw
+        return {**rest, "blob": digest}
+
+    def add_json(value):
+        raw = json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+        if len(raw) >= MIN_BLOB_BYTES:
+            return add(raw, "json", {"encoding": "json"})
+        return value
+
+    def walk(node):
+        if isinstance(node, dict):
+            if isinstance(node.get("bdata"), str) and "dtype" in node:
+                raw = base64.b64decode(node["bdata"])
+                if len(raw) >= MIN_BLOB_BYTES:
+                    rest = {key: value for key, value in node.items() if key != "bdata"}
+                    return add(raw, f"{node['dtype']}{node.get('shape', '')}", rest)
+                return node
+            return {key: walk(value) for key, value in node.items()}
+        if _text_array(node):
+            return add_json(node)
+        if isinstance(node, list):
+            return [walk(value) for value in node]
+        return node
+
+    layout = dict(figure.get("layout") or {})
+    template = layout.pop("template", None)
+    spec = walk({**figure, "layout": layout}) if "layout" in figure else walk(figure)
+    if template is not None:
+        spec["layout"]["template"] = add_json(template)
+    return spec, arrays
+
+
+def join_figure(spec, arrays):
+    """Inverse of ``split_figure``: the figure dict with arrays restored."""
+    def walk(node):
+        if isinstance(node, dict):
+            if "blob" in node:
+                raw = arrays[node["blob"]]
+                if node.get("encoding") == "json":
+                    return json.loads(raw)
+                rest = {key: value for key, value in node.items() if key != "blob"}
+                return {**rest, "bdata": base64.b64encode(raw).decode("ascii")}
+            return {key: walk(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [walk(value) for value in node]
+        return node
+
+    return walk(spec)
+
+
+def store_arrays(blob_model, arrays):
+    """Save the blobs not stored yet; returns all their digests."""
+    existing = set(blob_model.objects.filter(digest__in=list(arrays)).values_list("digest", flat=True))
+    blob_model.objects.bulk_create(
+        [
+            blob_model(digest=digest, codec=CODEC, data=compress(raw), size=len(raw))
+            for digest, raw in arrays.items()
+            if digest not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    return list(arrays)
+
+
+def load_arrays(blob_model, digests):
+    blobs = blob_model.objects.filter(digest__in=list(digests))
+    return {blob.digest: decompress(blob.codec, blob.data) for blob in blobs}
+
+
+def blob_digests(spec):
+    digests = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "blob" in node:
+                digests.append(node["blob"])
+            else:
+                for value in node.values():
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(spec)
+    return digests
+
+
+def save_figure(plot, figure):
+    """Save ``plot`` with ``figure`` (plotly JSON text or dict) as its spec
+    plus linked array blobs."""
+    plot.spec, arrays = split_figure(figure)
+    with transaction.atomic():
+        digests = store_arrays(PlotBlob, arrays)
+        plot.save()
+        plot.blobs.set(digests)
+
+
+def load_figure(plot):
+    return join_figure(plot.spec, load_arrays(PlotBlob, blob_digests(plot.spec)))
+
+
+def prune_blobs():
+    """Delete blobs no saved plot refers to any more; returns how many."""
+    deleted, _ = PlotBlob.objects.filter(plots=None).delete()
+    return deleted
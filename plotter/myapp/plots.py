@@ -0,0 +1,444 @@
+import uuid
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from django.conf import settings
+
+from .aggregation import aggregate_by, top_n_with_other
+from .downsample import bin_scatter, describe_reduction, downsample_line
+from .stats import box_stats, box_stats_chunked, histogram_counts, histogram_counts_chunked
+from .storage import dataset_size, iter_dataset_chunks, map_dataset
+from .timing import span
+
+
+PLOT_POINT_BUDGET = getattr(settings, "PLOT_POINT_BUDGET", 5000)
+PLOT_STREAMING_BYTES = getattr(settings, "PLOT_STREAMING_BYTES", 512 * 1024 * 1024)
+
+
+# Option parsers: ``parse(raw, default)`` for a submitted form value.
+
+def text(raw, default):
+    return raw
+
+
+def integer(raw, default):
+    try:
+        return int(raw)
+    except (ValueError, TypeError):
+        return default
+
+
+def number(raw, default):
+    try:
+        return float(raw)
+    except (ValueError, TypeError):
+        return default
+
+
+def optional_integer(raw, default):
+    return int(raw) if raw.isdigit() else None
+
+
+def optional_number(raw, default):
+    return float(raw) if raw.replace(".", "", 1).isdigit() else None
+
+
+def point_budget(raw, default):
+    return max(integer(raw, default), 10)
+
+
+class Option:
+    """One plot parameter: its spec ``name``, form field, key in the plot
+    state (read back by the plot templates), default and parser. A ``flag``
+    is a checkbox, true when present in the form."""
+
+    def __init__(self, name, default=None, parse=text, field=None, state_key=None, flag=False):
+        self.name = name
+        self.default = default
+        self.parse = parse
+        self.field = field or name
+        self.state_key = state_key or self.field
+        self.flag = flag
+
+    def from_post(self, post, default):
+        if self.flag:
+            return self.field in post
+        if self.field not in post:
+            return default
+        return self.parse(post[self.field], default)
+
+
+# Shared by every plot type; a submitted form keeps the previous value of a
+# field it does not include.
+COMMON_OPTIONS = [
+    Option("x_column", ""),
+    Option("y_column", ""),
+    Option("plot_title", "Data Plot"),
+    Option("plot_color"),
+    Option("plot_style"),
+    Option("x_axis_label", "x"),
+    Option("y_axis_label", "y"),
+    Option("title_font_size_input", 24, integer, field="title_font_size"),
+    Option("show_grid", False, flag=True),
+    Option("show_legend", False, flag=True),
+]
+
+DOWNSAMPLE_OPTIONS = [
+    Option("downsample", False, flag=True),
+    Option("point_budget", PLOT_POINT_BUDGET, point_budget),
+]
+
+
+class PlotType:
+    """A chart type as the stages of the plot pipeline.
+
+    ``columns(spec)`` picks the dataset columns to read, ``aggregate(source,
+    spec)`` reduces them to what is drawn, returning the data and an
+    optional note, and ``build(data, spec)`` makes the figure.
+    """
+
+    def __init__(self, name, template_name, build, aggregate=None, columns=None, options=()):
+        self.name = name
+        self.template_name = template_name
+        self.build = build
+        self.aggregate = aggregate or (lambda source, spec: (source.frame, None))
+        self.columns = columns or xy_columns
+        self.options = list(options)
+
+    @property
+    def label(self):
+        return self.name.capitalize()
+
+
+PLOT_TYPES = {}
+
+
+def xy_columns(spec):
+    return [spec.get("x_column"), spec.get("y_column")]
+
+
+def register(name, template_name, options=(), aggregate=None, columns=None):
+    """Register the decorated ``build(data, spec)`` as plot type ``name``."""
+    def decorator(build):
+        PLOT_TYPES[name] = PlotType(name, template_name, build, aggregate, columns, options)
+        return build
+    return decorator
+
+
+class PlotData:
+    """The columns a plot reads, loaded on first use; large datasets are
+    meant to be streamed in chunks instead."""
+
+    def __init__(self, csv_file, columns):
+        self.csv_file = csv_file
+        self.columns = columns
+        self.large = dataset_size(csv_file) > PLOT_STREAMING_BYTES
+        self._frame = None
+
+    def load(self):
+        """Read the columns now, if not done yet; returns the frame."""
+        if self._frame is None:
+            self._frame = map_dataset(self.csv_file, columns=self.columns)
+        return self._frame
+
+    @property
+    def frame(self):
+        return self.load()
+
+    def chunks(self):
+        return iter_dataset_chunks(self.csv_file, self.columns)
+
+
+def plot_columns(plot_type, spec, available):
+    columns = plot_type.columns if plot_type is not None else xy_columns
+    selected = [col for col in columns(spec) if col in available]
+    # Fall back to a single column so emptiness checks stay cheap.
+    return list(dict.fromkeys(selected)) or available[:1]
+
+
+def figure_div(figure_json):
+    """Plot div for ``figure_json``, as ``pio.to_html(full_html=False,
+    include_plotlyjs=False)`` would make it, but embedding the JSON already
+    serialized instead of encoding the figure a second time."""
+    div_id = str(uuid.uuid4())
+    return (
+        f'<div><div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>'
+        f'<script type="text/javascript">window.PLOTLYENV=window.PLOTLYENV || {{}};'
+        f'if (document.getElementById("{div_id}")) {{'
+        f'var figure = {figure_json};'
+        f'Plotly.newPlot("{div_id}", figure.data, figure.layout || {{}}, {{"responsive": true}});'
+        f'}}</script></div>'
+    )
+
+
+def pipeline(plot_type, source, spec):
+    """Run the pipeline for ``spec`` over ``source``, a ``PlotData``: load
+    the columns, aggregate, build and serialize once, each stage timed as a
+    span of the request. Returns the figure cache entry."""
+    with span("plot_select"):
+        if not source.large:
+            source.load()
+    with span("plot_aggregate"):
+        data, note = plot_type.aggregate(source, spec)
+    with span("plot_build"):
+        fig = plot_type.build(data, spec)
+    with span("plot_serialize"):
+        figure_json = pio.to_json(fig, validate=False)
+        entry = {"div": figure_div(figure_json), "figure": figure_json}
+    if note:
+        entry["note"] = note
+    return entry
+
+
+# Shared figure settings
+
+def title_font_size(spec):
+    try:
+        return int(spec["title_font_size_input"]) if spec["title_font_size_input"] else 24
+    except (ValueError, TypeError):
+        return 24
+
+
+def axis_labels(spec):
+    return spec["x_axis_label"] or spec["x_column"], spec["y_axis_label"] or spec["y_column"]
+
+
+def common_layout(fig, spec, axes=True):
+    layout = dict(
+        xaxis_showgrid=spec["show_grid"],
+        yaxis_showgrid=spec["show_grid"],
+        showlegend=spec["show_legend"],
+        title=dict(text=spec["plot_title"], font_size=title_font_size(spec)),
+    )
+    if axes:
+        layout["xaxis_title"], layout["yaxis_title"] = axis_labels(spec)
+    fig.update_layout(**layout)
+    return fig
+
+
+# Plot types
+
+def aggregate_bars(source, spec):
+    # One bar per category instead of one segment per raw row; horizontal
+    # bars take their categories from the y column.
+    x, y = spec["x_column"], spec["y_column"]
+    if spec["orientation"] == "h":
+        return aggregate_by(source.frame, y, x, spec.get("aggregate")), None
+    return aggregate_by(source.frame, x, y, spec.get("aggregate")), None
+
+
+@register(
+    "bar",
+    "myapp/plot/bar.html",
+    options=[
+        Option("bar_mode", "group"),
+        Option("orientation", "v"),
+        Option("bar_width", 0.8, number),
+        Option("opacity", 1.0, number),
+        Option("aggregate", "sum"),
+    ],
+    aggregate=aggregate_bars,
+)
+def bar_figure(data, spec):
+    fig = px.bar(
+        data,
+        x=spec["x_column"],
+        y=spec["y_column"],
+        title=spec["plot_title"],
+        template=spec["plot_style"],
+        orientation=spec["orientation"],
+    )
+    fig.update_traces(marker_color=spec["plot_color"], opacity=spec["opacity"], width=spec["bar_width"])
+    common_layout(fig, spec)
+    fig.update_layout(barmode=spec["bar_mode"])
+    return fig
+
+
+def aggregate_boxes(source, spec):
+    # Quartiles, fences and outliers are computed here so the payload does
+    # not grow with the row count; only a bounded set of points is sent.
+    stats = box_stats_chunked if source.large else box_stats
+    data = source.chunks if source.large else source.frame
+    boxes = stats(
+        data, spec["x_column"], spec["y_column"],
+        point_limit=PLOT_POINT_BUDGET, include_points=spec["show_boxpoints"],
+    )
+    return boxes, None
+
+
+@register(
+    "box",
+    "myapp/plot/box.html",
+    options=[Option("show_boxpoints", False, flag=True)],
+    aggregate=aggregate_boxes,
+)
+def box_figure(data, spec):
+    boxes, points = data
+    fig = go.Figure(
+        go.Box(
+            x=boxes.index.astype(str),
+            q1=boxes["q1"],
+            median=boxes["median"],
+            q3=boxes["q3"],
+            mean=boxes["mean"],
+            lowerfence=boxes["lowerfence"],
+            upperfence=boxes["upperfence"],
+            name=spec["y_column"],
+            boxpoints=False,
+        )
+    )
+    if spec["show_boxpoints"]:
+        fig.add_trace(
+            go.Scatter(
+                x=points["x"].astype(str),
+                y=points["y"],
+                mode="markers",
+                name=spec["y_column"],
+                showlegend=False,
+            )
+        )
+    if spec["plot_style"]:
+        fig.update_layout(template=spec["plot_style"])
+    if spec["plot_color"]:
+        fig.update_traces(marker_color=spec["plot_color"])
+    return common_layout(fig, spec)
+
+
+def aggregate_histogram(source, spec):
+    # Bins are counted here instead of shipping every value to the browser.
+    if source.large:
+        return histogram_counts_chunked(source.chunks, spec["x_column"], spec["num_bins"], spec["bin_width"]), None
+    return histogram_counts(source.frame[spec["x_column"]], spec["num_bins"], spec["bin_width"]), None
+
+
+@register(
+    "histogram",
+    "myapp/plot/histogram.html",
+    options=[
+        Option("num_bins", None, optional_integer),
+        Option("bin_width", None, optional_number),
+    ],
+    aggregate=aggregate_histogram,
+    columns=lambda spec: [spec["x_column"]],
+)
+def histogram_figure(bins, spec):
+    fig = go.Figure(go.Bar(x=bins["x"], y=bins["y"], width=bins["width"], name=spec["x_column"]))
+    fig.update_layout(bargap=0)
+    if spec["plot_style"]:
+        fig.update_layout(template=spec["plot_style"])
+    if spec["plot_color"]:
+        fig.update_traces(marker_color=spec["plot_color"])
+    return common_layout(fig, spec)
+
+
+def downsample_lines(source, spec):
+    if not spec.get("downsample"):
+        return source.frame, None
+    data, summary = downsample_line(
+        source.frame, spec["x_column"], spec["y_column"], spec["point_budget"], spec["downsample_method"]
+    )
+    return data, describe_reduction(summary)
+
+
+LEGEND_POSITIONS = {
+    "bottom": dict(yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+    "left": dict(yanchor="middle", y=0.5, xanchor="left", x=-0.1),
+    "right": dict(yanchor="middle", y=0.5, xanchor="right", x=1.1),
+}
+
+
+@register(
+    "line",
+    "myapp/plot/line.html",
+    options=[
+        Option("line_width", 2, integer),
+        Option("legend_position", "top"),
+        Option("downsample_method", "lttb"),
+        *DOWNSAMPLE_OPTIONS,
+    ],
+    aggregate=downsample_lines,
+)
+def line_figure(data, spec):
+    fig = px.line(
+        data,
+        x=spec["x_column"],
+        y=spec["y_column"],
+        title=spec["plot_title"],
+        template=spec["plot_style"],
+    )
+    if spec["plot_color"]:
+        fig.update_traces(line=dict(color=spec["plot_color"], width=spec["line_width"]))
+    common_layout(fig, spec)
+    fig.update_layout(
+        legend=LEGEND_POSITIONS.get(spec["legend_position"], dict(yanchor="top", y=1.02, xanchor="center", x=0.5))
+    )
+    return fig
+
+
+def aggregate_slices(source, spec):
+    return top_n_with_other(
+        source.frame, spec["x_column"], spec["y_column"], spec.get("aggregate"), spec.get("top_n", 0)
+    ), None
+
+
+@register(
+    "pie",
+    "myapp/plot/pie.html",
+    options=[
+        Option("hole_size", 0.0, number),
+        Option("label_position", "inside"),
+        Option("aggregate", "sum"),
+        Option("top_n", 10, integer),
+    ],
+    aggregate=aggregate_slices,
+)
+def pie_figure(data, spec):
+    fig = px.pie(
+        data,
+        names=spec["x_column"],
+        values=spec["y_column"],
+        title=spec["plot_title"],
+        template=spec["plot_style"],
+    )
+    if spec["hole_size"] > 0:
+        fig.update_traces(hole=spec["hole_size"])
+    fig.update_traces(textposition=spec["label_position"])
+    return common_layout(fig, spec, axes=False)
+
+
+def bin_points(source, spec):
+    if not spec.get("downsample"):
+        return source.frame, None
+    data, summary = bin_scatter(source.frame, spec["x_column"], spec["y_column"], spec["point_budget"])
+    return data, describe_reduction(summary)
+
+
+@register(
+    "scatter",
+    "myapp/plot/scatter.html",
+    options=[
+        Option("marker_type"),
+        Option("marker_size", 5, integer),
+        *DOWNSAMPLE_OPTIONS,
+    ],
+    aggregate=bin_points,
+)
+def scatter_figure(data, spec):
+    binned = spec.get("downsample") and "count" in data.columns
+    fig = px.scatter(
+        data,
+        x=spec["x_column"],
+        y=spec["y_column"],
+        title=spec["plot_title"],
+        template=spec["plot_style"],
+        # Density bins are coloured by how many points fell into them.
+        color="count" if binned else None,
+    )
+    if spec["marker_type"]:
+        fig.update_traces(marker=dict(symbol=spec["marker_type"]))
+    if binned:
+        fig.update_traces(marker=dict(size=spec["marker_size"]))
+    else:
+        fig.update_traces(marker=dict(size=spec["marker_size"], color=spec["plot_color"]))
+    return common_layout(fig, spec)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .sketches import DatasetSketch
+from .storage import dataset_hash, read_dataset
+
+
+EXACT_MAX_ROWS = getattr(settings, "PROFILE_EXACT_MAX_ROWS", 1_000_000)
+SUMMARY_ROWS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+# Figures a sketch-based profile only estimates.
+APPROXIMATE_ROWS = ["25%", "50%", "75%", "unique_count"]
+TOP_VALUES = 3
+
+
+def _plain(value):
+    """JSON-safe Python scalar; NaN becomes None."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _summary(series):
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return {"count": 0}
+    low, q1, median, q3, high = np.quantile(values, [0.0, 0.25, 0.5, 0.75, 1.0])
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if values.size > 1 else None,
+        "min": float(low),
+        "25%": float(q1),
+        "50%": float(median),
+        "75%": float(q3),
+        "max": float(high),
+    }
+
+
+def profile_frame(data):
+    """Per-column dtype, null and distinct counts, top values and, for
+    numeric columns, ``describe()``-style summary statistics.
+
+    Each column is hashed once (``value_counts`` yields both the distinct
+    count and the top values) and numeric columns are summarised from one
+    float array, so nothing is computed twice.
+    """
+    nulls = data.isna().sum()
+    columns = {}
+    for name in data.columns:
+        series = data[name]
+        counts = series.value_counts(sort=False)
+        top = counts.nlargest(TOP_VALUES)
+        columns[name] = {
+            "dtype": str(series.dtype),
+            "null_count": int(nulls[name]),
+            "unique_count": int(len(counts)),
+            "top_values": [[_plain(value), int(count)] for value, count in top.items()],
+            "summary": _summary(series) if _numeric(series) else None,
+        }
+    return {"rows": len(data), "columns": columns}
+
+
+def dataset_profile(csv_file, exact=False):
+    """Profile of the current dataset, stored on the model and recomputed
+    only when the dataset changes.
+
+    Datasets over ``EXACT_MAX_ROWS`` rows are answered from the column
+    sketches kept since upload (flagged ``approximate``) unless ``exact`` is
+    set or an exact profile of this version is already stored.
+    """
+    key = dataset_hash(csv_file)
+    if csv_file.profile.get("key") == key:
+        return csv_file.profile
+    if _use_sketches(csv_file, exact):
+        dtypes = {name: spec["dtype"] for name, spec in csv_file.schema.items()}
+        return DatasetSketch.from_dict(csv_file.sketches).profile(dtypes)
+    profile = profile_frame(read_dataset(csv_file))
+    profile["key"] = key
+    csv_file.profile = profile
+    csv_file.save(update_fields=["profile"])
+    return profile
+
+
+def _use_sketches(csv_file, exact):
+    return not exact and bool(csv_file.sketches) and (csv_file.row_count or 0) > EXACT_MAX_ROWS
+
+
+def profile_ready(csv_file, exact=False):
+    """Whether ``dataset_profile`` can answer without reading the dataset."""
+    return csv_file.profile.get("key") == dataset_hash(csv_file) or _use_sketches(csv_file, exact)
+
+
+def describe_table(profile):
+    """The ``describe()`` table plus dtype, null and distinct count rows."""
+    columns = profile["columns"]
+    table = pd.DataFrame(index=SUMMARY_ROWS + ["dtype", "null_count", "unique_count"], columns=list(columns), dtype=object)
+    for name, stats in columns.items():
+        if stats["summary"]:
+            for row in SUMMARY_ROWS:
+                value = stats["summary"].get(row)
+                table.at[row, name] = np.nan if value is None else round(value, 2)
+        table.at["dtype", name] = stats["dtype"]
+        table.at["null_count", name] = stats["null_count"]
+        table.at["unique_count", name] = stats["unique_count"]
+    if not any(stats["summary"] for stats in columns.values()):
+        table = table.drop(index=SUMMARY_ROWS)
+    return table
@@ -0,0 +1,320 @@
+import base64
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+HLL_PRECISION = 12
+CMS_DEPTH = 4
+CMS_WIDTH = 2048
+DIGEST_COMPRESSION = 200
+CANDIDATES = 20
+# Count-min rows are derived from two hashes (Kirsch-Mitzenmacher): pandas'
+# default key, shared with the HyperLogLog, and this one.
+_SECOND_HASH_KEY = "count-min-sketch"
+
+
+def _encode(array):
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes())).decode("ascii")
+
+
+def _decode(text, dtype, shape):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).reshape(shape).copy()
+
+
+def _kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    return "text"
+
+
+def _canonical(series, kind):
+    """Values in a dtype-independent form, so hashes survive dtype changes
+    such as an int8 column widened by an edit, or bools held in an object
+    Series of candidates."""
+    if kind == "number":
+        return series.astype("float64")
+    if kind == "text":
+        return series.astype(object)
+    return series.astype("uint8")
+
+
+def _hashes(series, key=None):
+    if key is None:
+        return pd.util.hash_pandas_object(series, index=False).to_numpy()
+    return pd.util.hash_pandas_object(series, index=False, hash_key=key).to_numpy()
+
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _bit_length(values):
+    """Exact bit length of uint64 values, via two float-safe 32-bit halves."""
+    def half(v):
+        return np.where(v > 0, np.floor(np.log2(np.maximum(v, 1.0))) + 1, 0)
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + half(high), half(low)).astype(np.int64)
+
+
+class HyperLogLog:
+    def __init__(self, registers=None):
+        self.registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes):
+        suffix_bits = 64 - HLL_PRECISION
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << suffix_bits) - 1)
+        rank = suffix_bits - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return raw
+
+
+class CountMin:
+    def __init__(self, table=None):
+        self.table = np.zeros((CMS_DEPTH, CMS_WIDTH), dtype=np.int64) if table is None else table
+
+    @staticmethod
+    def _buckets(series, hashes=None):
+        first = _hashes(series) if hashes is None else hashes
+        second = _hashes(series, _SECOND_HASH_KEY)
+        width = np.uint64(CMS_WIDTH)
+        return [((first + np.uint64(row) * second) % width).astype(np.int64) for row in range(CMS_DEPTH)]
+
+    def add(self, series, hashes=None):
+        for row, buckets in enumerate(self._buckets(series, hashes)):
+            self.table[row] += np.bincount(buckets, minlength=CMS_WIDTH)
+
+    def estimate(self, series):
+        return np.min([self.table[row][buckets] for row, buckets in enumerate(self._buckets(series))], axis=0)
+
+
+class TDigest:
+    """Merging t-digest: centroids sized by the k1 scale function, so the
+    tails keep single points while the middle is summarised coarsely."""
+
+    def __init__(self, means=None, weights=None):
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=float)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=float)
+
+    def add(self, values):
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(DIGEST_COMPRESSION * (np.arcsin(2 * q - 1) / np.pi + 0.5)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q, low, high):
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * total, np.r_[0, centres, total], np.r_[low, self.means, high]))
+
+
+class ColumnSketch:
+    """Mergeable summary of one column: exact counts, moments and range, with
+    HyperLogLog distinct counts, count-min top values and t-digest quantiles."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.nulls = 0
+        self.hll = HyperLogLog()
+        self.cms = CountMin()
+        self.candidates = []
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = None
+        self.high = None
+        self.digest = TDigest() if kind == "number" else None
+
+    def update(self, series):
+        values = _canonical(series.dropna(), self.kind)
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        self.count += len(values)
+        hashes = _hashes(values)
+        self.hll.add(hashes)
+        self.cms.add(values, hashes)
+        local = values.value_counts(sort=False).nlargest(CANDIDATES).index
+        candidates = pd.Series(
+            list(dict.fromkeys([*self.candidates, *(_plain(value) for value in local)])), dtype=object
+        )
+        candidates = _canonical(candidates, self.kind)
+        estimates = self.cms.estimate(candidates)
+        best = np.argsort(-estimates, kind="stable")[:CANDIDATES]
+        self.candidates = [_plain(candidates.iloc[i]) for i in best]
+        if self.kind == "number":
+            self._update_numbers(values.to_numpy())
+
+    def _update_numbers(self, values):
+        # Chan et al. parallel update of count/mean/M2.
+        n = len(values)
+        total = self.count
+        previous = total - n
+        delta = values.mean() - self.mean
+        self.mean += delta * n / total
+        self.m2 += ((values - values.mean()) ** 2).sum() + delta ** 2 * previous * n / total
+        self.low = float(values.min()) if self.low is None else min(self.low, float(values.min()))
+        self.high = float(values.max()) if self.high is None else max(self.high, float(values.max()))
+        self.digest.add(values)
+
+    def top_values(self):
+        """Up to three most frequent values with estimated counts. Values
+        within the count-min error bound (e * count / width) are dropped:
+        on high-cardinality columns they are indistinguishable from noise."""
+        if not self.candidates:
+            return []
+        candidates = _canonical(pd.Series(self.candidates, dtype=object), self.kind)
+        counts = self.cms.estimate(candidates)
+        noise = np.e * self.count / CMS_WIDTH
+        values = [bool(value) for value in self.candidates] if self.kind == "bool" else self.candidates
+        return [[value, int(count)] for value, count in zip(values, counts) if count > noise][:3]
+
+    def summary(self):
+        if self.kind != "number":
+            return None
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None,
+            "min": self.low,
+            "25%": self.digest.quantile(0.25, self.low, self.high),
+            "50%": self.digest.quantile(0.5, self.low, self.high),
+            "75%": self.digest.quantile(0.75, self.low, self.high),
+            "max": self.high,
+        }
+
+    def to_dict(self):
+        state = {
+            "kind": self.kind,
+            "count": self.count,
+            "nulls": self.nulls,
+            "hll": _encode(self.hll.registers),
+            "cms": _encode(self.cms.table),
+            "candidates": self.candidates,
+        }
+        if self.kind == "number":
+            state.update(
+                mean=self.mean, m2=self.m2, low=self.low, high=self.high,
+                digest=[self.digest.means.tolist(), self.digest.weights.tolist()],
+            )
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["kind"])
+        sketch.count = state["count"]
+        sketch.nulls = state["nulls"]
+        sketch.hll = HyperLogLog(_decode(state["hll"], np.uint8, (1 << HLL_PRECISION,)))
+        sketch.cms = CountMin(_decode(state["cms"], np.int64, (CMS_DEPTH, CMS_WIDTH)))
+        sketch.candidates = state["candidates"]
+        if sketch.kind == "number":
+            sketch.mean, sketch.m2 = state["mean"], state["m2"]
+            sketch.low, sketch.high = state["low"], state["high"]
+            sketch.digest = TDigest(*state["digest"])
+        return sketch
+
+
+class DatasetSketch:
+    """Column sketches for a whole dataset, built chunk by chunk.
+
+    ``stale`` is set once edits removed or overwrote values: sketches can
+    absorb new values but cannot forget old ones.
+    """
+
+    def __init__(self, columns=None, rows=0, stale=False):
+        self.columns = columns or {}
+        self.rows = rows
+        self.stale = stale
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        for name in chunk.columns:
+            if name not in self.columns:
+                self.columns[name] = ColumnSketch(_kind(chunk[name]))
+            self.columns[name].update(chunk[name])
+
+    def profile(self, dtypes):
+        """A profile shaped like ``profiling.profile_frame``'s output."""
+        columns = {}
+        for name, sketch in self.columns.items():
+            columns[name] = {
+                "dtype": dtypes.get(name, sketch.kind),
+                "null_count": sketch.nulls,
+                "unique_count": int(round(sketch.hll.estimate())),
+                "top_values": sketch.top_values(),
+                "summary": sketch.summary(),
+            }
+        return {"rows": self.rows, "columns": columns, "approximate": True, "stale": self.stale}
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "stale": self.stale,
+            "columns": {name: sketch.to_dict() for name, sketch in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        columns = {name: ColumnSketch.from_dict(column) for name, column in state["columns"].items()}
+        return cls(columns, state["rows"], state["stale"])
+
+
+def sketch_frame(data, chunksize=1_000_000):
+    sketch = DatasetSketch()
+    for start in range(0, len(data), chunksize):
+        sketch.update(data.iloc[start:start + chunksize])
+    return sketch
+
+
+def update_sketches(state, data, operation=None, payload=None):
+    """Sketch state for ``data``, the dataset right after ``operation``.
+
+    A set value is merged into its column and a replace re-sketches the
+    column; columns that appeared or disappeared are sketched or dropped.
+    Anything that removed values leaves the sketches ``stale`` until the
+    next full rebuild. ``operation=None`` stands for an undo or redo.
+    """
+    if not state:
+        return state
+    sketch = DatasetSketch.from_dict(state)
+    if operation == "set_value":
+        column = sketch.columns.get(payload["column"])
+        if column is not None:
+            column.update(pd.Series([payload["value"]]))
+        sketch.stale = True
+    elif operation == "replace":
+        sketch.columns.pop(payload["column"], None)
+    elif operation != "delete_column":
+        sketch.stale = True
+    for name in list(sketch.columns):
+        if name not in data.columns:
+            del sketch.columns[name]
+    for name in data.columns:
+        if name not in sketch.columns:
+            sketch.columns[name] = ColumnSketch(_kind(data[name]))
+            sketch.columns[name].update(data[name])
+    sketch.rows = len(data)
+    return sketch.to_dict()
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+
+MAX_BINS = 10000
+SKETCH_BINS = 4096
+MAX_GROUPS = 1000
+
+
+def _numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _float_values(series):
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def bin_edges(lo, hi, count, num_bins=None, bin_width=None):
+    """Edges over ``[lo, hi]``: ``num_bins`` bins if given, else bins of
+    ``bin_width``, else Sturges' rule."""
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    if num_bins:
+        bins = num_bins
+    elif bin_width:
+        bins = int(np.ceil((hi - lo) / bin_width)) or 1
+        if bins <= MAX_BINS:
+            return lo + np.arange(bins + 1) * bin_width
+    else:
+        bins = int(np.ceil(np.log2(max(count, 1)) + 1))
+    return np.linspace(lo, hi, min(bins, MAX_BINS) + 1)
+
+
+def _histogram_result(edges, counts):
+    return {
+        "x": (edges[:-1] + edges[1:]) / 2,
+        "y": counts,
+        "width": np.diff(edges),
+    }
+
+
+def _category_result(counts):
+    return {"x": counts.index.astype(str).to_numpy(), "y": counts.to_numpy(), "width": None}
+
+
+def histogram_counts(series, num_bins=None, bin_width=None):
+    """Bin counts for a numeric column, or per-value counts otherwise.
+
+    Returns a dict with bar centres (or category labels) ``x``, counts ``y``
+    and bar ``width`` (``None`` for categories), ready for a ``go.Bar``.
+    """
+    if not _numeric(series):
+        return _category_result(series.value_counts(sort=False))
+    values = _float_values(series)
+    if values.size == 0:
+        return _histogram_result(np.array([0.0, 1.0]), np.array([0]))
+    edges = bin_edges(values.min(), values.max(), values.size, num_bins, bin_width)
+    counts, _ = np.histogram(values, bins=edges)
+    return _histogram_result(edges, counts)
+
+
+def histogram_counts_chunked(chunks, column, num_bins=None, bin_width=None):
+    """``histogram_counts`` over a dataset too large to hold in memory.
+
+    ``chunks`` is a callable returning a fresh iterator of DataFrames; it is
+    consumed twice, once for the range and once for the counts.
+    """
+    lo, hi, count = np.inf, -np.inf, 0
+    categories = None
+    for chunk in chunks():
+        series = chunk[column]
+        if not _numeric(series):
+            counts = series.value_counts(sort=False)
+            categories = counts if categories is None else categories.add(counts, fill_value=0)
+            continue
+        values = _float_values(series)
+        if values.size:
+            lo, hi = min(lo, values.min()), max(hi, values.max())
+            count += values.size
+    if categories is not None:
+        return _category_result(categories.astype(np.int64))
+    if count == 0:
+        return _histogram_result(np.array([0.0, 1.0]), np.array([0]))
+
+    edges = bin_edges(lo, hi, count, num_bins, bin_width)
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for chunk in chunks():
+        chunk_counts, _ = np.histogram(_float_values(chunk[column]), bins=edges)
+        counts += chunk_counts
+    return _histogram_result(edges, counts)
+
+
+def _group_keys(data, x_column, y_column):
+    if x_column == y_column or x_column not in data.columns:
+        return pd.Series(y_column, index=data.index)
+    return data[x_column]
+
+
+def _thin(frame, limit):
+    if limit is None or len(frame) <= limit:
+        return frame
+    return frame.iloc[::int(np.ceil(len(frame) / limit))]
+
+
+def _group_values(keys, per_group):
+    # Mapping categorical keys keeps the result categorical; fences and
+    # quartiles are numbers.
+    return keys.map(per_group).astype(float)
+
+
+def box_stats(data, x_column, y_column, point_limit=None, include_points=False):
+    """Five-number summary, mean and outliers of ``y_column`` per ``x_column``.
+
+    Whiskers follow plotly's convention: the most extreme values within
+    1.5 IQR of the quartiles. Returns ``(boxes, points)`` where ``boxes`` is a
+    DataFrame indexed by group and ``points`` holds the outliers (plus a
+    sample of inliers when ``include_points``) thinned to ``point_limit``.
+    """
+    keys = _group_keys(data, x_column, y_column)
+    values = data[y_column]
+    grouped = values.groupby(keys, sort=False, observed=True)
+    boxes = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    boxes.columns = ["q1", "median", "q3"]
+    boxes["mean"] = grouped.mean()
+    iqr = boxes["q3"] - boxes["q1"]
+    low = _group_values(keys, boxes["q1"] - 1.5 * iqr)
+    high = _group_values(keys, boxes["q3"] + 1.5 * iqr)
+    inside = (values >= low) & (values <= high)
+    boxes["lowerfence"] = values.where(inside).groupby(keys, sort=False, observed=True).min()
+    boxes["upperfence"] = values.where(inside).groupby(keys, sort=False, observed=True).max()
+
+    valid = values.notna() & keys.notna()
+    outliers = pd.DataFrame({"x": keys[~inside & valid], "y": values[~inside & valid]})
+    points = _thin(outliers, point_limit)
+    if include_points:
+        room = None if point_limit is None else max(point_limit - len(points), 0)
+        inliers = pd.DataFrame({"x": keys[inside], "y": values[inside]})
+        points = pd.concat([points, _thin(inliers, room) if room != 0 else inliers.iloc[:0]])
+    return boxes, points
+
+
+def box_stats_chunked(chunks, x_column, y_column, point_limit=None, include_points=False):
+    """Approximate ``box_stats`` in three passes over ``chunks()``.
+
+    Quartiles come from a ``SKETCH_BINS``-bin histogram per group, so they
+    are exact to within 1/4096 of the group's range. Means are exact, and so
+    are whiskers and outliers, relative to those quartiles.
+    """
+    totals = None
+    for chunk in chunks():
+        keys = _group_keys(chunk, x_column, y_column)
+        part = chunk[y_column].groupby(keys, sort=False, observed=True).agg(["min", "max", "sum", "count"])
+        if totals is None:
+            totals = part
+        else:
+            totals = totals.reindex(totals.index.union(part.index, sort=False))
+            part = part.reindex(totals.index)
+            totals["min"] = np.fmin(totals["min"], part["min"])
+            totals["max"] = np.fmax(totals["max"], part["max"])
+            totals["sum"] = totals["sum"].fillna(0) + part["sum"].fillna(0)
+            totals["count"] = totals["count"].fillna(0) + part["count"].fillna(0)
+        if len(totals) > MAX_GROUPS:
+            raise ValueError(f"Too many box groups (more than {MAX_GROUPS}).")
+    if totals is None:
+        return pd.DataFrame(columns=["q1", "median", "q3", "mean", "lowerfence", "upperfence"]), pd.DataFrame(columns=["x", "y"])
+
+    group_index = pd.Index(totals.index)
+    span = (totals["max"] - totals["min"]).to_numpy(dtype=float, copy=True)
+    span[span == 0] = 1.0
+    sketch = np.zeros((len(group_index), SKETCH_BINS), dtype=np.int64)
+    for chunk in chunks():
+        keys = _group_keys(chunk, x_column, y_column)
+        values = chunk[y_column].to_numpy(dtype=float, na_value=np.nan)
+        groups = group_index.get_indexer(keys)
+        ok = np.isfinite(values) & (groups >= 0)
+        groups, values = groups[ok], values[ok]
+        bins = ((values - totals["min"].to_numpy()[groups]) / span[groups] * (SKETCH_BINS - 1)).astype(np.int64)
+        np.add.at(sketch, (groups, bins), 1)
+
+    cumulative = np.cumsum(sketch, axis=1)
+    quartiles = {}
+    for name, q in (("q1", 0.25), ("median", 0.5), ("q3", 0.75)):
+        target = q * (totals["count"].to_numpy() - 1)
+        positions = (cumulative <= target[:, None]).sum(axis=1)
+        quartiles[name] = totals["min"].to_numpy() + (positions + 0.5) / (SKETCH_BINS - 1) * span
+    boxes = pd.DataFrame(quartiles, index=group_index)
+    boxes["mean"] = totals["sum"] / totals["count"]
+    iqr = boxes["q3"] - boxes["q1"]
+    low, high = boxes["q1"] - 1.5 * iqr, boxes["q3"] + 1.5 * iqr
+
+    lower = pd.Series(np.inf, index=group_index)
+    upper = pd.Series(-np.inf, index=group_index)
+    points = []
+    for chunk in chunks():
+        keys = _group_keys(chunk, x_column, y_column)
+        values = chunk[y_column]
+        inside = (values >= _group_values(keys, low)) & (values <= _group_values(keys, high))
+        lower = np.fmin(lower, values.where(inside).groupby(keys, sort=False, observed=True).min().reindex(group_index))
+        upper = np.fmax(upper, values.where(inside).groupby(keys, sort=False, observed=True).max().reindex(group_index))
+        selected = values.notna() & keys.notna()
+        if not include_points:
+            selected &= ~inside
+        points.append(pd.DataFrame({"x": keys[selected], "y": values[selected]}))
+        points = [_thin(pd.concat(points), point_limit)]
+    boxes["lowerfence"] = lower
+    boxes["upperfence"] = upper
+    return boxes, points[0] if points else pd.DataFrame(columns=["x", "y"])
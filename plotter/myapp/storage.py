@@ -0,0 +1,435 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .dataset_cache import dataset_cache
+from .edits import active_edits, apply_edits, deleted_columns, required_columns
+from .timing import span
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - columnar storage is optional
+    pyarrow = None
+
+
+COLUMNAR_DIR = 'columnar_files'
+SNAPSHOT_DIR = 'csv_files/snapshots'
+MEMORY_MAP = getattr(settings, 'DATASET_MEMORY_MAP', True)
+
+
+def columnar_enabled():
+    return pyarrow is not None
+
+
+def has_columnar(csv_file):
+    return bool(csv_file.columnar_file) and os.path.exists(csv_file.columnar_file.path)
+
+
+def dataset_version(csv_file):
+    """Snapshot mtime, journal revision and the edit folded into the
+    snapshot; changes whenever the data does."""
+    path = csv_file.columnar_file.path if has_columnar(csv_file) else csv_file.file.path
+    return (os.path.getmtime(path), csv_file.revision, csv_file.snapshot_edit_id)
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_hash(csv_file):
+    """Content hash of the stored snapshot, computed once per file version,
+    tagged with the journal revision applied on top of it."""
+    path = csv_file.columnar_file.path if has_columnar(csv_file) else csv_file.file.path
+    stat = os.stat(path)
+    return f"{_file_digest(path, stat.st_mtime_ns, stat.st_size)}-{csv_file.revision}"
+
+
+def schema_from_frame(data):
+    schema = {}
+    for name, dtype in data.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            schema[name] = {'dtype': 'category', 'categories': [str(c) for c in dtype.categories]}
+        else:
+            schema[name] = {'dtype': str(dtype)}
+    return schema
+
+
+def schema_dtypes(schema):
+    """``read_csv`` dtypes for the columns whose stored type differs from
+    what pandas would infer on its own."""
+    dtypes = {}
+    for name, spec in (schema or {}).items():
+        if spec['dtype'] == 'category':
+            dtypes[name] = pd.CategoricalDtype(spec['categories'])
+        elif spec['dtype'] == 'bool' or spec['dtype'].startswith(('int', 'uint', 'float')):
+            dtypes[name] = spec['dtype']
+    return dtypes
+
+
+def read_csv_typed(csv_file, **kwargs):
+    return pd.read_csv(csv_file.file.path, dtype=schema_dtypes(csv_file.schema), **kwargs)
+
+
+def with_index_column(data):
+    if 'Index' not in data.columns:
+        data['Index'] = data.index
+        cols = ['Index'] + [col for col in data.columns if col != 'Index']
+        data = data[cols]
+    return data
+
+
+def _write_feather(data, path):
+    if not columnar_enabled():
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        data.reset_index(drop=True).to_feather(tmp_path)
+    except (pyarrow.ArrowException, ValueError, TypeError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def convert_to_columnar(csv_file):
+    """Write the typed Feather sidecar for ``csv_file`` from its CSV and link
+    it on the model.
+
+    Returns False when pyarrow is missing or the frame cannot be represented
+    in Arrow (e.g. mixed-type object columns); readers then stay on the CSV.
+    """
+    if not columnar_enabled():
+        return False
+    data = with_index_column(read_csv_typed(csv_file))
+    name = f"{COLUMNAR_DIR}/{csv_file.id}.feather"
+    if not _write_feather(data, csv_file.columnar_file.storage.path(name)):
+        return False
+    if csv_file.columnar_file.name != name:
+        csv_file.columnar_file.name = name
+        csv_file.save(update_fields=['columnar_file'])
+    return True
+
+
+def dataset_columns(csv_file):
+    version = dataset_version(csv_file)
+    columns = dataset_cache.columns(csv_file.id, version)
+    if columns is not None:
+        return columns
+    if has_columnar(csv_file):
+        with pyarrow.memory_map(csv_file.columnar_file.path) as source:
+            columns = list(pyarrow.ipc.open_file(source).schema.names)
+    else:
+        columns = list(pd.read_csv(csv_file.file.path, nrows=0).columns)
+        if 'Index' not in columns:
+            columns = ['Index'] + columns
+    deleted = deleted_columns(active_edits(csv_file))
+    return [col for col in columns if col not in deleted]
+
+
+def read_snapshot(csv_file, columns=None):
+    """The stored dataset without journal edits, bypassing the cache."""
+    if has_columnar(csv_file):
+        return pd.read_feather(csv_file.columnar_file.path, columns=columns)
+    data = with_index_column(read_csv_typed(csv_file))
+    return data if columns is None else data[list(columns)]
+
+
+def read_dataset(csv_file, columns=None):
+    version = dataset_version(csv_file)
+    data = dataset_cache.get(csv_file.id, version, columns)
+    if data is not None:
+        return data
+
+    if not has_columnar(csv_file) and convert_to_columnar(csv_file):
+        version = dataset_version(csv_file)
+
+    edits = active_edits(csv_file)
+    load = required_columns(edits, columns) if edits else columns
+    if not has_columnar(csv_file):
+        # A CSV is parsed whole either way, so cache every column.
+        load = None
+    with span("dataset_load"):
+        data = read_snapshot(csv_file, load)
+        if edits:
+            data = apply_edits(data, edits).reset_index(drop=True)
+    order = dataset_columns(csv_file) if load is not None else list(data.columns)
+    dataset_cache.set(csv_file.id, version, data, order=order)
+    if columns is not None and list(data.columns) != list(columns):
+        return data[list(columns)].copy()
+    return data
+
+
+# Memory-mapped columns
+
+def _mapped_dir(csv_file):
+    # Named after the snapshot it was built from, so a rewritten snapshot is
+    # never served from stale column files.
+    path = csv_file.columnar_file.path
+    stat = os.stat(path)
+    return os.path.join(f"{os.path.splitext(path)[0]}.columns", f"{stat.st_mtime_ns}-{stat.st_size}")
+
+
+def _mapped_path(directory, name):
+    return os.path.join(directory, hashlib.sha1(name.encode()).hexdigest()[:20])
+
+
+def _load_mapped(directory, name):
+    path = _mapped_path(directory, name)
+    try:
+        values = np.load(f"{path}.npy", mmap_mode='r').view(np.ndarray)
+    except FileNotFoundError:
+        return None
+    if not os.path.exists(f"{path}.json"):
+        return values
+    with open(f"{path}.json") as f:
+        return pd.Categorical.from_codes(values, json.load(f))
+
+
+def _save_mapped(directory, name, series):
+    path = _mapped_path(directory, name)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.codes.to_numpy()
+        try:
+            categories = json.dumps(series.cat.categories.tolist())
+        except TypeError:
+            return False
+        with open(f"{path}.{os.getpid()}.json", 'w') as f:
+            f.write(categories)
+        os.replace(f"{path}.{os.getpid()}.json", f"{path}.json")
+    else:
+        values = series.to_numpy()
+    with open(f"{path}.{os.getpid()}.npy", 'wb') as f:
+        np.save(f, values, allow_pickle=False)
+    os.replace(f"{path}.{os.getpid()}.npy", f"{path}.npy")
+    return True
+
+
+def _fixed_width(arrow_type):
+    return (
+        pyarrow.types.is_integer(arrow_type)
+        or pyarrow.types.is_floating(arrow_type)
+        or pyarrow.types.is_boolean(arrow_type)
+        or pyarrow.types.is_dictionary(arrow_type)
+    )
+
+
+def _map_columns(csv_file, directory, names):
+    """Write the fixed-width ``names`` out as column files and map them; text
+    columns are read from the Feather file each time."""
+    parent = os.path.dirname(directory)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+        for other in os.listdir(parent):
+            if other != os.path.basename(directory):
+                # Processes still mapping files of the old snapshot keep them.
+                shutil.rmtree(os.path.join(parent, other), ignore_errors=True)
+    with pyarrow.memory_map(csv_file.columnar_file.path) as source:
+        table = pyarrow.ipc.open_file(source).read_all().select(names)
+    arrays = {}
+    for name in names:
+        column = table.column(name)
+        series = column.to_pandas()
+        if _fixed_width(column.type) and _save_mapped(directory, name, series):
+            arrays[name] = _load_mapped(directory, name)
+        else:
+            arrays[name] = series
+    return arrays
+
+
+def _mapped_columns(csv_file, names):
+    directory = _mapped_dir(csv_file)
+    arrays = {}
+    for name in names:
+        values = _load_mapped(directory, name)
+        if values is not None:
+            arrays[name] = values
+    missing = [name for name in names if name not in arrays]
+    if missing:
+        arrays.update(_map_columns(csv_file, directory, missing))
+    return arrays
+
+
+def map_dataset(csv_file, columns=None):
+    """Read-only view of the dataset for plots and table pages.
+
+    Numeric, boolean and categorical columns are memory-mapped from column
+    files written next to the Feather snapshot on first use, so every
+    process serving the dataset shares the OS page cache instead of holding
+    its own parsed copy, and selecting columns copies nothing. Falls back to
+    ``read_dataset`` while journal edits are pending, or without a Feather
+    snapshot or DATASET_MEMORY_MAP.
+    """
+    if not MEMORY_MAP or not has_columnar(csv_file) or active_edits(csv_file):
+        return read_dataset(csv_file, columns)
+    names = list(columns) if columns is not None else dataset_columns(csv_file)
+    with span("dataset_map"):
+        arrays = _mapped_columns(csv_file, names)
+        return pd.DataFrame({name: arrays[name] for name in names}, copy=False)
+
+
+def row_index(csv_file):
+    """Hash index from ``Index`` values to positions in the current dataset,
+    or None when the values are not unique."""
+    version = dataset_version(csv_file)
+    index = dataset_cache.row_index(csv_file.id, version)
+    if index is None:
+        ids = read_dataset(csv_file, ['Index'])['Index']
+        index = dataset_cache.row_index(csv_file.id, version)
+        if index is None and ids.is_unique:
+            # Too large for the cache; still saves the per-row scans of this request.
+            index = pd.Index(ids.to_numpy())
+    return index
+
+
+def read_rows(csv_file, positions, columns=None):
+    """Rows at the given positions, reading only the record batches that
+    contain them when the dataset is not already cached."""
+    positions = np.asarray(positions, dtype=np.int64)
+    data = dataset_cache.take(csv_file.id, dataset_version(csv_file), positions, columns)
+    if data is not None:
+        return data
+    if not has_columnar(csv_file) or active_edits(csv_file):
+        return read_dataset(csv_file, columns).iloc[positions].reset_index(drop=True)
+
+    names = list(columns) if columns is not None else dataset_columns(csv_file)
+    path = csv_file.columnar_file.path
+    taken = {}
+    if MEMORY_MAP:
+        # Only the pages holding these rows are read from the mapped
+        # columns; text columns are not mapped and go batch by batch.
+        with pyarrow.memory_map(path) as source:
+            schema = pyarrow.ipc.open_file(source).schema
+        fixed = [name for name in names if _fixed_width(schema.field(name).type)]
+        if fixed:
+            mapped = pd.DataFrame(_mapped_columns(csv_file, fixed), copy=False)
+            taken.update(mapped.iloc[positions].reset_index(drop=True).items())
+    rest = [name for name in names if name not in taken]
+    if rest:
+        taken.update(_take_batches(path, rest, positions).items())
+    return pd.DataFrame({name: taken[name] for name in names})
+
+
+@lru_cache(maxsize=256)
+def _batch_offsets(path, mtime_ns, size):
+    # Counting a batch's rows decompresses it, so this is done once per
+    # file version, and on its first column only.
+    options = pyarrow.ipc.IpcReadOptions(included_fields=[0])
+    with pyarrow.memory_map(path) as source:
+        reader = pyarrow.ipc.open_file(source, options=options)
+        rows = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    return np.concatenate([[0], np.cumsum(rows, dtype=np.int64)])
+
+
+def _take_batches(path, names, positions):
+    """``names`` at ``positions`` of a Feather file, decompressing only
+    those columns of the record batches that hold the rows."""
+    stat = os.stat(path)
+    offsets = _batch_offsets(path, stat.st_mtime_ns, stat.st_size)
+    order = np.argsort(positions, kind='stable')
+    wanted = positions[order]
+    bounds = np.searchsorted(wanted, offsets)
+    pieces = []
+    with pyarrow.memory_map(path) as source:
+        schema = pyarrow.ipc.open_file(source).schema
+        fields = sorted(schema.get_field_index(name) for name in names)
+        reader = pyarrow.ipc.open_file(source, options=pyarrow.ipc.IpcReadOptions(included_fields=fields))
+        for i in np.flatnonzero(np.diff(bounds)):
+            table = pyarrow.Table.from_batches([reader.get_batch(int(i))]).select(names)
+            rows = pyarrow.array(wanted[bounds[i]:bounds[i + 1]] - offsets[i])
+            pieces.append(table.take(rows).to_pandas())
+    if not pieces:
+        return pd.DataFrame(columns=names)
+    data = pd.concat(pieces, ignore_index=True)
+    restore = np.empty_like(order)
+    restore[order] = np.arange(len(order))
+    return data.iloc[restore].reset_index(drop=True)
+
+
+def dataset_size(csv_file):
+    path = csv_file.columnar_file.path if has_columnar(csv_file) else csv_file.file.path
+    return os.path.getsize(path)
+
+
+def _snapshot_chunks(csv_file, columns, chunksize):
+    if has_columnar(csv_file):
+        with pyarrow.memory_map(csv_file.columnar_file.path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = pyarrow.Table.from_batches([reader.get_batch(i)])
+                yield (batch if columns is None else batch.select(columns)).to_pandas()
+        return
+
+    header = list(pd.read_csv(csv_file.file.path, nrows=0).columns)
+    synthetic_index = 'Index' not in header and (columns is None or 'Index' in columns)
+    usecols = None if columns is None else [col for col in columns if col in header]
+    offset = 0
+    for chunk in read_csv_typed(csv_file, usecols=usecols, chunksize=chunksize):
+        if synthetic_index:
+            chunk['Index'] = range(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def iter_dataset_chunks(csv_file, columns, chunksize=1_000_000):
+    """Yield ``columns`` of the dataset a chunk at a time, bypassing the cache.
+    Journal edits are replayed on each chunk."""
+    edits = active_edits(csv_file)
+    load = required_columns(edits, columns) if edits else list(columns)
+    for chunk in _snapshot_chunks(csv_file, load, chunksize):
+        if edits:
+            chunk = apply_edits(chunk, edits)
+        yield chunk[list(columns)]
+
+
+def write_snapshot(csv_file, data, edit_id):
+    """Write ``data``, the dataset with the journal folded in up to
+    ``edit_id``, to new snapshot files: a CSV, plus a Feather sidecar when
+    the frame fits Arrow. Returns the ``file`` and ``columnar_file`` names
+    for the caller to switch the model to; the current files are left for
+    readers still using them."""
+    storage = csv_file.file.storage
+    csv_name = f"{SNAPSHOT_DIR}/{csv_file.id}-{edit_id}.csv"
+    path = storage.path(csv_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data.to_csv(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+    columnar_name = f"{COLUMNAR_DIR}/{csv_file.id}-{edit_id}.feather"
+    if not _write_feather(data, storage.path(columnar_name)):
+        columnar_name = ''
+    return {'file': csv_name, 'columnar_file': columnar_name}
+
+
+def remove_snapshots(csv_file, keep):
+    """Delete the snapshot files of ``csv_file`` other than those named in
+    ``keep``, with their mapped columns. The uploaded CSV is never removed."""
+    storage = csv_file.file.storage
+    keep = {storage.path(name) for name in keep if name}
+    patterns = [
+        os.path.join(glob.escape(storage.path(SNAPSHOT_DIR)), f"{csv_file.id}-*.csv"),
+        os.path.join(glob.escape(storage.path(COLUMNAR_DIR)), f"{csv_file.id}.feather"),
+        os.path.join(glob.escape(storage.path(COLUMNAR_DIR)), f"{csv_file.id}-*.feather"),
+    ]
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(f"{os.path.splitext(path)[0]}.columns", ignore_errors=True)
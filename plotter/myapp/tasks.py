@@ -0,0 +1,29 @@
+from django.db import transaction
+
+from . import views
+from .edits import apply_edit
+from .journal import record_edit
+from .models import Job
+from .profiling import dataset_profile
+from .storage import read_dataset
+
+
+def render_plot(job):
+    return views.PlotViz(csv_file=job.csv_file, plot_type=job.params["plot_type"]).render_spec(job.params["spec"])
+
+
+def edit_dataset(job):
+    operation, payload = job.params["operation"], job.params["payload"]
+    data = apply_edit(read_dataset(job.csv_file), operation, payload)
+    with transaction.atomic():
+        # Holding the job row until the edit is journalled keeps it from
+        # timing out in between; a job that already has is not applied.
+        if not Job.objects.select_for_update().filter(pk=job.pk, status="running").exists():
+            return None
+        record_edit(job.csv_file, operation, payload, data)
+    return {"rows": len(data)}
+
+
+def profile_dataset(job):
+    profile = dataset_profile(job.csv_file, exact=True)
+    return {"rows": profile["rows"]}
@@ -1,3 +1,635 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import journal, paging, plot_state, storage, tasks
+from .aggregation import aggregate_by, top_n_with_other
+from .dataset_cache import dataset_cache
+from .downsample import bin_scatter, downsample_line, lttb_indices, minmax_indices
+from .edits import apply_edit
+from .figure_cache import DjangoFigureCache, FileFigureCache, MemoryFigureCache, make_key
+from .ingest import IngestError, ingest_csv, profile_csv
+from .models import CSVFile, Job, PlotStateEntry
+from .sketches import ColumnSketch
+from .stats import bin_edges, box_stats, box_stats_chunked, histogram_counts, histogram_counts_chunked
+from .storage import read_dataset, read_snapshot
+
+
+class MediaTestCase(TestCase):
+    """Runs with MEDIA_ROOT in a temporary directory."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix="plotter-test-")
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user("tester", password="secret")
+        self.client.force_login(self.user)
+
+    def upload(self, content, name="data.csv"):
+        return self.client.post("/data/", {"csv_file": SimpleUploadedFile(name, content, "text/csv")})
+
+
+class PlotStateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("tester")
+        self.session = {}
+        self.large = {"title": "x" * 300}
+
+    def state(self, user=True):
+        return plot_state.PlotState(SimpleNamespace(session=self.session, user=self.user if user else None))
+
+    def later(self, delta):
+        return mock.patch.object(plot_state.timezone, "now", return_value=timezone.now() + delta)
+
+    def assertNoWrites(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        self.assertEqual([query["sql"] for query in queries if not query["sql"].startswith("SELECT")], [])
+
+    def test_small_values_stay_inline(self):
+        self.state().update({"title": "short"})
+        self.assertEqual(self.session["plot_state"]["options"], {"title": "short"})
+        self.assertFalse(PlotStateEntry.objects.exists())
+
+    def test_large_values_go_to_side_store(self):
+        state = self.state()
+        state.update({"spec": self.large})
+        state.set_specs({"bar": self.large})
+        self.assertIn(plot_state.REF, self.session["plot_state"]["options"]["spec"])
+        self.assertLess(len(str(self.session)), 200)
+        self.assertEqual(PlotStateEntry.objects.count(), 2)
+        state = self.state()
+        self.assertEqual(state.all_values(), {"spec": self.large})
+        self.assertEqual(state.spec("bar"), self.large)
+
+    def test_anonymous_sessions_keep_values_inline(self):
+        self.state(user=False).update({"spec": self.large})
+        self.assertEqual(self.session["plot_state"]["options"]["spec"], self.large)
+        self.assertFalse(PlotStateEntry.objects.exists())
+
+    def test_unchanged_values_are_not_written(self):
+        self.state().update({"spec": self.large})
+        self.state().set_spec("bar", self.large)
+        with self.assertNumQueries(0):
+            self.state().update({"spec": self.large})
+        with self.assertNumQueries(1):
+            # Reads the stored specs to compare.
+            self.state().set_spec("bar", self.large)
+
+    def test_storing_a_value_again_only_reads(self):
+        state = self.state()
+        state.update({"spec": self.large})
+        state.update({"spec": {"title": "y" * 300}})
+        self.assertNoWrites(lambda: state.update({"spec": self.large}))
+        entry = PlotStateEntry.objects.get(digest=plot_state._digest(plot_state._encode(self.large)))
+        with self.later(plot_state.TTL * 0.75):
+            self.state().update({"spec": {"title": "y" * 300}})
+            self.state().update({"spec": self.large})
+        entry.refresh_from_db()
+        self.assertGreater(entry.expires_at, timezone.now() + plot_state.TTL)
+
+    def test_expired_values_read_as_defaults(self):
+        self.state().update({"spec": self.large})
+        with self.later(plot_state.TTL + timedelta(seconds=1)):
+            self.assertEqual(self.state().values({"spec": "default"}), {"spec": "default"})
+            self.assertEqual(plot_state.prune_expired(), 1)
+
+    def test_reads_renew_entries_past_half_their_time(self):
+        self.state().update({"spec": self.large})
+        with self.later(plot_state.TTL * 0.75):
+            self.assertEqual(self.state().all_values(), {"spec": self.large})
+        with self.later(plot_state.TTL * 1.5):
+            self.assertEqual(self.state().all_values(), {"spec": self.large})
+
+    def test_entry_quota(self):
+        with mock.patch.object(plot_state, "USER_MAX_ENTRIES", 2):
+            state = self.state()
+            for i in range(3):
+                with self.later(timedelta(seconds=i)):
+                    state.update({f"spec{i}": {"title": str(i) * 300}})
+        self.assertEqual(PlotStateEntry.objects.count(), 2)
+        self.assertEqual(self.state().values({"spec0": None, "spec2": None}), {"spec0": None, "spec2": {"title": "2" * 300}})
+
+    def test_byte_quota_keeps_newest(self):
+        with mock.patch.object(plot_state, "USER_MAX_BYTES", 100):
+            state = self.state()
+            state.update({"a": self.large})
+            with self.later(timedelta(seconds=1)):
+                state.update({"b": {"title": "y" * 300}})
+        self.assertEqual(PlotStateEntry.objects.count(), 1)
+        self.assertEqual(self.state().values({"a": None, "b": None})["b"], {"title": "y" * 300})
+
+
+class AggregationTests(SimpleTestCase):
+    def setUp(self):
+        self.data = pd.DataFrame({
+            "name": ["b", "a", "b", "c", "d", "a", "e"],
+            "value": [1.0, 2, 3, 4, 5, 6, 7],
+        })
+
+    def test_aggregate_by(self):
+        result = aggregate_by(self.data, "name", "value", "sum")
+        self.assertEqual(list(result["name"]), ["b", "a", "c", "d", "e"])
+        self.assertEqual(list(result["value"]), [4, 8, 4, 5, 7])
+        self.assertEqual(list(aggregate_by(self.data, "name", "value", "count")["value"]), [2, 2, 1, 1, 1])
+        self.assertEqual(list(aggregate_by(self.data, "name", "value", "mean")["value"]), [2, 4, 4, 5, 7])
+
+    def test_aggregate_by_not_applicable(self):
+        self.assertIs(aggregate_by(self.data, "value", "name", "sum"), self.data)
+        self.assertIs(aggregate_by(self.data, "name", "value", "max"), self.data)
+        self.assertIs(aggregate_by(self.data, "name", "name", "count"), self.data)
+
+    def test_top_n_with_other(self):
+        result = top_n_with_other(self.data, "name", "value", "sum", 2)
+        self.assertEqual(dict(zip(result["name"], result["value"])), {"a": 8, "e": 7, "Other": 13})
+        # Aggregated from the raw rows, not from the per-group results.
+        result = top_n_with_other(self.data, "name", "value", "mean", 2)
+        self.assertEqual(dict(zip(result["name"], result["value"])), {"e": 7, "d": 5, "Other": 16 / 5})
+        self.assertEqual(len(top_n_with_other(self.data, "name", "value", "sum", 5)), 5)
+
+    def test_existing_other_is_kept_apart(self):
+        self.data.loc[len(self.data)] = ["Other", 20]
+        result = top_n_with_other(self.data, "name", "value", "sum", 2)
+        self.assertEqual(dict(zip(result["name"], result["value"])), {"Other": 20, "a": 8, "Other (2)": 20})
+
+
+def figure(text):
+    return {"div": text, "figure": ""}
+
+
+class FigureCacheKeyTests(SimpleTestCase):
+    def test_make_key(self):
+        key = make_key("hash-1", "bar", {"x": "a", "y": "b"})
+        self.assertEqual(key, make_key("hash-1", "bar", {"y": "b", "x": "a"}))
+        self.assertNotEqual(key, make_key("hash-2", "bar", {"x": "a", "y": "b"}))
+        self.assertNotEqual(key, make_key("hash-1", "line", {"x": "a", "y": "b"}))
+        self.assertNotEqual(key, make_key("hash-1", "bar", {"x": "a", "y": "c"}))
+
+
+class MemoryFigureCacheTests(SimpleTestCase):
+    def test_least_recently_read_is_evicted(self):
+        cache = MemoryFigureCache(max_bytes=300)
+        for key in "abc":
+            cache.set(key, figure(key * 100))
+        cache.get("a")
+        cache.set("d", figure("d" * 100))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), figure("a" * 100))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["current_bytes"], 300)
+
+    def test_oversized_entry_is_not_stored(self):
+        cache = MemoryFigureCache(max_bytes=50)
+        cache.set("a", figure("a" * 100))
+        self.assertIsNone(cache.get("a"))
+
+
+class FileFigureCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp(prefix="plotter-figures-")
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        # Each stored figure is 125 bytes of JSON; three fit.
+        self.cache = FileFigureCache(max_bytes=400, location=self.location)
+
+    def set(self, key, age):
+        self.cache.set(key, figure(key * 100))
+        # Read times further back than the test can produce on its own.
+        os.utime(os.path.join(self.location, f"{key}.json"), (1000 - age, 1000 - age))
+
+    def test_least_recently_read_is_evicted(self):
+        for age, key in enumerate("abc"):
+            self.set(key, 10 - age)
+        self.assertEqual(self.cache.get("a"), figure("a" * 100))
+        # Down to the low-water mark: the two least recently read go.
+        self.set("d", 0)
+        self.assertEqual(sorted(os.listdir(self.location)), ["a.json", "d.json"])
+        self.assertEqual(self.cache.stats()["current_bytes"], 2 * 125)
+
+    def test_scans_only_over_the_limit(self):
+        with mock.patch("myapp.figure_cache.os.listdir", wraps=os.listdir) as listdir:
+            self.set("a", 3)
+            self.set("b", 2)
+            self.set("c", 1)
+            self.assertEqual(listdir.call_count, 1)
+            self.set("d", 0)
+            self.assertEqual(listdir.call_count, 2)
+            # Evicted down to the low-water mark, so the next write does not rescan.
+            self.set("e", 0)
+            self.assertEqual(listdir.call_count, 2)
+
+    def test_replacing_an_entry_keeps_the_total(self):
+        self.set("a", 1)
+        self.set("a", 0)
+        self.assertEqual(self.cache.current_bytes, 125)
+
+
+@override_settings(CACHES={
+    "figures": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 3, "CULL_FREQUENCY": 3},
+    },
+})
+class DjangoFigureCacheTests(SimpleTestCase):
+    def test_keys_and_eviction(self):
+        cache = DjangoFigureCache(max_bytes=1000, alias="figures")
+        for key in "abc":
+            cache.set(key, figure(key))
+        self.assertEqual(cache.get("a"), figure("a"))
+        self.assertEqual(caches["figures"].get("figure:a"), figure("a"))
+        # Culling is the backend's: the least recently used entry goes.
+        cache.set("d", figure("d"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("d"), figure("d"))
+        cache.set("e", figure("e" * 2000))
+        self.assertIsNone(cache.get("e"))
+
+
+class ProfileCsvTests(SimpleTestCase):
+    def profile(self, content):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return profile_csv(path)
+
+    def test_byte_order_mark(self):
+        schema, rows = self.profile("a,b\n1,x\n2,y\n".encode("utf-8-sig"))
+        self.assertEqual(list(schema), ["Index", "a", "b"])
+        self.assertEqual(rows, 2)
+
+    def test_unnamed_index_column(self):
+        content = pd.DataFrame({"x": [1.5, 2.5]}).to_csv().encode()
+        schema, rows = self.profile(content)
+        self.assertEqual(list(schema), ["Index", "Unnamed: 0", "x"])
+        self.assertEqual(schema["Unnamed: 0"], {"dtype": "int8"})
+
+    def test_duplicate_names(self):
+        with self.assertRaisesMessage(IngestError, "Duplicate column names: a"):
+            self.profile(b"a,a\n1,2\n")
+
+    def test_empty_file(self):
+        with self.assertRaises(IngestError):
+            self.profile(b"")
+
+    def test_header_only(self):
+        with self.assertRaisesMessage(IngestError, "no data rows"):
+            self.profile(b"a,b\n")
+
+
+class ColumnSketchTests(SimpleTestCase):
+    def test_top_values(self):
+        sketch = ColumnSketch("text")
+        sketch.update(pd.Series(["a"] * 5 + ["b"] * 3 + ["c"]))
+        self.assertEqual(sketch.top_values(), [["a", 5], ["b", 3], ["c", 1]])
+
+    def test_bool_top_values(self):
+        sketch = ColumnSketch("bool")
+        sketch.update(pd.Series([True, True, False, None], dtype="boolean"))
+        sketch.update(pd.Series([True]))
+        self.assertEqual(sketch.top_values(), [[True, 3], [False, 1]])
+
+    def test_number_top_values_survive_widening(self):
+        sketch = ColumnSketch("number")
+        sketch.update(pd.Series([1, 1, 2], dtype="int8"))
+        sketch.update(pd.Series([1.0, 3.5]))
+        self.assertEqual(sketch.top_values()[0], [1.0, 3])
+
+
+def chunked(data, size):
+    return lambda: (data.iloc[start:start + size] for start in range(0, len(data), size))
+
+
+class BinEdgesTests(SimpleTestCase):
+    def test_bin_count_before_width(self):
+        self.assertEqual(len(bin_edges(0, 10, 100, num_bins=4, bin_width=1)), 5)
+
+    def test_bin_width(self):
+        self.assertEqual(list(bin_edges(0, 10, 100, bin_width=2.5)), [0, 2.5, 5, 7.5, 10])
+
+    def test_sturges(self):
+        self.assertEqual(len(bin_edges(0, 10, 100)), 9)
+
+
+class HistogramTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = pd.Series(rng.normal(size=1000))
+        self.values[::50] = np.nan
+
+    def test_counts_match_numpy(self):
+        result = histogram_counts(self.values, num_bins=20)
+        values = self.values.dropna()
+        counts, edges = np.histogram(values, bins=20)
+        np.testing.assert_array_equal(result["y"], counts)
+        np.testing.assert_allclose(result["x"], (edges[:-1] + edges[1:]) / 2)
+        self.assertEqual(result["y"].sum(), len(values))
+
+    def test_chunked_matches_single_pass(self):
+        data = pd.DataFrame({"v": self.values, "c": pd.Categorical(["a", "b", "b", "c"] * 250)})
+        for column, options in [("v", {}), ("v", {"num_bins": 7}), ("v", {"bin_width": 0.5}), ("c", {})]:
+            single = histogram_counts(data[column], **options)
+            chunks = histogram_counts_chunked(chunked(data, 64), column, **options)
+            np.testing.assert_array_equal(chunks["x"], single["x"])
+            np.testing.assert_array_equal(chunks["y"], single["y"])
+
+
+class BoxStatsTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame({
+            "x": rng.choice(["a", "b", "c"], size=3000),
+            # No value near a fence, where the chunked quartiles' error could
+            # move a point across it.
+            "y": np.concatenate([rng.normal(size=2990).clip(-2.4, 2.4), [15, -15, 20, -20, 25, 30, 35, 40, 45, 50]]),
+        })
+
+    def test_quartiles_and_fences_match_pandas(self):
+        boxes, points = box_stats(self.data, "x", "y")
+        for key, values in self.data.groupby("x")["y"]:
+            q1, median, q3 = values.quantile([0.25, 0.5, 0.75])
+            self.assertAlmostEqual(boxes.loc[key, "q1"], q1)
+            self.assertAlmostEqual(boxes.loc[key, "median"], median)
+            self.assertAlmostEqual(boxes.loc[key, "q3"], q3)
+            self.assertAlmostEqual(boxes.loc[key, "mean"], values.mean())
+            inside = values[values.between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))]
+            self.assertEqual(boxes.loc[key, "lowerfence"], inside.min())
+            self.assertEqual(boxes.loc[key, "upperfence"], inside.max())
+        self.assertEqual(len(points), len(self.data) - sum(
+            values.between(boxes.loc[key, "q1"] - 1.5 * (boxes.loc[key, "q3"] - boxes.loc[key, "q1"]),
+                           boxes.loc[key, "q3"] + 1.5 * (boxes.loc[key, "q3"] - boxes.loc[key, "q1"])).sum()
+            for key, values in self.data.groupby("x")["y"]
+        ))
+
+    def test_chunked_matches_single_pass(self):
+        boxes, points = box_stats(self.data, "x", "y")
+        chunk_boxes, chunk_points = box_stats_chunked(chunked(self.data, 500), "x", "y")
+        chunk_boxes = chunk_boxes.loc[boxes.index]
+        # Quartiles come from a sketch, exact to a bin of the group's range.
+        tolerance = (self.data["y"].max() - self.data["y"].min()) / 4096
+        for column in ["q1", "median", "q3"]:
+            np.testing.assert_allclose(chunk_boxes[column], boxes[column], atol=2 * tolerance)
+        np.testing.assert_allclose(chunk_boxes["mean"], boxes["mean"])
+        np.testing.assert_array_equal(chunk_boxes["lowerfence"], boxes["lowerfence"])
+        np.testing.assert_array_equal(chunk_boxes["upperfence"], boxes["upperfence"])
+        self.assertEqual(sorted(chunk_points["y"]), sorted(points["y"]))
+
+    def test_categorical_groups(self):
+        data = pd.DataFrame({
+            "x": pd.Categorical(["a"] * 5 + ["b"] * 5),
+            "y": [1.0, 2, 3, 4, 100, 10, 11, 12, 13, 14],
+        })
+        for boxes, points in [box_stats(data, "x", "y"), box_stats_chunked(chunked(data, 3), "x", "y")]:
+            self.assertEqual(boxes.loc["a", "lowerfence"], 1)
+            self.assertEqual(boxes.loc["a", "upperfence"], 4)
+            self.assertEqual(boxes.loc["b", "lowerfence"], 10)
+            self.assertEqual(boxes.loc["b", "upperfence"], 14)
+            self.assertEqual(list(points["y"]), [100])
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(1000, dtype=float)
+        self.y = rng.normal(size=1000).cumsum()
+
+    def test_lttb(self):
+        keep = lttb_indices(self.x, self.y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue((np.diff(keep) > 0).all())
+
+    def test_minmax_keeps_bucket_extremes(self):
+        keep = minmax_indices(self.y, 102)
+        self.assertLessEqual(len(keep), 102)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        # 50 buckets of 20 rows.
+        for start in range(0, 1000, 20):
+            bucket = self.y[start:start + 20]
+            self.assertIn(start + bucket.argmin(), keep)
+            self.assertIn(start + bucket.argmax(), keep)
+
+    def test_short_input_unchanged(self):
+        np.testing.assert_array_equal(lttb_indices(self.x[:50], self.y[:50], 100), np.arange(50))
+        np.testing.assert_array_equal(minmax_indices(self.y[:50], 100), np.arange(50))
+        data = pd.DataFrame({"x": self.x[:50], "y": self.y[:50]})
+        for reduce in [downsample_line, bin_scatter]:
+            reduced, summary = reduce(data, "x", "y", 100)
+            self.assertIs(reduced, data)
+            self.assertIsNone(summary)
+
+    def test_downsample_line(self):
+        data = pd.DataFrame({"x": self.x, "y": self.y})
+        for method in ["lttb", "minmax"]:
+            reduced, summary = downsample_line(data, "x", "y", 100, method)
+            self.assertLessEqual(len(reduced), 100)
+            self.assertEqual(summary["total"], 1000)
+            self.assertEqual(reduced["x"].iloc[[0, -1]].tolist(), [0, 999])
+
+    def test_bin_scatter_dates(self):
+        times = pd.Series(pd.date_range("2020-01-01", periods=1000, freq="h", tz="UTC"))
+        data = pd.DataFrame({"t": times, "y": self.y})
+        binned, summary = bin_scatter(data, "t", "y", 100)
+        self.assertEqual(binned["t"].dtype.tz, times.dtype.tz)
+        self.assertTrue(binned["t"].between(times.min(), times.max()).all())
+        self.assertEqual(binned["count"].sum(), 1000)
+        self.assertLessEqual(len(binned), 100)
+
+
+class UploadTests(MediaTestCase):
+    def test_byte_order_mark(self):
+        self.upload("a,b\n1,2\n3,4\n".encode("utf-8-sig"))
+        csv_file = CSVFile.objects.get(user=self.user)
+        self.assertEqual(csv_file.row_count, 2)
+        self.assertIn("a", csv_file.schema)
+
+    def test_invalid_file_is_discarded(self):
+        self.upload(b"a,a\n1,2\n")
+        self.assertFalse(CSVFile.objects.exists())
+
+    def test_unexpected_failure_is_discarded(self):
+        with mock.patch("myapp.views.ingest_csv", side_effect=RuntimeError("disk full")):
+            self.upload(b"a,b\n1,2\n")
+        self.assertFalse(CSVFile.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "csv_files")), [])
+
+
+class ReadRowsTests(MediaTestCase):
+    def test_matches_dataset(self):
+        data = pd.DataFrame({
+            "a": np.arange(300) * 0.5,
+            "b": [f"text {i}" for i in range(300)],
+            "c": np.arange(300) % 2 == 0,
+        })
+        # Several record batches, so rows come from more than one.
+        with mock.patch("myapp.ingest.CHUNK_ROWS", 64):
+            self.upload(data.to_csv(index=False).encode())
+        csv_file = CSVFile.objects.get(user=self.user)
+        expected = read_dataset(csv_file)
+        positions = [250, 3, 120, 3, 299]
+        for memory_map in [True, False]:
+            with mock.patch.object(storage, "MEMORY_MAP", memory_map):
+                dataset_cache.clear()
+                for columns in [None, ["b", "a"]]:
+                    rows = storage.read_rows(csv_file, positions, columns)
+                    want = expected if columns is None else expected[columns]
+                    pd.testing.assert_frame_equal(rows, want.iloc[positions].reset_index(drop=True))
+
+
+class PagingTests(MediaTestCase):
+    VIEWS = [
+        ("a", False, None, None),
+        ("a", True, None, None),
+        ("b", False, None, None),
+        (None, False, "a", ">= 10"),
+        ("a", True, "b", "x1"),
+        ("b", True, "a", "!= 3"),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame({
+            "a": rng.integers(0, 20, size=500).astype(float),
+            "b": [f"x{i % 37}" for i in range(500)],
+        })
+        self.data.loc[::23, "a"] = np.nan
+        with mock.patch("myapp.ingest.CHUNK_ROWS", 128):
+            self.upload(self.data.to_csv(index=False).encode())
+        self.csv_file = CSVFile.objects.get(user=self.user)
+        self.data.insert(0, "Index", range(len(self.data)))
+        self.addCleanup(paging._row_orders.clear)
+
+    def expected(self, data, sort, descending, filter_column, filter_value):
+        if filter_column:
+            data = data[paging.filter_mask(data[filter_column], filter_value)]
+        if sort:
+            data = data.sort_values(sort, ascending=not descending, kind="stable", na_position="last")
+        return data
+
+    def check_pages(self, data):
+        columns = list(data.columns)
+        for view in self.VIEWS:
+            positions = paging.row_order(self.csv_file, *view)
+            expected = self.expected(data, *view)
+            self.assertEqual(len(paging.DatasetRows(self.csv_file, columns, positions)), len(expected))
+            for start, stop in [(0, 10), (40, 50), (len(expected) - 5, len(expected) + 5)]:
+                page = np.arange(len(data))[start:stop] if positions is None else positions[start:stop]
+                rows = storage.read_rows(self.csv_file, page, columns)
+                # Ingest may store the text column as a categorical.
+                pd.testing.assert_frame_equal(
+                    rows.astype(object), expected.iloc[start:stop].reset_index(drop=True).astype(object),
+                    check_dtype=False,
+                )
+
+    def test_cold_cache(self):
+        for memory_map in [True, False]:
+            with mock.patch.object(storage, "MEMORY_MAP", memory_map):
+                dataset_cache.clear()
+                paging._row_orders.clear()
+                self.check_pages(self.data)
+
+    def test_warm_cache(self):
+        read_dataset(self.csv_file)
+        self.check_pages(self.data)
+        self.check_pages(self.data)
+
+    def test_after_edit(self):
+        self.check_pages(self.data)
+        edited = apply_edit(read_dataset(self.csv_file), "delete_rows", {"rows": list(range(0, 500, 3))})
+        journal.record_edit(self.csv_file, "delete_rows", {"rows": list(range(0, 500, 3))}, edited)
+        expected = self.data[self.data["Index"] % 3 != 0].reset_index(drop=True)
+        self.check_pages(expected)
+        dataset_cache.clear()
+        self.check_pages(expected)
+
+
+@mock.patch.object(journal, "BACKGROUND_COMPACTION", False)
+@mock.patch.object(journal, "UNDO_DEPTH", 2)
+@mock.patch.object(journal, "COMPACT_AFTER", 3)
+class JournalTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload(pd.DataFrame({"x": range(20)}).to_csv(index=False).encode())
+        self.csv_file = CSVFile.objects.get(user=self.user)
+
+    def edit(self, operation, **payload):
+        data = apply_edit(read_dataset(self.csv_file), operation, payload)
+        journal.record_edit(self.csv_file, operation, payload, data)
+
+    def stored(self):
+        # A fresh instance read past the process cache, as another worker would.
+        dataset_cache.clear()
+        return read_dataset(CSVFile.objects.get(pk=self.csv_file.pk))
+
+    def delete_rows(self, *rows):
+        for row in rows:
+            self.edit("delete_rows", rows=[row])
+
+    def test_undo_and_redo(self):
+        self.delete_rows(0, 1)
+        journal.undo_edit(self.csv_file)
+        self.assertEqual(list(self.stored()["x"]), list(range(1, 20)))
+        journal.redo_edit(self.csv_file)
+        self.assertEqual(list(self.stored()["x"]), list(range(2, 20)))
+
+    def test_compaction_round_trip(self):
+        self.delete_rows(0, 1, 2, 3)
+        csv_file = CSVFile.objects.get(pk=self.csv_file.pk)
+        self.assertTrue(csv_file.snapshot_edit_id)
+        self.assertEqual(len(read_snapshot(csv_file)), 18)
+        self.assertEqual(list(self.stored()["x"]), list(range(4, 20)))
+        # Only the edits kept for undo remain reversible.
+        for _ in range(3):
+            journal.undo_edit(self.csv_file)
+        self.assertEqual(list(self.stored()["x"]), list(range(2, 20)))
+
+    def test_snapshot_csv_matches_after_compaction(self):
+        self.delete_rows(0, 1, 2, 3)
+        csv_file = CSVFile.objects.get(pk=self.csv_file.pk)
+        os.remove(csv_file.columnar_file.path)
+        self.assertEqual(list(read_snapshot(csv_file)["x"]), list(range(2, 20)))
+        self.assertEqual(list(self.stored()["x"]), list(range(4, 20)))
+
+    def test_reader_on_previous_snapshot(self):
+        self.delete_rows(0, 1)
+        before = CSVFile.objects.get(pk=self.csv_file.pk)
+        self.delete_rows(2, 3)
+        # It replays every edit its snapshot lacks, folded since or not.
+        dataset_cache.clear()
+        self.assertEqual(list(read_dataset(before)["x"]), list(range(4, 20)))
+
+    def test_timed_out_edit_job_is_not_applied(self):
+        job = Job.objects.create(
+            user=self.user, csv_file=self.csv_file, kind="edit", status="failed",
+            params={"operation": "delete_rows", "payload": {"rows": [0]}},
+        )
+        self.assertIsNone(tasks.edit_dataset(job))
+        self.assertFalse(self.csv_file.edits.exists())
+        job.status = "running"
+        job.save()
+        self.assertEqual(tasks.edit_dataset(job), {"rows": 19})
+        self.assertEqual(len(self.stored()), 19)
+
+    def test_convert_datasets_keeps_edits(self):
+        self.delete_rows(0, 1, 2, 3)
+        call_command("convert_datasets", "--force", stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(len(self.stored()), 16)
+        with self.assertRaises(IngestError):
+            ingest_csv(CSVFile.objects.get(pk=self.csv_file.pk))
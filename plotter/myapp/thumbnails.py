@@ -0,0 +1,223 @@
+import base64
+import json
+import math
+from html import escape
+
+import numpy as np
+
+
+WIDTH = 320
+HEIGHT = 200
+PADDING = 12
+MAX_POINTS = 400
+MAX_BARS = 120
+PALETTE = ["#636efa", "#ef553b", "#00cc96", "#ab63fa", "#ffa15a", "#19d3f3", "#ff6692", "#b6e880"]
+
+
+def decode_array(value):
+    """A trace array from figure JSON as a numpy array; plotly writes numeric
+    arrays as base64 ``{"dtype": ..., "bdata": ...}`` objects."""
+    if value is None:
+        return np.array([])
+    if isinstance(value, dict) and "bdata" in value:
+        data = np.frombuffer(base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"]).newbyteorder("<"))
+        return data.reshape(value["shape"]) if "shape" in value else data
+    return np.asarray(value, dtype=object if any(isinstance(v, str) for v in value) else None)
+
+
+def _numbers(values):
+    """Numeric view of ``values``; categories map to their first position."""
+    if values.dtype.kind in "biuf":
+        return values.astype(float)
+    positions = {}
+    return np.array([positions.setdefault(v, len(positions)) for v in values], dtype=float)
+
+
+def _color(trace, index):
+    for part in ("marker", "line"):
+        color = (trace.get(part) or {}).get("color")
+        if isinstance(color, str):
+            return escape(color)
+    return PALETTE[index % len(PALETTE)]
+
+
+def _sample(x, y, limit=MAX_POINTS):
+    if len(x) <= limit:
+        return x, y
+    keep = np.linspace(0, len(x) - 1, limit).astype(int)
+    return x[keep], y[keep]
+
+
+def _thin_bars(x, y):
+    """At most MAX_BARS bars: neighbouring bars are merged, keeping the tallest."""
+    if len(x) <= MAX_BARS:
+        return x, y
+    order = np.argsort(x, kind="stable")
+    starts = np.linspace(0, len(x), MAX_BARS, endpoint=False).astype(int)
+    x, y = x[order], np.nan_to_num(y[order])
+    return np.add.reduceat(x, starts) / np.diff(np.r_[starts, len(x)]), np.maximum.reduceat(y, starts)
+
+
+class _Canvas:
+    """Maps data coordinates onto the thumbnail, with y pointing up."""
+
+    def __init__(self, xs, ys, zero=False):
+        xs = np.concatenate(xs) if xs else np.array([0.0, 1.0])
+        ys = np.concatenate(ys + [np.zeros(1)] * zero) if ys else np.array([0.0, 1.0])
+        xs, ys = xs[np.isfinite(xs)], ys[np.isfinite(ys)]
+        self.x0, self.x1 = (xs.min(), xs.max()) if xs.size else (0.0, 1.0)
+        self.y0, self.y1 = (ys.min(), ys.max()) if ys.size else (0.0, 1.0)
+        if self.x1 == self.x0:
+            self.x0, self.x1 = self.x0 - 0.5, self.x1 + 0.5
+        if self.y1 == self.y0:
+            self.y1 = self.y0 + 1.0
+        # Half a step of room either side, so edge bars and boxes fit.
+        if zero:
+            step = _step(xs)
+            self.x0, self.x1 = self.x0 - step / 2, self.x1 + step / 2
+
+    def width(self, step):
+        return step / (self.x1 - self.x0) * (WIDTH - 2 * PADDING)
+
+    def x(self, values):
+        return PADDING + (np.asarray(values) - self.x0) / (self.x1 - self.x0) * (WIDTH - 2 * PADDING)
+
+    def y(self, values):
+        return HEIGHT - PADDING - (np.asarray(values) - self.y0) / (self.y1 - self.y0) * (HEIGHT - 2 * PADDING)
+
+
+def _step(x):
+    positions = np.unique(x[np.isfinite(x)])
+    return float(np.min(np.diff(positions))) if len(positions) > 1 else 1.0
+
+
+def _series(trace):
+    """``(kind, x, y)`` for one cartesian trace, histograms already binned."""
+    kind = trace.get("type", "scatter")
+    horizontal = trace.get("orientation") == "h"
+    x, y = decode_array(trace.get("x")), decode_array(trace.get("y"))
+    if horizontal:
+        x, y = y, x
+    if kind == "histogram":
+        values = _numbers(x if x.size else y)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return None
+        counts, edges = np.histogram(values, bins=20)
+        return "bar", (edges[:-1] + edges[1:]) / 2, counts.astype(float)
+    if kind == "box":
+        if "q1" in trace:
+            # Statistics precomputed for large datasets, one box per position.
+            stats = np.column_stack([
+                decode_array(trace.get(name)).astype(float)
+                for name in ("lowerfence", "q1", "median", "q3", "upperfence")
+            ])
+        else:
+            values = _numbers(y)
+            values = values[np.isfinite(values)]
+            if not values.size:
+                return None
+            stats = np.percentile(values, [0, 25, 50, 75, 100])[np.newaxis]
+            x = x[:1]
+        positions = _numbers(x) if len(x) == len(stats) else np.arange(len(stats), dtype=float)
+        return "box", *_sample(positions, stats, MAX_BARS)
+    if kind in ("bar", "scatter", "scattergl"):
+        if not y.size:
+            return None
+        x = _numbers(x) if x.size else np.arange(len(y), dtype=float)
+        y = _numbers(y)
+        if kind == "bar":
+            return "bar", *_thin_bars(x, y)
+        lines = "lines" in trace.get("mode", "markers")
+        return "line" if lines else "points", *_sample(x, y)
+    return None
+
+
+def _pie(trace):
+    values = _numbers(decode_array(trace.get("values")))
+    values = values[np.isfinite(values) & (values > 0)]
+    if not values.size:
+        return []
+    cx, cy, r = WIDTH / 2, HEIGHT / 2, HEIGHT / 2 - PADDING
+    hole = float(trace.get("hole") or 0) * r
+    shapes = []
+    angle = -math.pi / 2
+    for i, share in enumerate(values / values.sum()):
+        end = angle + share * 2 * math.pi
+        large = 1 if share > 0.5 else 0
+        x0, y0 = cx + r * math.cos(angle), cy + r * math.sin(angle)
+        x1, y1 = cx + r * math.cos(min(end, angle + 2 * math.pi - 1e-6)), cy + r * math.sin(min(end, angle + 2 * math.pi - 1e-6))
+        shapes.append(
+            f'<path d="M{cx:.1f},{cy:.1f} L{x0:.1f},{y0:.1f} A{r:.1f},{r:.1f} 0 {large} 1 {x1:.1f},{y1:.1f} Z" '
+            f'fill="{PALETTE[i % len(PALETTE)]}" stroke="white" stroke-width="1"/>'
+        )
+        angle = end
+    if hole:
+        shapes.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{hole:.1f}" fill="white"/>')
+    return shapes
+
+
+def figure_thumbnail(figure):
+    """Small SVG preview of a figure given as plotly JSON (text or dict).
+
+    Only the gist is drawn, bars, lines, points, boxes and pie slices on
+    shared axes, so the gallery can list plots without loading their data.
+    """
+    if isinstance(figure, str):
+        figure = json.loads(figure)
+    traces = figure.get("data") or []
+    shapes = []
+    series = []
+    for index, trace in enumerate(traces):
+        if trace.get("type") == "pie":
+            shapes += _pie(trace)
+        else:
+            item = _series(trace)
+            if item is not None:
+                series.append((index, trace, *item))
+
+    zero = any(item[2] in ("bar", "box") for item in series)
+    canvas = _Canvas([item[3] for item in series], [np.ravel(item[4]) for item in series], zero)
+    baseline = canvas.y(0.0)
+    for index, trace, kind, x, y in series:
+        color = _color(trace, index)
+        if kind == "bar":
+            half = max(canvas.width(_step(x)) * 0.4, 0.5)
+            for left, top in zip(canvas.x(x) - half, canvas.y(y)):
+                if np.isfinite(left) and np.isfinite(top):
+                    shapes.append(
+                        f'<rect x="{left:.1f}" y="{min(top, baseline):.1f}" width="{2 * half:.1f}" '
+                        f'height="{abs(baseline - top):.1f}" fill="{color}"/>'
+                    )
+        elif kind == "box":
+            half = canvas.width(_step(x)) * 0.3
+            for centre, (low, q1, median, q3, high) in zip(canvas.x(x), canvas.y(y)):
+                shapes.append(f'<line x1="{centre:.1f}" y1="{low:.1f}" x2="{centre:.1f}" y2="{high:.1f}" stroke="{color}"/>')
+                shapes.append(
+                    f'<rect x="{centre - half:.1f}" y="{q3:.1f}" width="{2 * half:.1f}" height="{q1 - q3:.1f}" '
+                    f'fill="{color}" fill-opacity="0.4" stroke="{color}"/>'
+                )
+                shapes.append(
+                    f'<line x1="{centre - half:.1f}" y1="{median:.1f}" x2="{centre + half:.1f}" y2="{median:.1f}" stroke="{color}"/>'
+                )
+        else:
+            finite = np.isfinite(x) & np.isfinite(y)
+            px, py = canvas.x(x[finite]), canvas.y(y[finite])
+            if kind == "line":
+                if len(px) > 1 and np.all(np.diff(x[finite]) >= 0):
+                    points = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(px, py))
+                    shapes.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+                    continue
+            shapes += [f'<circle cx="{a:.1f}" cy="{b:.1f}" r="1.5" fill="{color}" fill-opacity="0.7"/>' for a, b in zip(px, py)]
+
+    return _svg(shapes)
+
+
+def _svg(shapes):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}">'
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="white"/>' + "".join(shapes) + "</svg>"
+    )
+
+
+EMPTY_THUMBNAIL = _svg([])
@@ -0,0 +1,284 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+
+# Upper bounds of the histogram buckets, as Prometheus expects them: seconds
+# of latency and bytes of response body.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+# Spans of the request being served: name -> [count, seconds]. Copied into
+# the threads async views offload to, so their spans count too.
+_spans = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(name):
+    """Time the block as phase ``name`` of the current request. Nested and
+    repeated spans each add up; outside a request this does nothing."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        entry = spans.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimated like PromQL's ``histogram_quantile``: linear within the
+        bucket the quantile falls in, capped at the largest value seen."""
+        count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, bucket in enumerate(self.counts):
+            if bucket and seen + bucket >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / bucket, self.max)
+            seen += bucket
+        return self.max
+
+    def cumulative(self):
+        running = 0
+        for bound, bucket in zip(list(self.bounds) + [math.inf], self.counts):
+            running += bucket
+            yield bound, running
+
+
+class ViewTimings:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.errors = 0
+        self.spans = {}
+
+
+class TimingStore:
+    """Per-view request latency and response size histograms, plus time per
+    span, kept in this process since it started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = timezone.now()
+        self.views = {}
+
+    def record(self, view, seconds, size, status, spans):
+        with self._lock:
+            timings = self.views.get(view)
+            if timings is None:
+                timings = self.views[view] = ViewTimings()
+            timings.latency.observe(seconds)
+            if size is not None:
+                timings.size.observe(size)
+            if status >= 500:
+                timings.errors += 1
+            for name, (count, elapsed) in spans.items():
+                entry = timings.spans.setdefault(name, [0, 0.0])
+                entry[0] += count
+                entry[1] += elapsed
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+            self.started = timezone.now()
+
+    def summary(self):
+        """Rows for the timing page, slowest views in total first."""
+        with self._lock:
+            rows = []
+            for view, timings in self.views.items():
+                requests = timings.latency.count
+                rows.append({
+                    "view": view,
+                    "requests": requests,
+                    "errors": timings.errors,
+                    "total_s": timings.latency.total,
+                    "mean_ms": timings.latency.total / requests * 1000,
+                    "p50_ms": timings.latency.quantile(0.5) * 1000,
+                    "p95_ms": timings.latency.quantile(0.95) * 1000,
+                    "max_ms": timings.latency.max * 1000,
+                    "mean_bytes": timings.size.total / timings.size.count if timings.size.count else None,
+                    "max_bytes": timings.size.max if timings.size.count else None,
+                    "spans": sorted(
+                        (
+                            {"name": name, "calls": count / requests, "mean_ms": elapsed / requests * 1000}
+                            for name, (count, elapsed) in timings.spans.items()
+                        ),
+                        key=lambda item: -item["mean_ms"],
+                    ),
+                })
+        return sorted(rows, key=lambda row: -row["total_s"])
+
+    def prometheus(self):
+        """The store in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(metric, help_text, attr):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for view, timings in sorted(self.views.items()):
+                values = getattr(timings, attr)
+                label = _label(view)
+                for bound, count in values.cumulative():
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f'{metric}_bucket{{view="{label}",le="{le}"}} {count}')
+                lines.append(f'{metric}_sum{{view="{label}"}} {values.total!r}')
+                lines.append(f'{metric}_count{{view="{label}"}} {values.count}')
+
+        with self._lock:
+            histogram("plotter_request_duration_seconds", "Request latency by view.", "latency")
+            histogram("plotter_response_size_bytes", "Response body size by view; streamed bodies are not counted.", "size")
+            lines.append("# HELP plotter_request_errors_total Responses with a 5xx status by view.")
+            lines.append("# TYPE plotter_request_errors_total counter")
+            for view, timings in sorted(self.views.items()):
+                lines.append(f'plotter_request_errors_total{{view="{_label(view)}"}} {timings.errors}')
+            lines.append("# HELP plotter_span_seconds_total Time spent in each request phase by view.")
+            lines.append("# TYPE plotter_span_seconds_total counter")
+            for view, timings in sorted(self.views.items()):
+                for name, (count, elapsed) in sorted(timings.spans.items()):
+                    lines.append(f'plotter_span_seconds_total{{view="{_label(view)}",span="{_label(name)}"}} {elapsed!r}')
+            lines.append("# HELP plotter_span_calls_total Times each request phase ran by view.")
+            lines.append("# TYPE plotter_span_calls_total counter")
+            for view, timings in sorted(self.views.items()):
+                for name, (count, elapsed) in sorted(timings.spans.items()):
+                    lines.append(f'plotter_span_calls_total{{view="{_label(view)}",span="{_label(name)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+timing_store = TimingStore()
+
+
+# Collection
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        # Unresolved paths share one series instead of one per URL.
+        return "unmatched"
+    return match.url_name or match.view_name
+
+
+class TimingMiddleware:
+    """Time every request and the spans opened while serving it, add them to
+    ``timing_store`` and send them back in a ``Server-Timing`` header. Goes
+    first in MIDDLEWARE so the time of the other middleware counts."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        spans = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, spans)
+
+    async def __acall__(self, request):
+        spans = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, spans)
+
+    def finish(self, request, response, seconds, spans):
+        size = None if response.streaming else len(response.content)
+        timing_store.record(_view_name(request), seconds, size, response.status_code, spans)
+        header = [f"{name};dur={elapsed * 1000:.1f}" for name, (count, elapsed) in spans.items()]
+        response["Server-Timing"] = ", ".join(header + [f"total;dur={seconds * 1000:.1f}"])
+        return response
+
+
+class TimedSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware with the session save timed as a span."""
+
+    def process_response(self, request, response):
+        with span("session_save"):
+            return super().process_response(request, response)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with span("template"):
+            return self.template.render(context, request)
+
+
+class TimedTemplates(DjangoTemplates):
+    """The Django template backend with each render timed as a span."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def _time_query(execute, sql, params, many, context):
+    with span("db"):
+        return execute(sql, params, many, context)
+
+
+def _add_query_timer(sender, connection, **kwargs):
+    # Every new connection, in any thread, times the queries it runs.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_add_query_timer)
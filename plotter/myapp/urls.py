@@ -1,22 +1,37 @@
 # myapp/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the heavy pages are served by their async versions.
+pages = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('about/', views.about, name='about'),
-    path('data/', views.data, name='data'),
+    path('data/', pages.data, name='data'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('register/', views.register, name='register'),
     path('contact/', views.contact, name='contact'),
-    path('describe', views.describe_data, name='describe'),
+    path('describe', pages.describe_data, name='describe'),
     path('selectPlot', views.select_viz, name='selectPlot'),
-    path('bar', views.bar_viz, name='bar'),
-    path('box', views.box_viz, name='box'),
-    path('histogram', views.histogram_viz, name='histogram'),
-    path('pie', views.pie_viz, name='pie'),
-    path('scatter', views.scatter_viz, name='scatter'),
-    path('line', views.line_viz, name='line'),
-    path('export/', views.export_plots, name='export_plots'),
+    path('bar', pages.bar_viz, name='bar'),
+    path('box', pages.box_viz, name='box'),
+    path('histogram', pages.histogram_viz, name='histogram'),
+    path('pie', pages.pie_viz, name='pie'),
+    path('scatter', pages.scatter_viz, name='scatter'),
+    path('line', pages.line_viz, name='line'),
+    path('export/', pages.export_plots, name='export_plots'),
+    path('export/zip', views.bulk_export, name='bulk_export'),
+    path('api/plots', views.saved_plots_api, name='saved_plots_api'),
+    path('api/plots/<int:plot_id>/data', views.saved_plot_data, name='saved_plot_data'),
+    path('api/plots/<int:plot_id>/thumbnail.svg', views.saved_plot_thumbnail, name='saved_plot_thumbnail'),
+    path('js/plotly-<str:version>.min.js', views.plotly_js, name='plotly_js'),
+    path('stats/cache', views.cache_stats, name='cache_stats'),
+    path('stats/jobs', views.job_stats, name='job_stats'),
+    path('stats/timing', views.timing_stats, name='timing_stats'),
+    path('stats/metrics', views.metrics, name='metrics'),
+    path('jobs/<int:job_id>', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/cancel', views.cancel_job, name='cancel_job'),
 ]
@@ -1,20 +1,45 @@
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth.models import User
-from .models import CSVFile, SavedPlot
-from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from .models import CSVFile, Job, SavedPlot
+from .dataset_cache import dataset_cache
+from .figure_cache import figure_cache, make_key
+from .image_export import MAX_PLOTS as EXPORT_MAX_PLOTS, available_formats, export_zip
+from .edits import ROW_OPERATIONS, apply_edit, next_row_index
+from .ingest import IngestError, ingest_csv
+from .jobs import ACTIVE, cancel, latest_job, metrics as job_metrics, run_in_background, submit, wake
+from .journal import record_edit, redo_edit, undo_edit
+from .paging import DatasetRows, row_order
+from .plot_state import PlotState
+from .plot_store import load_figure, save_figure
+from .plots import COMMON_OPTIONS, PLOT_TYPES, PlotData, pipeline, plot_columns
+from .profiling import APPROXIMATE_ROWS, dataset_profile, describe_table, profile_ready
+from .storage import (
+    dataset_columns,
+    dataset_hash,
+    read_dataset,
+    row_index,
+)
+from .thumbnails import EMPTY_THUMBNAIL, figure_thumbnail
+from .timing import timing_store
 from django.utils import timezone
+from django.urls import reverse
+from django.template.loader import render_to_string
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.views.decorators.http import etag, require_POST
+from functools import lru_cache
 import json
 
 import pandas as pd
-import numpy as np
-import plotly.express as px
 import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
 
 def register(request):
     if request.method == 'POST':
@@ -79,9 +104,26 @@ def contact(request):
     return render(request, "myapp/contact.html")
 
 
+@lru_cache(maxsize=1)
+def plotly_js_bundle():
+    return get_plotlyjs()
+
+
+def plotly_js_url():
+    return reverse('plotly_js', args=[get_plotlyjs_version()])
+
+
+@etag(lambda request, version: version)
+def plotly_js(request, version):
+    # The URL carries the bundle version, so browsers may keep it forever.
+    response = HttpResponse(plotly_js_bundle(), content_type="application/javascript")
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
 def select_viz(request):
     viz = PlotViz(request)
-    if not viz.data.empty:
+    if viz.has_data():
         return render(request, "myapp/selectPlot.html")
     else:
         messages.error(request, "Data is empty")
@@ -89,819 +131,361 @@ def select_viz(request):
 
 
 
+EXPORT_PAGE_SIZE = getattr(settings, "EXPORT_PAGE_SIZE", 24)
+
+
 class PlotViz:
-    def __init__(self, request):
+    """A plot page for one of the registered ``PLOT_TYPES``: the form is
+    parsed into a spec kept in the session's ``PlotState``, and the figure is
+    rendered from the spec by ``plots.pipeline`` unless the figure cache has
+    it."""
+
+    # Keys written by earlier versions that held the full figure and its HTML.
+    legacy_session_keys = [
+        "plot_div",
+        "plot_bar",
+        "plot_box",
+        "plot_histogram",
+        "plot_line",
+        "plot_pie",
+        "plot_scatter",
+    ]
+
+    def __init__(self, request=None, csv_file=None, plot_type=None):
         self.request = request
+        self.plot_type = PLOT_TYPES[plot_type] if plot_type is not None else None
         self.plot_div = None
-        self.plot_div_type = None
-        self.columns = []
-        self.data = self.get_user_data()
-        self.load_from_session()
- 
-    def get_user_data(self):
+        self.figure_json = None
+        self.plot_note = None
+        self._source = None
+        if request is not None and csv_file is None:
+            csv_file = self.get_user_csv_file()
+        self.csv_file = csv_file
+        self.columns = dataset_columns(csv_file) if csv_file is not None else []
+        if request is None:
+            # Background jobs render a spec for a given file, outside any request.
+            return
+        self.state = PlotState(request)
+        self.import_legacy_session()
+        self.spec = self.load_state()
+
+    def import_legacy_session(self):
+        # Earlier versions kept every option under its own session key and
+        # the specs under "plot_specs"; they move into the plot state once.
+        session = self.request.session
+        for key in self.legacy_session_keys:
+            session.pop(key, None)
+        keys = {option.state_key for option in COMMON_OPTIONS}
+        keys.update(option.state_key for plot_type in PLOT_TYPES.values() for option in plot_type.options)
+        options = {key: session.pop(key) for key in keys if key in session}
+        specs = session.pop("plot_specs", None)
+        if self.state:
+            return
+        self.state.update(options)
+        if isinstance(specs, dict):
+            self.state.set_specs(specs)
+
+    def get_user_csv_file(self):
         user = self.request.user
         if user.is_authenticated:
             try:
-                csv_file = CSVFile.objects.filter(user=user).latest('uploaded_at') 
-                data = pd.read_csv(csv_file.file.path)
-                if 'Index' not in data.columns:
-                    data['Index'] = data.index
-                    cols = ['Index'] + [col for col in data.columns if col != 'Index']
-                    data = data[cols]
-                self.columns = list(data.columns)
-                return data
+                return CSVFile.objects.filter(user=user).latest('uploaded_at') 
             except CSVFile.DoesNotExist:
-                return pd.DataFrame()
-        return pd.DataFrame()
-    
-    def load_from_session(self):
-        session = self.request.session
-        self.x_column = session.get("x_column", "")
-        self.y_column = session.get("y_column", "")
-        self.plot_title = session.get("plot_title", "Data Plot")
-        self.plot_color = session.get("plot_color", None)
-        self.plot_style = session.get("plot_style", None)
-        self.x_axis_label = session.get("x_axis_label", "x")
-        self.y_axis_label = session.get("y_axis_label", "y")
-        self.title_font_size_input = session.get("title_font_size", 24)
-        self.show_grid = session.get("show_grid", False)
-        self.show_legend = session.get("show_legend", False)
-
-    def save_to_session(self):
-        session = self.request.session
-        session["x_column"] = self.x_column
-        session["y_column"] = self.y_column
-        session["plot_title"] = self.plot_title
-        session["plot_color"] = self.plot_color
-        session["plot_style"] = self.plot_style
-        session["x_axis_label"] = self.x_axis_label
-        session["y_axis_label"] = self.y_axis_label
-        session["title_font_size"] = self.title_font_size_input
-        session["show_grid"] = self.show_grid
-        session["show_legend"] = self.show_legend
+                return None
+        return None
+
+    def source(self, spec):
+        # Reused while the plotted columns stay the same, so the emptiness
+        # check and the render read the dataset once.
+        columns = plot_columns(self.plot_type, spec, self.columns)
+        if self._source is None or self._source.columns != columns:
+            self._source = PlotData(self.csv_file, columns)
+        return self._source
+
+    def has_data(self):
+        if self.csv_file is None:
+            return False
+        source = self.source(self.spec)
+        if source.large:
+            return bool(self.columns)
+        return not source.frame.empty
+
+    def load_state(self):
+        values = self.state.values({option.state_key: option.default for option in COMMON_OPTIONS})
+        return {option.name: values[option.state_key] for option in COMMON_OPTIONS}
 
     def update_from_post(self):
-        self.x_column = self.request.POST.get("x_column", self.x_column)
-        self.y_column = self.request.POST.get("y_column", self.y_column)
-        self.plot_title = self.request.POST.get("plot_title", self.plot_title)
-        self.plot_color = self.request.POST.get("plot_color", self.plot_color)
-        self.plot_style = self.request.POST.get("plot_style", self.plot_style)
-        self.x_axis_label = self.request.POST.get("x_axis_label", self.x_axis_label)
-        self.y_axis_label = self.request.POST.get("y_axis_label", self.y_axis_label)
-        self.title_font_size_input = int(self.request.POST.get("title_font_size", self.title_font_size_input))
-        self.show_grid = "show_grid" in self.request.POST
-        self.show_legend = "show_legend" in self.request.POST
-        self.save_to_session()
+        """Parse the posted form into the spec. Common options keep their
+        previous value when missing, the plot type's fall back to defaults;
+        the templates read them all back from the plot state."""
+        post = self.request.POST
+        spec = {option.name: option.from_post(post, self.spec[option.name]) for option in COMMON_OPTIONS}
+        spec.update((option.name, option.from_post(post, option.default)) for option in self.plot_type.options)
+        self.state.update({option.state_key: spec[option.name] for option in COMMON_OPTIONS + self.plot_type.options})
+        self.spec = spec
+        self.store_spec()
+
+    def store_spec(self):
+        self.state.set_spec(self.plot_type.name, self.spec)
+
+    def stored_spec(self):
+        return self.state.spec(self.plot_type.name)
 
     def render_plot(self):
         return render(
             self.request,
-            self.template_name,
-            {"plot_div": self.plot_div, "columns": self.columns},
+            self.plot_type.template_name,
+            {
+                "plot_div": self.plot_div,
+                "plot_note": self.plot_note,
+                "plot_options": self.state.all_values(),
+                "columns": self.columns,
+                "plotly_js_url": plotly_js_url(),
+            },
         )
-    
-    def title_font_fix(self):
-        try:
-            self.title_font_size = int(self.title_font_size_input) if self.title_font_size_input else 24
-        except (ValueError, TypeError):
-            self.title_font_size = 24
 
-    def save_plot(self, title, plot_type, fig):
+    def save_plot(self, title, plot_type, fig, live=False):
+        if live:
+            return self.save_live_plot(title, plot_type)
         try:
-            print(fig)
             if fig is None:
                 return False, "No plot to save. Please create a plot first."
 
-            plot_data = pio.to_json(fig)
+            # The figure JSON rendered for the page is saved as it is.
+            plot_data = fig if isinstance(fig, str) else pio.to_json(fig)
 
             plot = SavedPlot(
                 user=self.request.user,
                 title=title,
                 plot_type=plot_type,
-                plot_data=plot_data,
+                thumbnail=safe_thumbnail(plot_data),
             )
 
             plot.uploaded_at = timezone.now()
-            print(plot.uploaded_at)
-            plot.save()
+            save_figure(plot, plot_data)
             return True, "Plot saved successfully."
             
         except Exception as e:
             return False, f"Error saving plot: {str(e)}"
 
-    def create_plot(self):
-        raise NotImplementedError("Subclasses should implement this method")
-
-
-class BarViz(PlotViz):
-    template_name = "myapp/plot/bar.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_bar')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
-
-    def create_plot(self):
-        if "bar_plot" in self.request.POST and not self.data.empty:
-            self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'bar')
-            
-            self.bar_mode = self.request.POST.get("bar_mode", "group")
-            self.orientation = self.request.POST.get("orientation", "v")
-            self.bar_width = float(self.request.POST.get("bar_width", 0.8))
-            self.opacity = float(self.request.POST.get("opacity", 1.0))
-
-            self.request.session["bar_mode"] = self.bar_mode
-            self.request.session["orientation"] = self.orientation
-            self.request.session["bar_width"] = self.bar_width
-            self.request.session["opacity"] = self.opacity
-
-            self.title_font_fix()
-
-            x_axis_label = self.x_axis_label or self.x_column
-            y_axis_label = self.y_axis_label or self.y_column
-
-            self.fig = px.bar(
-                self.data,
-                x=self.x_column,
-                y=self.y_column,
-                title=self.plot_title,
-                template=self.plot_style,
-                orientation=self.orientation,
-            )
-
-            if self.plot_color:
-                self.fig.update_traces(marker_color=self.plot_color)
-
-            self.fig.update_traces(
-                marker_color=self.plot_color, opacity=self.opacity, width=self.bar_width
-            )
-
-            self.fig.update_layout(
-                xaxis_title=x_axis_label,
-                yaxis_title=y_axis_label,
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                title=dict(text=self.plot_title, font_size=self.title_font_size),
-            )
-
-            self.fig.update_layout(barmode=self.bar_mode)
-
-            self.request.session['plot_bar'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
-
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('bar') if isinstance(plot_div_dict, dict) else None
-
-        if self.fig is None and self.request.session.get('plot_bar'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_bar'])
-            except Exception:
-                pass
-
-        return self.render_plot()
-
-
-class BoxViz(PlotViz):
-    template_name = "myapp/plot/box.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_box')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
-
-    def create_plot(self):
-        if "box_plot" in self.request.POST and not self.data.empty:
-            self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'box')
-
-            show_boxpoints = "show_boxpoints" in self.request.POST
-            self.request.session["show_boxpoints"] = show_boxpoints
-            boxpoints_value = "all" if show_boxpoints else False
-
-            self.title_font_fix()
-
-            x_axis_label = self.x_axis_label or self.x_column
-            y_axis_label = self.y_axis_label or self.y_column
-
-            self.fig = px.box(
-                self.data,
-                x=self.x_column,
-                y=self.y_column,
-                title=self.plot_title,
-                template=self.plot_style,
-                points=boxpoints_value,
-            )
-
-            if self.plot_color:
-                self.fig.update_traces(marker_color=self.plot_color)
-
-            self.fig.update_layout(
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                xaxis_title=x_axis_label,
-                yaxis_title=y_axis_label,
-                title=dict(text=self.plot_title, font_size=self.title_font_size),
-            )
-
-            self.request.session['plot_box'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
-
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('box') if isinstance(plot_div_dict, dict) else None
-
-        if self.fig is None and self.request.session.get('plot_box'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_box'])
-            except Exception:
-                pass
-
-        return self.render_plot()
-
-
-class HistogramViz(PlotViz):
-    template_name = "myapp/plot/histogram.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_histogram')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
-
-    def create_plot(self):
-        if "histogram_plot" in self.request.POST and not self.data.empty:
-            self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'histogram')
-
-            num_bins_str = self.request.POST.get("num_bins", "")
-            bin_width_str = self.request.POST.get("bin_width", "")
-
-
-            num_bins = int(num_bins_str) if num_bins_str.isdigit() else None
-            bin_width = (
-                float(bin_width_str)
-                if bin_width_str.replace(".", "", 1).isdigit()
-                else None
-            )
-
-            self.request.session["num_bins"] = num_bins
-            self.request.session["bin_width"] = bin_width
-
-            self.title_font_fix()
-
-            x_axis_label = self.x_axis_label or self.x_column
-            y_axis_label = self.y_axis_label or self.y_column
-
-            if num_bins is not None:
-                self.fig = px.histogram(
-                    self.data,
-                    x=self.x_column,
-                    nbins=num_bins,
-                    title=self.plot_title,
-                    template=self.plot_style,
-                )
-            elif bin_width is not None:
-
-                self.fig = px.histogram(
-                    self.data,
-                    x=self.x_column,
-                    nbins=int(10 / bin_width),
-                    title=self.plot_title,
-                    template=self.plot_style,
-                )
-            else:
-                self.fig = px.histogram(
-                    self.data,
-                    x=self.x_column,
-                    title=self.plot_title,
-                    template=self.plot_style,
-                )
-
-            if self.plot_color:
-                self.fig.update_traces(marker_color=self.plot_color)
-
-            self.fig.update_layout(
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                xaxis_title=x_axis_label,
-                yaxis_title=y_axis_label,
-                title=dict(text=self.plot_title, font_size=self.title_font_size),
-            )
-            
-            self.request.session['plot_histogram'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
-
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('histogram') if isinstance(plot_div_dict, dict) else None
-
-        if self.fig is None and self.request.session.get('plot_histogram'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_histogram'])
-            except Exception:
-                pass
-
-        return self.render_plot()
-
-
-class LineViz(PlotViz):
-    template_name = "myapp/plot/line.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_line')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
-
-    def create_plot(self):
-        if "line_plot" in self.request.POST and not self.data.empty:
-            self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'line')
-
-            self.line_width = int(self.request.POST.get("line_width", 2))
-            self.legend_position = self.request.POST.get("legend_position", "top")
-
-            self.request.session["line_width"] = self.line_width
-            self.request.session["legend_position"] = self.legend_position
-
-            x_axis_label = self.x_axis_label or self.x_column
-            y_axis_label = self.y_axis_label or self.y_column
-
-            self.title_font_fix()
-
-            self.fig = px.line(
-                self.data,
-                x=self.x_column,
-                y=self.y_column,
-                title=self.plot_title,
-                template=self.plot_style,
-            )
-
-            if self.plot_color:
-                self.fig.update_traces(
-                    line=dict(color=self.plot_color, width=self.line_width)
-                )
-            
-            self.fig.update_layout(
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                xaxis_title=x_axis_label,
-                yaxis_title=y_axis_label,
-                legend=dict(yanchor="top", y=1.02, xanchor="center", x=0.5),
-                title=dict(text=self.plot_title, font_size=self.title_font_size),
-            )
-
-            if self.legend_position == "bottom":
-                self.fig.update_layout(
-                    legend=dict(yanchor="bottom", y=-0.2, xanchor="center", x=0.5)
-                )
-            elif self.legend_position == "left":
-                self.fig.update_layout(
-                    legend=dict(yanchor="middle", y=0.5, xanchor="left", x=-0.1)
-                )
-            elif self.legend_position == "right":
-                self.fig.update_layout(
-                    legend=dict(yanchor="middle", y=0.5, xanchor="right", x=1.1)
-                )
-
-            self.request.session['plot_line'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
-
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('line') if isinstance(plot_div_dict, dict) else None
-
-        if self.fig is None and self.request.session.get('plot_line'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_line'])
-            except Exception:
-                pass
-
-        return self.render_plot()
-
-
-class PieViz(PlotViz):
-    template_name = "myapp/plot/pie.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_pie')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
-
-    def create_plot(self):
-        if "pie_plot" in self.request.POST and not self.data.empty:
-            self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'pie')
-
-            self.hole_size = float(self.request.POST.get("hole_size", 0)) 
-            self.label_position = self.request.POST.get("label_position", "inside")
-
-            self.request.session["hole_size"] = self.hole_size
-            self.request.session["label_position"] = self.label_position
-
-            self.title_font_fix()
-
-            self.fig = px.pie(
-                self.data,
-                names=self.x_column,
-                values=self.y_column, 
-                title=self.plot_title,
-                template=self.plot_style,
-            )
-
-            if self.hole_size > 0:
-                self.fig.update_traces(hole=self.hole_size)
-
-            self.fig.update_traces(textposition=self.label_position) 
-            self.fig.update_layout(
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                title=dict(text=self.plot_title, font_size=self.title_font_size)
-            )
-
-            self.request.session['plot_pie'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
-
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('pie') if isinstance(plot_div_dict, dict) else None
-
-        if self.fig is None and self.request.session.get('plot_pie'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_pie'])
-            except Exception:
-                pass
-
-        return self.render_plot()
-    
-
-class ScatterViz(PlotViz):
-    template_name = "myapp/plot/scatter.html"
-
-    def __init__(self, request):
-        super().__init__(request)
-        # Initialize fig from session if it exists
-        self.fig = None
-        plot_data = self.request.session.get('plot_scatter')
-        if plot_data:
-            try:
-                self.fig = pio.from_json(plot_data)
-            except Exception:
-                pass
+    def save_live_plot(self, title, plot_type):
+        """Save the plot as its spec and dataset version only; the figure is
+        rebuilt when the plot is exported."""
+        spec = self.stored_spec()
+        if not spec or self.figure_json is None:
+            return False, "No plot to save. Please create a plot first."
+        SavedPlot.objects.create(
+            user=self.request.user,
+            title=title,
+            plot_type=plot_type,
+            mode='live',
+            params=spec,
+            csv_file=self.csv_file,
+            dataset_hash=dataset_hash(self.csv_file),
+            thumbnail=safe_thumbnail(self.figure_json),
+            uploaded_at=timezone.now(),
+        )
+        return True, "Plot saved; it will be redrawn from this dataset when exported."
 
     def create_plot(self):
-        if "scatter_plot" in self.request.POST and not self.data.empty:
+        posted = f"{self.plot_type.name}_plot" in self.request.POST and self.has_data()
+        if posted:
             self.update_from_post()
-            plot_type = self.request.POST.get('plot_type', 'scatter')
-
-            self.marker_type = self.request.POST.get("marker_type", None)
-
-            try:
-                self.marker_size = int(self.request.POST.get("marker_size", "5"))
-            except (ValueError, TypeError):
-                self.marker_size = 5
-
-            self.request.session["marker_type"] = self.marker_type
-            self.request.session["marker_size"] = self.marker_size
-
-            self.title_font_fix()
-
-            x_axis_label = self.x_axis_label or self.x_column
-            y_axis_label = self.y_axis_label or self.y_column
-
-
-            self.fig = px.scatter(
-                self.data,
-                x=self.x_column,
-                y=self.y_column,
-                title=self.plot_title,
-                template=self.plot_style,
-            )
-
-            if self.marker_type:
-                self.fig.update_traces(marker=dict(symbol=self.marker_type))
-
-            self.fig.update_traces(marker=dict(size=self.marker_size, color=self.plot_color))
-
-            self.fig.update_layout(
-                xaxis_title=x_axis_label,
-                yaxis_title=y_axis_label,
-                xaxis_showgrid=self.show_grid,
-                yaxis_showgrid=self.show_grid,
-                showlegend=self.show_legend,
-                title=dict(text=self.plot_title, font_size=self.title_font_size),
-            )
-
-            self.request.session['plot_scatter'] = pio.to_json(self.fig)
-            self.plot_div = pio.to_html(self.fig, full_html=False)
-
-            plot_div_dict = self.request.session.get('plot_div', {})
-            if not isinstance(plot_div_dict, dict):
-                plot_div_dict = {}
-            plot_div_dict[plot_type] = self.plot_div
-            self.request.session['plot_div'] = plot_div_dict
-            self.request.session.modified = True
 
-        plot_div_dict = self.request.session.get('plot_div', {})
-        self.plot_div = plot_div_dict.get('scatter') if isinstance(plot_div_dict, dict) else None
+        spec = self.stored_spec()
+        if spec:
+            # Only the spec is kept; the figure is rebuilt from data
+            # unless the same spec was already rendered for this dataset.
+            key = make_key(dataset_hash(self.csv_file), self.plot_type.name, spec)
+            cached = figure_cache.get(key)
+            background = cached is None and run_in_background(self.csv_file)
+            if background:
+                cached = self.background_render(spec, key, resubmit=posted)
+            elif cached is None:
+                cached = self.render_spec(spec)
+                figure_cache.set(key, cached)
+            if cached is not None:
+                self.plot_div = cached["div"]
+                self.figure_json = cached["figure"]
+                self.plot_note = cached.get("note")
+
+    def render_spec(self, spec):
+        """Build the figure for ``spec``; returns the figure cache entry."""
+        return pipeline(self.plot_type, self.source(spec), spec)
+
+    def background_render(self, spec, key, resubmit=False):
+        """The entry for ``key`` if a background job already rendered it;
+        otherwise queue the render (once, unless ``resubmit`` retries a
+        failed or cancelled one) and show its progress in place of the plot."""
+        user = self.request.user
+        job = latest_job(user, key)
+        if job is None or (resubmit and job.status in ("failed", "cancelled")):
+            job = submit(user, "plot", self.csv_file, {"plot_type": self.plot_type.name, "spec": spec}, key=key)
+        if job.status == "done":
+            figure_cache.set(key, job.result)
+            return job.result
+        self.plot_div = render_to_string(
+            "myapp/job.html", {"job": job, "next": self.request.path}, request=self.request
+        )
+        return None
 
-        if self.fig is None and self.request.session.get('plot_scatter'):
-            try:
-                self.fig = pio.from_json(self.request.session['plot_scatter'])
-            except Exception:
-                pass
 
-        return self.render_plot()
-    
-    
-def bar_viz(request):
-    viz = BarViz(request)
+def plot_page(request, plot_type, csv_file=None):
+    """Body shared by the plot views: create or fetch the plot, and save it
+    when asked. ``csv_file`` may be passed in when already looked up."""
+    viz = PlotViz(request, csv_file, plot_type)
 
-    if viz.data.empty:
+    if not viz.has_data():
         messages.error(request, "Data is empty")
         return redirect('data')
     
     # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_bar'])
-    except:
-        fig = None
+    viz.create_plot()
     
     # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Bar Plot")
-        success, message = viz.save_plot(title, "Bar", fig)
+    if 'save' in request.POST:
+        plot_name = viz.plot_type.label
+        title = request.POST.get('plot_title', f"{plot_name} Plot")
+        live = request.POST.get('save') == 'live'
+        success, message = viz.save_plot(title, plot_name, None if live else viz.figure_json, live=live)
         if success:
             messages.success(request, message)
-            return redirect('/bar')
+            return redirect('/' + viz.plot_type.name)
         else:
             messages.error(request, message)
     
     return viz.render_plot()
 
 
+def bar_viz(request):
+    return plot_page(request, "bar")
+
+
 def box_viz(request):
-    viz = BoxViz(request)
+    return plot_page(request, "box")
 
-    if viz.data.empty:
-        messages.error(request, "Data is empty")
-        return redirect('data')
-    
-    # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_box'])
-    except:
-        fig = None
-    
-    # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Box Plot")
-        success, message = viz.save_plot(title, "Box", fig)
-        if success:
-            messages.success(request, message)
-            return redirect('/box')
-        else:
-            messages.error(request, message)
-    
-    return viz.render_plot()
 
 def histogram_viz(request):
-    viz = HistogramViz(request)
-
-    if viz.data.empty:
-        messages.error(request, "Data is empty")
-        return redirect('data')
-    
-    # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_histogram'])
-    except:
-        fig = None
-    
-    # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Histogram Plot")
-        success, message = viz.save_plot(title, "Histogram", fig)
-        if success:
-            messages.success(request, message)
-            return redirect('/histogram')
-        else:
-            messages.error(request, message)
-    
-    return viz.render_plot()
+    return plot_page(request, "histogram")
 
 
 def line_viz(request):
-    viz = LineViz(request)
-
-    if viz.data.empty:
-        messages.error(request, "Data is empty")
-        return redirect('data')
-    
-    # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_line'])
-    except:
-        fig = None
-    
-    # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Line Plot")
-        success, message = viz.save_plot(title, "Line", fig)
-        if success:
-            messages.success(request, message)
-            return redirect('/line')
-        else:
-            messages.error(request, message)
-    
-    return viz.render_plot()
+    return plot_page(request, "line")
 
 
 def pie_viz(request):
-    viz = PieViz(request)
-    
-    if viz.data.empty:
-        messages.error(request, "Data is empty")
-        return redirect('data')
-    
-    # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_pie'])
-    except:
-        fig = None
-    
-    # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Pie Plot")
-        success, message = viz.save_plot(title, "Pie", fig)
-        if success:
-            messages.success(request, message)
-            return redirect('/pie')
-        else:
-            messages.error(request, message)
-    
-    return viz.render_plot()
+    return plot_page(request, "pie")
 
 
 def scatter_viz(request):
-    viz = ScatterViz(request)
-    
-    if viz.data.empty:
-        messages.error(request, "Data is empty")
-        return redirect('data')
-    
-    # Create plot
-    plot_created = viz.create_plot()
-    try:
-        fig = pio.from_json(viz.request.session['plot_scatter'])
-    except:
-        fig = None
-    
-    # Handle save request
-    if 'save' in request.POST and plot_created:
-        title = request.POST.get('plot_title', "Scatter Plot")
-        success, message = viz.save_plot(title, "Scatter", fig)
-        if success:
-            messages.success(request, message)
-            return redirect('/scatter')
-        else:
-            messages.error(request, message)
-    else:
-        pass
-    
-    return viz.render_plot()
+    return plot_page(request, "scatter")
 
 
 class DataHandler:
-    def __init__(self, request):
+    def __init__(self, request, csv_file=None):
         self.request = request
         self.page_obj = None
         self.columns = None
         self.user = request.user
-        self.data = self.get_user_data()
-        self.data_display = None 
+        self.csv_file = csv_file if csv_file is not None else self.get_user_csv_file()
+        self._data = None
+        self._row_index = None
         self.columns_display = None
+        self.table_options = {}
+
+    @property
+    def data(self):
+        # Loaded on first use; paging through /data never needs the whole frame.
+        if self._data is None:
+            self._data = self.get_user_data()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def row_index(self):
+        if self._row_index is None and self.csv_file is not None:
+            self._row_index = row_index(self.csv_file)
+        return self._row_index
+
+    def has_row(self, row):
+        if self.row_index is not None:
+            return row in self.row_index
+        return row in self.data["Index"].values
 
     def format_number(self, value):
         if isinstance(value, (int, float)) and abs(value) >= 1000:
             return f"{value:,}"
         return value
 
-    def data_for_display(self):
-        if self.data.empty:
-            return pd.DataFrame()
-
-        self.data_display = self.data.copy()
-
-        for column in self.data_display.columns:
-            self.data_display[column] = self.data_display[column].apply(self.format_number)
-        self.columns_display = list(self.data_display.columns)
-
-        return self.data_display
-
-    def get_user_data(self):
+    def get_user_csv_file(self):
         if self.user.is_authenticated:
             try:
-                csv_file = CSVFile.objects.filter(user=self.user).latest('uploaded_at') 
-                data = pd.read_csv(csv_file.file.path)
-                if 'Index' not in data.columns:
-                    data['Index'] = data.index
-                    cols = ['Index'] + [col for col in data.columns if col != 'Index']
-                    data = data[cols]
-                self.columns = list(data.columns)
-                return data
+                return CSVFile.objects.filter(user=self.user).latest('uploaded_at')
             except CSVFile.DoesNotExist:
-                return pd.DataFrame()
-        return pd.DataFrame()
+                return None
+        return None
 
-    def set_user_data(self, data):
-        csv_file = CSVFile.objects.filter(user=self.user).latest('uploaded_at')
-        data.to_csv(csv_file.file.path, index=False)
+    def get_user_data(self):
+        if self.csv_file is None:
+            return pd.DataFrame()
+        data = read_dataset(self.csv_file)
         self.columns = list(data.columns)
-        self.data = data
+        return data
+
+    def apply_edit(self, operation, **payload):
+        """Apply one edit in memory and append it to the file's journal
+        instead of rewriting the stored dataset."""
+        index = self.row_index if operation in ROW_OPERATIONS else self._row_index
+        self.data = apply_edit(self.data, operation, payload, index)
+        self.columns = list(self.data.columns)
+        self._row_index = next_row_index(index, operation, payload)
+        record_edit(self.csv_file, operation, payload, self.data, self._row_index)
+
+    def submit_edit(self, operation, **payload):
+        """Queue an edit of a large dataset as a background job."""
+        return submit(self.user, "edit", self.csv_file, {"operation": operation, "payload": payload})
+
+    def pending_edits(self):
+        if self.csv_file is None:
+            return []
+        return list(self.csv_file.jobs.filter(kind="edit", status__in=ACTIVE))
 
     def clear_user_data(self):
         self.request.session.pop("csv_file_id", None)
         self.request.session.pop("columns", None)
 
     def paginate_data(self):
-        if not self.data.empty:
-            paginator = Paginator(self.data_display.values.tolist(), 10)
-            page_number = self.request.GET.get("page")
-            self.page_obj = paginator.get_page(page_number)
-            if not self.columns_display:
-                self.columns_display = list(self.data_display.columns)
-    
+        if self.csv_file is None:
+            return
+        self.columns_display = dataset_columns(self.csv_file)
+        params = self.request.GET
+        sort = params.get("sort", "")
+        filter_column = params.get("filter_column", "")
+        filter_value = params.get("filter", "")
+        if sort not in self.columns_display:
+            sort = ""
+        if filter_column not in self.columns_display:
+            filter_column = filter_value = ""
+        descending = params.get("order") == "desc"
+        self.table_options = {
+            "sort": sort,
+            "order": "desc" if descending else "asc",
+            "filter_column": filter_column,
+            "filter": filter_value,
+        }
+
+        try:
+            positions = row_order(self.csv_file, sort, descending, filter_column, filter_value)
+        except (TypeError, ValueError) as e:
+            messages.error(self.request, f"Could not sort or filter the data: {e}")
+            positions = None
+        rows = DatasetRows(self.csv_file, self.columns_display, positions, self.format_number)
+        paginator = Paginator(rows, 10)
+        self.page_obj = paginator.get_page(params.get("page"))
+
     def process_request(self):
         raise NotImplementedError("Subclasses must implement this method")
     
@@ -914,8 +498,22 @@ class CSVUploadHandler(DataHandler):
         user = self.request.user
 
         try:
+            previous_ids = list(CSVFile.objects.filter(user=user).values_list('id', flat=True))
             csv_file_model = CSVFile.objects.create(file=csv_file, user=user)
-            self.set_user_data(csv_file_model)
+            try:
+                ingest_csv(csv_file_model)
+            except Exception as e:
+                # A half-ingested file must not become the user's latest dataset.
+                csv_file_model.file.delete(save=False)
+                if csv_file_model.columnar_file:
+                    csv_file_model.columnar_file.delete(save=False)
+                csv_file_model.delete()
+                if not isinstance(e, IngestError):
+                    raise
+                messages.error(self.request, f"Invalid CSV file: {e}")
+                return redirect("/data")
+            for csv_file_id in previous_ids:
+                dataset_cache.invalidate(csv_file_id)
         except Exception as e:
             messages.error(self.request, f"Failed to process the CSV file: {e}")
             return redirect("/data")
@@ -931,26 +529,19 @@ class ClearDataHandler(DataHandler):
 
 class CleanDataHandler(DataHandler):
     def process_request(self):
-        if not self.data.empty:
-            cleaned_data = self.check_data(self.data)
-            self.set_user_data(cleaned_data)
+        if run_in_background(self.csv_file):
+            self.submit_edit("clean")
+            messages.info(self.request, "The data is being cleaned in the background.")
+        elif not self.data.empty:
+            self.apply_edit("clean")
             messages.success(self.request, "Data has been cleaned.")
         return redirect("/data")
-    
-    @staticmethod
-    def check_data(data):
-        if data.isnull().any().any():
-            df_cleaned = data.dropna()
-            return df_cleaned
-        else:
-            return data
         
 class DeleteColumnHandler(DataHandler):
     def process_request(self):
         column = self.request.POST.get("column_id")
         if column in self.data.columns:
-            self.data = self.data.drop(columns=[column])
-            self.set_user_data(self.data)
+            self.apply_edit("delete_column", column=column)
             messages.success(self.request, f"Column '{column}' has been deleted.")
         else:
             messages.error(self.request, f"Column '{column}' does not exist.")
@@ -962,13 +553,20 @@ class ReplaceDataHandler(DataHandler):
         to_replace = self.request.POST.get("to_replace")
         value = self.request.POST.get("value")
         
-        if column and to_replace and not self.data.empty:
+        background = run_in_background(self.csv_file)
+        if column and to_replace and (background or not self.data.empty):
             try:
-                self.data = self.replace_data(self.data, column, to_replace, value)
-                self.set_user_data(self.data)
-                messages.success(
-                    self.request, f"Data in column '{column}' has been replaced."
-                )
+                to_replace, value = self.parse_replace(to_replace, value)
+                if background:
+                    self.submit_edit("replace", column=column, to_replace=to_replace, value=value)
+                    messages.info(
+                        self.request, f"Data in column '{column}' is being replaced in the background."
+                    )
+                else:
+                    self.apply_edit("replace", column=column, to_replace=to_replace, value=value)
+                    messages.success(
+                        self.request, f"Data in column '{column}' has been replaced."
+                    )
             except Exception as e:
                 messages.error(
                     self.request, f"An error occurred while replacing data: {str(e)}"
@@ -981,43 +579,48 @@ class ReplaceDataHandler(DataHandler):
         return redirect("/data")
     
     @staticmethod
-    def replace_data(data, column, to_replace, replacement):
-        try:
-            if to_replace.lower() == "true" or to_replace.lower() == "false":
-                to_replace = to_replace.lower() == "true"
-            else:
+    def parse_replace(to_replace, replacement):
+        if to_replace.lower() == "true" or to_replace.lower() == "false":
+            to_replace = to_replace.lower() == "true"
+        else:
+            try:
+                to_replace = int(to_replace)
+            except ValueError:
                 try:
-                    to_replace = int(to_replace)
+                    to_replace = float(to_replace)
                 except ValueError:
-                    try:
-                        to_replace = float(to_replace)
-                    except ValueError:
-                        pass
-            
-            if replacement.lower() == "nan":
-                replacement = np.nan
-            
-            data[column] = data[column].replace(to_replace, replacement)
-        except Exception as e:
-            raise Exception(f"Error in replace_data: {e}")
-        
-        return data
+                    pass
+
+        # None is stored in the journal and replayed as NaN.
+        if replacement.lower() == "nan":
+            replacement = None
+
+        return to_replace, replacement
     
 class DeleteRowHandler(DataHandler):
     def process_request(self):
-        row = self.request.POST.get("row_id")
         try:
-            row = int(row)
+            rows = self.parse_rows(self.request.POST.get("row_id", ""))
         except ValueError:
-            messages.error(self.request, f"Row must be integer.")
-        if row in self.data["Index"].values:
-            row_index = self.data[self.data['Index'] == row].index[0]
-            self.data = self.data.drop(index=row_index)
-            self.set_user_data(self.data)
-            messages.success(self.request, f"Row with ID '{row}' has been deleted.")
-        else:
-            messages.error(self.request, f"Row '{row}' does not exist.")
+            messages.error(self.request, f"Rows must be integers separated by commas.")
+            return redirect("/data")
+        found, missing = [], []
+        for row in rows:
+            (found if self.has_row(row) else missing).append(row)
+        if len(found) == 1:
+            self.apply_edit("delete_rows", rows=found)
+            messages.success(self.request, f"Row with ID '{found[0]}' has been deleted.")
+        elif found:
+            self.apply_edit("delete_rows", rows=found)
+            messages.success(self.request, f"{len(found)} rows have been deleted.")
+        if missing:
+            messages.error(self.request, f"Row '{', '.join(map(str, missing))}' does not exist.")
         return redirect("/data")
+
+    @staticmethod
+    def parse_rows(value):
+        # Deduplicated, in the order given: "12, 15 40" -> [12, 15, 40]
+        return list(dict.fromkeys(int(part) for part in value.replace(",", " ").split()))
     
 class EditValueHandler(DataHandler):
     def process_request(self):
@@ -1028,68 +631,98 @@ class EditValueHandler(DataHandler):
             row = int(row)
         except ValueError:
             messages.error(self.request, f"Row must be integer.")
-        if row in self.data["Index"].values and column in self.data.columns:
+        if self.has_row(row) and column in self.data.columns:
             try:
-                # Get the actual index where Index column matches row
-                row_index = self.data[self.data['Index'] == row].index[0]
-                
                 # Try to convert value to appropriate type based on column data
                 original_type = self.data[column].dtype
-                if pd.api.types.is_numeric_dtype(original_type):
+                if pd.api.types.is_bool_dtype(original_type):
+                    value = value.lower() == 'true'
+                elif pd.api.types.is_numeric_dtype(original_type):
                     try:
-                        if original_type == 'int64':
+                        if pd.api.types.is_integer_dtype(original_type):
                             value = int(value)
                         else:
                             value = float(value)
                     except ValueError:
                         messages.error(self.request, f"Value must be a number for column '{column}'.")
                         return redirect("/data")
-                elif original_type == 'bool':
-                    value = value.lower() == 'true'
                 
                 # Update the value
-                self.data.at[row_index, column] = value
-                self.set_user_data(self.data)
+                self.apply_edit("set_value", row=row, column=column, value=value)
                 messages.success(self.request, f"Value in column '{column}' at row {row} has been updated.")
             
             except Exception as e:
                 messages.error(self.request, f"Error updating value: {str(e)}")
         else:
-            if row not in self.data["Index"].values:
+            if not self.has_row(row):
                 messages.error(self.request, f"Row '{row}' does not exist.")
             if column not in self.data.columns:
                 messages.error(self.request, f"Column '{column}' does not exist.")
                 
         return redirect("/data")
 
+
+class UndoEditHandler(DataHandler):
+    def process_request(self):
+        if self.csv_file is not None:
+            edit = undo_edit(self.csv_file)
+            if edit is not None:
+                messages.success(self.request, f"Undid: {edit.get_operation_display().lower()}.")
+                return redirect("/data")
+        messages.info(self.request, "Nothing to undo.")
+        return redirect("/data")
+
+
+class RedoEditHandler(DataHandler):
+    def process_request(self):
+        if self.csv_file is not None:
+            edit = redo_edit(self.csv_file)
+            if edit is not None:
+                messages.success(self.request, f"Redid: {edit.get_operation_display().lower()}.")
+                return redirect("/data")
+        messages.info(self.request, "Nothing to redo.")
+        return redirect("/data")
+
 @login_required
 def data(request):
+    return data_page(request)
+
+
+def data_page(request, csv_file=None):
+    """Body of the data view; ``csv_file`` may be passed in when already
+    looked up."""
     handler = None
 
     if request.method == "POST":
         if "csv_file" in request.FILES:
-            handler = CSVUploadHandler(request)
+            handler = CSVUploadHandler(request, csv_file)
         elif "clear_data" in request.POST:
-            handler = ClearDataHandler(request)
+            handler = ClearDataHandler(request, csv_file)
         elif "clean_data" in request.POST:
-            handler = CleanDataHandler(request)
+            handler = CleanDataHandler(request, csv_file)
         elif "replace_data" in request.POST:
-            handler = ReplaceDataHandler(request)
+            handler = ReplaceDataHandler(request, csv_file)
         elif "delete_column" in request.POST:
-            handler = DeleteColumnHandler(request)
+            handler = DeleteColumnHandler(request, csv_file)
         elif "delete_row" in request.POST:
-            handler = DeleteRowHandler(request)
+            handler = DeleteRowHandler(request, csv_file)
         elif "edit_value" in request.POST:
-            handler = EditValueHandler(request)
+            handler = EditValueHandler(request, csv_file)
+        elif "undo_edit" in request.POST:
+            handler = UndoEditHandler(request, csv_file)
+        elif "redo_edit" in request.POST:
+            handler = RedoEditHandler(request, csv_file)
 
         if handler:
             response = handler.process_request()
             if response:
                 return response
 
-    handler = DataHandler(request)
-    handler.data_for_display()
+    handler = DataHandler(request, csv_file)
     handler.paginate_data()
+    options = handler.table_options
+    filters = {key: options[key] for key in ("filter_column", "filter") if options.get(key)}
+    sorting = {key: options[key] for key in ("sort", "order")} if options.get("sort") else {}
 
     return render(
         request,
@@ -1097,60 +730,58 @@ def data(request):
         {
             "page_obj": handler.page_obj,  # Keep the page_obj for pagination controls
             "columns": handler.columns_display,
+            "table_options": options,
+            # Query-string prefixes that keep the other table settings in links.
+            "filter_query": urlencode(filters) + "&" if filters else "",
+            "page_query": urlencode({**filters, **sorting}) + "&" if filters or sorting else "",
+            "jobs": handler.pending_edits(),
         },
     )
 
 
 class DescribeData(DataHandler):
     def process_request(self):
-        description = None
         description_display = None
         columns = None
-        user = self.request.user
+        column_info = None
+        exact = self.request.GET.get("exact") == "1"
 
-        if not self.data.empty:
+        if self.csv_file is not None and self.csv_file.row_count != 0:
+            if run_in_background(self.csv_file) and not profile_ready(self.csv_file, exact):
+                return self.background_profile(exact)
             try:
-                csv_file = CSVFile.objects.filter(user=user).latest('uploaded_at')
-                data = pd.read_csv(csv_file.file.path)
-                
-                columns = list(data.columns)
-                
-                description = data.describe().round(2)
-                
-                additional_info = pd.DataFrame(index=['dtype', 'null_count', 'unique_count'], columns=columns)
-                
-                for column in columns:
-                    additional_info.loc['dtype', column] = str(data[column].dtype)
-                    additional_info.loc['null_count', column] = data[column].isnull().sum()
-                    additional_info.loc['unique_count', column] = data[column].nunique()
-                
-                description = pd.concat([description, additional_info])
-
-                description_display = description.copy()
-
-                for column in description_display.columns:
-                    if pd.api.types.is_numeric_dtype(data[column]):
+                profile = dataset_profile(self.csv_file, exact=exact)
+                if not profile["rows"]:
+                    messages.info(self.request, "No CSV file has been uploaded yet.")
+                    return redirect('data')
+                columns = list(profile["columns"])
+
+                description_display = describe_table(profile)
+                for column, stats in profile["columns"].items():
+                    if stats["summary"] is not None:
                         description_display[column] = description_display[column].apply(self.format_number)
-                
-                
+                if profile.get("approximate"):
+                    rows = description_display.index.intersection(APPROXIMATE_ROWS)
+                    description_display.loc[rows] = description_display.loc[rows].map(self.approximate)
                 description_display = description_display.to_html(classes="table table-striped table-hover")
-                
+
                 column_info = []
-                for column in columns:
+                for column, stats in profile["columns"].items():
                     info = {
                         'name': column,
-                        'dtype': str(data[column].dtype),
-                        'null_count': self.format_number(data[column].isnull().sum()),
-                        'unique_count': self.format_number(data[column].nunique()),
+                        'dtype': stats["dtype"],
+                        'null_count': self.format_number(stats["null_count"]),
+                        'unique_count': self.format_number(stats["unique_count"]),
                     }
-                    if data[column].dtype in ['int64', 'float64']:
-                        info['top_values'] = data[column].value_counts().head(3).to_dict()
+                    if stats["summary"] is not None:
+                        info['top_values'] = dict(stats["top_values"])
+                    if profile.get("approximate"):
+                        info['unique_count'] = self.approximate(info['unique_count'])
+                        info['top_values'] = {
+                            value: self.approximate(count) for value, count in info.get('top_values', {}).items()
+                        }
                     column_info.append(info)
 
-                
-            except CSVFile.DoesNotExist:
-                messages.error(self.request, "CSV file not found. Please upload a file first.")
-                return redirect('data')
             except Exception as e:
                 messages.error(self.request, f"An error occurred while processing the data: {str(e)}")
                 return redirect('data')
@@ -1162,31 +793,293 @@ class DescribeData(DataHandler):
             "description": description_display,
             "columns": columns,
             "column_info": column_info,
+            "approximate": profile.get("approximate", False),
+            "stale": profile.get("stale", False),
         }
         
         return render(self.request, "myapp/describe.html", context)
+
+    def background_profile(self, exact):
+        """Describe the dataset in a background job, showing its progress."""
+        key = f"profile:{dataset_hash(self.csv_file)}"
+        job = latest_job(self.user, key)
+        # A finished job whose profile was since replaced (undo/redo) is rerun.
+        if job is None or job.status == "done" or (exact and job.status in ("failed", "cancelled")):
+            job = submit(self.user, "profile", self.csv_file, key=key)
+        return render(
+            self.request,
+            "myapp/describe.html",
+            {"job": job, "next": self.request.path, "retry_url": "?exact=1"},
+        )
+
+    @staticmethod
+    def approximate(value):
+        if pd.isna(value):
+            return value
+        return f"≈ {value}"
     
 @login_required
 def describe_data(request):
-    handler = DescribeData(request)
+    return describe_page(request)
+
+
+def describe_page(request, csv_file=None):
+    handler = DescribeData(request, csv_file)
     return handler.process_request()
 
 @login_required
 def export_plots(request):
-    saved_plots = SavedPlot.objects.filter(user=request.user)
-    
-    # Serialize plots data
-    plots_data = []
-    for plot in saved_plots:
-        plots_data.append({
-            'id': plot.id,
-            'title': plot.title,
-            'plot_data': plot.plot_data,  # Assuming this is already JSON-serializable
-            'uploaded_at': plot.uploaded_at,
-        })
-        print(plot.uploaded_at)
+    return export_page(request, SavedPlot.objects.filter(user=request.user).count())
+
+
+def export_page(request, plot_count):
+    # Only the gallery shell; cards are listed from saved_plots_api and each
+    # figure is fetched from saved_plot_data once its card scrolls into view.
     context = {
-        'saved_plots': saved_plots,  # For template iteration
-        'saved_plots_json': json.dumps(plots_data, cls=DjangoJSONEncoder)  # For JavaScript
+        'plotly_js_url': plotly_js_url(),
+        'plot_count': plot_count,
+        'plots_url': reverse('saved_plots_api'),
+        'export_formats': available_formats(),
+        'export_max_plots': EXPORT_MAX_PLOTS,
     }
-    return render(request, 'myapp/export.html', context)
\ No newline at end of file
+    return render(request, 'myapp/export.html', context)
+
+
+def safe_thumbnail(plot_data):
+    try:
+        return figure_thumbnail(plot_data)
+    except Exception:
+        # A figure the thumbnailer cannot read still saves and renders.
+        return EMPTY_THUMBNAIL
+
+
+# Fields needed to list saved plots and to key live ones.
+SAVED_PLOT_FIELDS = (
+    'id', 'title', 'plot_type', 'mode', 'params', 'dataset_hash', 'uploaded_at',
+    'csv_file__id', 'csv_file__file', 'csv_file__columnar_file', 'csv_file__revision',
+    'csv_file__snapshot_edit_id',
+)
+
+
+def saved_plots(user):
+    return SavedPlot.objects.filter(user=user).select_related('csv_file').only(*SAVED_PLOT_FIELDS)
+
+
+def live_plot_key(plot):
+    """Plot type name and figure cache key of a live plot at its dataset's
+    current version; the plot pages use the same keys, so renders are shared."""
+    plot_type = plot.plot_type.lower()
+    return plot_type, make_key(dataset_hash(plot.csv_file), plot_type, plot.params)
+
+
+@login_required
+def saved_plots_api(request):
+    """One page of the user's saved plots, without their figure data."""
+    plots = saved_plots(request.user).order_by('-uploaded_at', '-id')
+    page = Paginator(plots, EXPORT_PAGE_SIZE).get_page(request.GET.get('page'))
+    return JsonResponse({
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'next': f"{reverse('saved_plots_api')}?page={page.next_page_number()}" if page.has_next() else None,
+        'plots': [
+            {
+                'id': plot.id,
+                'title': plot.title,
+                'plot_type': plot.plot_type,
+                'uploaded_at': plot.uploaded_at,
+                'live': plot.live,
+                # Live plots are redrawn from the dataset as it is now.
+                'dataset_changed': plot.live and (
+                    plot.csv_file is None or dataset_hash(plot.csv_file) != plot.dataset_hash
+                ),
+                'data_url': reverse('saved_plot_data', args=[plot.id]),
+                'thumbnail_url': reverse('saved_plot_thumbnail', args=[plot.id]),
+            }
+            for plot in page
+        ],
+    })
+
+
+def saved_plot_etag(request, plot_id):
+    # Saved plots are never changed in place, so id and save time identify
+    # the content.
+    saved = SavedPlot.objects.filter(pk=plot_id, user=request.user).values_list('uploaded_at', flat=True)
+    for uploaded_at in saved:
+        return f"{plot_id}-{uploaded_at.timestamp() if uploaded_at else 0}"
+    return None
+
+
+def saved_figure_etag(request, plot_id):
+    plot = saved_plots(request.user).filter(pk=plot_id).first()
+    if plot is None or not plot.live:
+        return saved_plot_etag(request, plot_id)
+    # A live figure changes with its dataset, as does its cache key.
+    return live_plot_key(plot)[1] if plot.csv_file is not None else None
+
+
+def revalidate(response):
+    # Browsers keep the response but check the ETag before reusing it.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def uncached(response):
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+@etag(saved_figure_etag)
+def saved_plot_data(request, plot_id):
+    plot = get_object_or_404(saved_plots(request.user), pk=plot_id)
+    if not plot.live:
+        return revalidate(HttpResponse(json.dumps(load_figure(plot)), content_type='application/json'))
+    if plot.csv_file is None:
+        return uncached(JsonResponse({'error': "The dataset of this live plot was deleted."}, status=410))
+    plot_type, key = live_plot_key(plot)
+    entry = figure_cache.get(key)
+    if entry is None and run_in_background(plot.csv_file):
+        # Large datasets render in a job, as on the plot pages; the gallery
+        # polls this URL until it is done.
+        job = latest_job(request.user, key)
+        if job is None or job.status == 'cancelled':
+            job = submit(request.user, 'plot', plot.csv_file, {'plot_type': plot_type, 'spec': plot.params}, key=key)
+        if job.status == 'failed':
+            return uncached(JsonResponse({'error': job.error or "Rendering failed."}, status=500))
+        if job.status != 'done':
+            wake()
+            return uncached(JsonResponse({'status': job.status, 'job': reverse('job_status', args=[job.id])}, status=202))
+        entry = job.result
+        figure_cache.set(key, entry)
+    try:
+        figure = entry['figure'] if entry is not None else saved_figure(plot)
+    except Exception as e:
+        return uncached(JsonResponse({'error': f"Could not redraw the plot: {e}"}, status=500))
+    return revalidate(HttpResponse(figure, content_type='application/json'))
+
+
+def saved_figure(plot):
+    """Figure JSON text of a saved plot; a live plot is redrawn now unless
+    its figure is cached."""
+    if not plot.live:
+        return json.dumps(load_figure(plot))
+    if plot.csv_file is None:
+        raise ValueError("The dataset of this live plot was deleted.")
+    plot_type, key = live_plot_key(plot)
+    entry = figure_cache.get(key)
+    if entry is None:
+        entry = PlotViz(csv_file=plot.csv_file, plot_type=plot_type).render_spec(plot.params)
+        figure_cache.set(key, entry)
+    return entry['figure']
+
+
+@login_required
+@require_POST
+def bulk_export(request):
+    """Selected saved plots (``plot_ids``, or ``all``) rendered to ``format``
+    by the renderer pool, streamed back as a ZIP."""
+    fmt = request.POST.get('format', 'png')
+    if fmt not in available_formats():
+        messages.error(request, f"Export as {fmt.upper()} is not available on this server.")
+        return redirect('export_plots')
+    plots = saved_plots(request.user).order_by('-uploaded_at', '-id')
+    if 'all' not in request.POST:
+        plots = plots.filter(pk__in=[int(i) for i in request.POST.getlist('plot_ids') if i.isdigit()])
+    plots = list(plots[:EXPORT_MAX_PLOTS])
+    if not plots:
+        messages.error(request, "Select the plots to export first.")
+        return redirect('export_plots')
+
+    def figures():
+        for plot in plots:
+            try:
+                yield plot.id, plot.title, saved_figure(plot)
+            except Exception as e:
+                yield plot.id, plot.title, e
+
+    response = StreamingHttpResponse(export_zip(figures(), fmt), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="plots-{fmt}.zip"'
+    return response
+
+
+@login_required
+@etag(saved_plot_etag)
+def saved_plot_thumbnail(request, plot_id):
+    plot = get_object_or_404(SavedPlot.objects.only('mode', 'thumbnail'), pk=plot_id, user=request.user)
+    thumbnail = plot.thumbnail
+    if not thumbnail and not plot.live:
+        # Plots saved before thumbnails existed get theirs on first view.
+        thumbnail = safe_thumbnail(load_figure(plot))
+        SavedPlot.objects.filter(pk=plot_id).update(thumbnail=thumbnail)
+    return revalidate(HttpResponse(thumbnail or EMPTY_THUMBNAIL, content_type='image/svg+xml'))
+
+
+@login_required
+def job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id, user=request.user)
+    if job.active:
+        # Also restarts dispatching for jobs queued before a server restart.
+        wake()
+    return JsonResponse({
+        "id": job.id,
+        "kind": job.kind,
+        "kind_display": job.get_kind_display(),
+        "status": job.status,
+        "error": job.error,
+        **job.timings(),
+    })
+
+
+@login_required
+@require_POST
+def cancel_job(request, job_id):
+    job = get_object_or_404(Job, pk=job_id, user=request.user)
+    if cancel(job):
+        messages.success(request, f"{job.get_kind_display()} has been cancelled.")
+    else:
+        messages.warning(
+            request,
+            f"{job.get_kind_display()} could not be cancelled; it has finished or is already changing the data.",
+        )
+    next_url = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse("data")
+    return redirect(next_url)
+
+
+@staff_member_required
+def job_stats(request):
+    return JsonResponse(job_metrics())
+
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse({
+        "dataset_cache": dataset_cache.stats(),
+        "figure_cache": figure_cache.stats(),
+    })
+
+
+@staff_member_required
+def timing_stats(request):
+    if request.method == 'POST' and 'reset' in request.POST:
+        timing_store.reset()
+        return redirect('timing_stats')
+    return render(request, 'myapp/timing.html', {
+        'views': timing_store.summary(),
+        'since': timing_store.started,
+    })
+
+
+def metrics(request):
+    """Request timings for Prometheus to scrape, with the METRICS_TOKEN as a
+    bearer token, or for a signed-in staff member."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = request.user.is_active and request.user.is_staff
+    if token and request.headers.get('Authorization') == f"Bearer {token}":
+        authorized = True
+    if not authorized:
+        return HttpResponse(status=403)
+    return HttpResponse(timing_store.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
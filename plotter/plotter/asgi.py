@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plotter.settings')
+# Serve the async plot and data views (see myapp.async_views).
+os.environ.setdefault('PLOTTER_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
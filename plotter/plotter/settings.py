@@ -42,8 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'myapp.timing.TimedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -55,7 +56,7 @@ ROOT_URLCONF = 'plotter.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'myapp.timing.TimedTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,12 +76,62 @@ WSGI_APPLICATION = 'plotter.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. PLOTTER_DB_ENGINE=postgresql selects PostgreSQL
+# (PLOTTER_DB_NAME, _USER, _PASSWORD, _HOST, _PORT). Compare the two with
+# `manage.py benchmark_db`.
+DB_ENGINE = os.environ.get('PLOTTER_DB_ENGINE', 'sqlite')
+# Seconds a request waits for a lock (SQLite) or a pooled connection.
+DB_TIMEOUT = float(os.environ.get('PLOTTER_DB_TIMEOUT', 20))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PLOTTER_DB_NAME', 'plotter'),
+            'USER': os.environ.get('PLOTTER_DB_USER', ''),
+            'PASSWORD': os.environ.get('PLOTTER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('PLOTTER_DB_HOST', ''),
+            'PORT': os.environ.get('PLOTTER_DB_PORT', ''),
+            # Connections are kept for this many seconds instead of being
+            # opened for every request.
+            'CONN_MAX_AGE': int(os.environ.get('PLOTTER_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('PLOTTER_DB_POOL') == '1':
+        # A psycopg pool per process (needs psycopg[pool]) replaces
+        # persistent connections.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('PLOTTER_DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('PLOTTER_DB_POOL_MAX_SIZE', 10)),
+            'timeout': DB_TIMEOUT,
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('PLOTTER_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Writers wait this long for the lock instead of failing
+                # with "database is locked".
+                'timeout': DB_TIMEOUT,
+                # Transactions take the write lock when they begin, so one
+                # that reads first cannot fail when it comes to write.
+                'transaction_mode': 'IMMEDIATE',
+                # WAL lets pages read while another process writes; with it,
+                # synchronous=NORMAL only syncs at checkpoints.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA mmap_size=134217728'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -126,3 +177,81 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Upper bound for the in-process cache of parsed user datasets (myapp.dataset_cache).
+DATASET_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Rendered plot cache (myapp.figure_cache). BACKEND is "memory", "file"
+# (LOCATION directory) or "django" (ALIAS of an entry in CACHES).
+PLOT_FIGURE_CACHE = {
+    'BACKEND': 'memory',
+    'MAX_BYTES': 64 * 1024 * 1024,
+}
+
+# Default number of points kept when a line or scatter plot is downsampled.
+PLOT_POINT_BUDGET = 5000
+
+# Datasets larger than this on disk are streamed in chunks for histogram and
+# box statistics instead of being loaded whole.
+PLOT_STREAMING_BYTES = 512 * 1024 * 1024
+
+# Rows per chunk when uploads are validated and converted (myapp.ingest), and
+# the largest CSV accepted.
+CSV_INGEST_CHUNK_ROWS = 100_000
+CSV_UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Plots and /data pages map the numeric and categorical columns of a dataset
+# from files next to its Feather snapshot instead of parsing a private copy,
+# so worker processes share them through the OS page cache.
+DATASET_MEMORY_MAP = True
+
+# Plot form values and specs (myapp.plot_state) larger than INLINE_BYTES of
+# JSON are kept outside the session for TTL seconds after last use, at most
+# USER_MAX_ENTRIES/USER_MAX_BYTES per user; `manage.py prune_plot_state`
+# deletes expired ones.
+PLOT_STATE_INLINE_BYTES = 256
+PLOT_STATE_TTL = 14 * 24 * 60 * 60
+PLOT_STATE_USER_MAX_ENTRIES = 500
+PLOT_STATE_USER_MAX_BYTES = 1024 * 1024
+
+# Sorted/filtered row orders of the /data table kept per process (myapp.paging).
+DATA_ROW_ORDER_CACHE_SIZE = 16
+
+# Data edits are journaled (myapp.journal); once more than COMPACT_AFTER are
+# pending, all but the last UNDO_DEPTH are folded into a new snapshot.
+EDIT_JOURNAL_COMPACT_AFTER = 50
+EDIT_JOURNAL_UNDO_DEPTH = 10
+
+# Datasets with more rows than this are described from the column sketches
+# kept since upload (myapp.sketches) unless exact statistics are requested.
+PROFILE_EXACT_MAX_ROWS = 1_000_000
+
+# Background jobs (myapp.jobs): plots, cleaning/replacing and exact
+# descriptions of datasets with more than JOB_MIN_ROWS rows run in a pool of
+# JOB_WORKERS processes, at most JOB_USER_LIMIT at a time per user. Set
+# JOB_DISPATCH_IN_PROCESS = False to dispatch from `manage.py run_jobs` only.
+JOB_WORKERS = 2
+JOB_USER_LIMIT = 2
+JOB_MIN_ROWS = 250_000
+JOB_TIMEOUT = 600
+JOB_DISPATCH_IN_PROCESS = True
+
+# Serve the async versions of the plot, data, describe and export views
+# (myapp.async_views); plotter/asgi.py turns this on. Their blocking work
+# runs on ASYNC_RENDER_WORKERS threads.
+ASYNC_VIEWS = os.environ.get('PLOTTER_ASYNC_VIEWS') == '1'
+ASYNC_RENDER_WORKERS = 4
+
+# Saved plots listed per page by the export gallery's API.
+EXPORT_PAGE_SIZE = 24
+
+# Bulk export of saved plots (myapp.image_export): figures are rendered by
+# EXPORT_RENDER_WORKERS persistent processes, at most EXPORT_MAX_PLOTS per
+# ZIP. PNG, SVG and PDF need the kaleido package.
+EXPORT_RENDER_WORKERS = 2
+EXPORT_MAX_PLOTS = 200
+
+# Request timings (myapp.timing) are shown to staff at /stats/timing and
+# served in the Prometheus text format at /stats/metrics, to staff or to
+# requests bearing this token.
+METRICS_TOKEN = os.environ.get('PLOTTER_METRICS_TOKEN')